@@ -17,9 +17,12 @@ Default target labels:
 
 import argparse
 import json
+import multiprocessing
 import os
 import sys
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 try:
@@ -34,6 +37,12 @@ except ImportError:
     print("ERROR: ultralytics is required. Install with: pip install ultralytics", file=sys.stderr)
     sys.exit(1)
 
+try:
+    import cv2
+except ImportError:
+    print("ERROR: OpenCV is required. Install with: pip install opencv-python", file=sys.stderr)
+    sys.exit(1)
+
 
 TARGET_LABELS = ["pedestrian", "vehicle", "traffic_light", "stop_sign"]
 TARGET_LABEL_TO_ID = {name: idx for idx, name in enumerate(TARGET_LABELS)}
@@ -89,6 +98,24 @@ def parse_args():
         action="store_true",
         help="Do not create empty YOLO txt files for images with no detections.",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Images per model.predict call. Default: 8",
+    )
+    parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=4,
+        help="Threads decoding the next batch of images while the current one runs. Default: 4",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes annotating camera folders in parallel, each with its own model. Default: 1",
+    )
     return parser.parse_args()
 
 
@@ -167,30 +194,33 @@ def clamp(value, min_value, max_value):
     return max(min_value, min(value, max_value))
 
 
-def detect_image(model, image_path, confidence, iou, device):
-    kwargs = {
-        "source": str(image_path),
-        "conf": confidence,
-        "iou": iou,
-        "verbose": False,
-    }
-    if device is not None:
-        kwargs["device"] = device
+def load_image(image_path):
+    """Decode an image to a BGR array, the layout ultralytics uses for file sources."""
+    image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode image: {image_path}")
+    return image
+
+
+def iter_decoded_batches(images, batch_size, pool):
+    """Yield ``(paths, arrays)`` batches, decoding the next batch on ``pool`` meanwhile."""
+    batches = [images[i : i + batch_size] for i in range(0, len(images), batch_size)]
+    pending = pool.map(load_image, batches[0]) if batches else None
+    for index, batch in enumerate(batches):
+        arrays = list(pending)
+        if index + 1 < len(batches):
+            pending = pool.map(load_image, batches[index + 1])
+        yield batch, arrays
 
-    results = model.predict(**kwargs)
-    if not results:
-        return []
 
-    result = results[0]
+def result_detections(result, width, height):
+    """Convert one ultralytics result to target-label detections clamped to the image."""
     if result.boxes is None:
         return []
 
     detections = []
     names = result.names
 
-    with Image.open(image_path) as img:
-        width, height = img.size
-
     for box in result.boxes:
         raw_class_id = int(box.cls.item())
         raw_label = names.get(raw_class_id, str(raw_class_id))
@@ -221,6 +251,26 @@ def detect_image(model, image_path, confidence, iou, device):
     return detections
 
 
+def detect_images(model, images, confidence, iou, device):
+    """Run one ``model.predict`` call on decoded BGR arrays; returns detections per image."""
+    kwargs = {
+        "source": list(images),
+        "conf": confidence,
+        "iou": iou,
+        "verbose": False,
+    }
+    if device is not None:
+        kwargs["device"] = device
+
+    results = list(model.predict(**kwargs))
+    if len(results) != len(images):
+        raise RuntimeError(f"model.predict returned {len(results)} results for {len(images)} images")
+    return [
+        result_detections(result, image.shape[1], image.shape[0])
+        for result, image in zip(results, images)
+    ]
+
+
 def write_yolo_label(label_path, detections):
     lines = []
     for det in detections:
@@ -244,7 +294,16 @@ def write_yolo_label(label_path, detections):
     label_path.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
 
 
-def build_coco(images, detections_by_image):
+def image_size(image_path, detections, image_sizes=None):
+    if image_sizes and image_path in image_sizes:
+        return image_sizes[image_path]
+    if detections:
+        return detections[0]["width"], detections[0]["height"]
+    with Image.open(image_path) as img:
+        return img.size
+
+
+def build_coco(images, detections_by_image, image_sizes=None):
     coco = {
         "images": [],
         "annotations": [],
@@ -257,12 +316,7 @@ def build_coco(images, detections_by_image):
     ann_id = 1
     for image_id, image_path in enumerate(images, start=1):
         detections = detections_by_image[image_path]
-        if detections:
-            width = detections[0]["width"]
-            height = detections[0]["height"]
-        else:
-            with Image.open(image_path) as img:
-                width, height = img.size
+        width, height = image_size(image_path, detections, image_sizes)
 
         coco["images"].append(
             {
@@ -293,7 +347,7 @@ def build_coco(images, detections_by_image):
     return coco
 
 
-def build_cvat_xml(images, detections_by_image):
+def build_cvat_xml(images, detections_by_image, image_sizes=None):
     root = ET.Element("annotations")
     ET.SubElement(root, "version").text = "1.1"
 
@@ -310,12 +364,7 @@ def build_cvat_xml(images, detections_by_image):
 
     for image_id, image_path in enumerate(images):
         detections = detections_by_image[image_path]
-        if detections:
-            width = detections[0]["width"]
-            height = detections[0]["height"]
-        else:
-            with Image.open(image_path) as img:
-                width, height = img.size
+        width, height = image_size(image_path, detections, image_sizes)
 
         image_node = ET.SubElement(
             root,
@@ -362,29 +411,38 @@ def annotate_image_set(args, model, camera_name, image_dir, images, output_dir,
     print(f"[*] Found {len(images)} images in {image_dir}")
     print(f"[*] Writing annotations to {output_dir}")
 
-    for index, image_path in enumerate(images, start=1):
-        detections = detect_image(
-            model=model,
-            image_path=image_path,
-            confidence=args.confidence,
-            iou=args.iou,
-            device=args.device,
-        )
-        detections_by_image[image_path] = detections
-        total_boxes += len(detections)
+    batch_size = max(1, args.batch_size)
+    image_sizes = {}
+    index = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.decode_threads)) as pool:
+        for batch_paths, batch_images in iter_decoded_batches(images, batch_size, pool):
+            batch_detections = detect_images(
+                model=model,
+                images=batch_images,
+                confidence=args.confidence,
+                iou=args.iou,
+                device=args.device,
+            )
+            for image_path, image, detections in zip(batch_paths, batch_images, batch_detections):
+                index += 1
+                image_sizes[image_path] = (image.shape[1], image.shape[0])
+                detections_by_image[image_path] = detections
+                total_boxes += len(detections)
 
-        label_path = labels_dir / f"{image_path.stem}.txt"
-        if detections or not args.no_empty_labels:
-            write_yolo_label(label_path, detections)
+                label_path = labels_dir / f"{image_path.stem}.txt"
+                if detections or not args.no_empty_labels:
+                    write_yolo_label(label_path, detections)
 
-        print(f"[{index:04d}/{len(images):04d}] {image_path.name}: {len(detections)} boxes")
+                print(f"[{index:04d}/{len(images):04d}] {image_path.name}: {len(detections)} boxes")
+    elapsed = time.perf_counter() - start_time
 
-    coco = build_coco(images, detections_by_image)
+    coco = build_coco(images, detections_by_image, image_sizes)
     coco_path = output_dir / "annotations_coco.json"
     coco_path.write_text(json.dumps(coco, indent=2), encoding="utf-8")
 
     cvat_xml_path = output_dir / "annotations_cvat.xml"
-    cvat_tree = build_cvat_xml(images, detections_by_image)
+    cvat_tree = build_cvat_xml(images, detections_by_image, image_sizes)
     cvat_tree.write(cvat_xml_path, encoding="utf-8", xml_declaration=True)
 
     summary = {
@@ -396,6 +454,9 @@ def annotate_image_set(args, model, camera_name, image_dir, images, output_dir,
         "images": len(images),
         "boxes": total_boxes,
         "labels": TARGET_LABELS,
+        "batch_size": batch_size,
+        "detect_seconds": round(elapsed, 3),
+        "images_per_sec": round(len(images) / elapsed, 2) if elapsed > 0 else None,
     }
     summary_path = output_dir / "summary.json"
     summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
@@ -404,20 +465,49 @@ def annotate_image_set(args, model, camera_name, image_dir, images, output_dir,
         "camera": camera_name,
         "images": len(images),
         "boxes": total_boxes,
+        "images_per_sec": summary["images_per_sec"],
         "labels_dir": str(labels_dir),
         "coco_path": str(coco_path),
         "cvat_xml_path": str(cvat_xml_path),
     }
 
 
+_WORKER_MODEL = None
+
+
+def _init_worker(model_name, torch_threads):
+    global _WORKER_MODEL
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    _WORKER_MODEL = YOLO(model_name)
+
+
+def _annotate_job(args, job):
+    return annotate_image_set(args, _WORKER_MODEL, *job)
+
+
+def annotate_jobs_parallel(args, jobs):
+    """Annotate camera folders in a process pool; results come back in job order."""
+    workers = max(1, min(args.workers, len(jobs)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[*] Annotating {len(jobs)} camera folder(s) with {workers} worker(s), model: {args.model}")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.model, torch_threads),
+    ) as pool:
+        futures = [pool.submit(_annotate_job, args, job) for job in jobs]
+        return [future.result() for future in futures]
+
+
 def main():
     args = parse_args()
     base_dir, image_sets, multi_camera = discover_image_sets(args.segment)
 
-    print(f"[*] Loading model: {args.model}")
-    model = YOLO(args.model)
-
-    all_summaries = []
+    jobs = []
     root_output_dir = None
     for camera_name, image_dir, images in image_sets:
         root_output_dir, output_dir, labels_dir = make_output_dirs(
@@ -428,9 +518,14 @@ def main():
         write_labels_file(output_dir)
         if multi_camera:
             write_labels_file(root_output_dir)
-        all_summaries.append(
-            annotate_image_set(args, model, camera_name, image_dir, images, output_dir, labels_dir)
-        )
+        jobs.append((camera_name, image_dir, images, output_dir, labels_dir))
+
+    if args.workers > 1:
+        all_summaries = annotate_jobs_parallel(args, jobs)
+    else:
+        print(f"[*] Loading model: {args.model}")
+        model = YOLO(args.model)
+        all_summaries = [annotate_image_set(args, model, *job) for job in jobs]
 
     if root_output_dir is not None:
         (root_output_dir / "summary.json").write_text(
@@ -2,7 +2,6 @@ import os
 import sys
 import glob
 import argparse
-import json
 
 def get_default_route():
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'datasets'))
@@ -25,7 +24,7 @@ parser.add_argument("--end-frame", type=int, default=None,
                     help="Last frame index to process within the segment (inclusive)")
 parser.add_argument("--num-traj-samples", type=int, default=16,
                     help="Number of trajectory samples to draw per condition")
-parser.add_argument("--selection-mode", choices=["heuristic", "mean", "median"], default="heuristic",
+parser.add_argument("--selection-mode", choices=["heuristic", "mean", "median", "medoid"], default="heuristic",
                     help="How to collapse sampled trajectories into the displayed path.")
 parser.add_argument("--guidance-weight", type=float, default=1.5,
                     help="Classifier-free guidance weight for nav-conditioned inference")
@@ -34,6 +33,28 @@ parser.add_argument("--cameras", nargs="+", choices=["wide", "left", "right", "f
                     help="Cameras to include (wide, left, right, front). Unlisted cameras will be excluded.")
 parser.add_argument("--max-gen-length", type=int, default=256,
                     help="Maximum generation length for the trajectory diffusion model. Lower speeds it up but reduces max distance.")
+parser.add_argument("--fused-guidance", action="store_true",
+                    help="Run the guided and unguided CFG conditions in one expert forward per diffusion step.")
+parser.add_argument("--int-method", choices=["euler", "midpoint", "heun", "dpm_solver_2m"], default=None,
+                    help="Diffusion ODE integrator (default: the model config's). midpoint/heun cost 2 expert evaluations per step.")
+parser.add_argument("--inference-steps", type=int, default=None,
+                    help="Diffusion integration steps (default: the model config's).")
+parser.add_argument("--time-schedule", choices=["uniform", "cosine", "quadratic"], default=None,
+                    help="Spacing of the diffusion steps (default: the model config's).")
+parser.add_argument("--batch-size", type=int, default=1,
+                    help="Frames per model call. Values above 1 batch VLM generation and diffusion across frames.")
+parser.add_argument("--loader-workers", type=int, default=2,
+                    help="Threads that decode upcoming frames while the current one runs inference. 0 loads synchronously.")
+parser.add_argument("--prefetch-frames", type=int, default=None,
+                    help="Frames to decode ahead of inference (default: 2x --loader-workers).")
+parser.add_argument("--image-cache-mb", type=int, default=512,
+                    help="Memory budget for decoded camera frames reused across overlapping frame windows. 0 disables.")
+parser.add_argument("--vision-cache-mb", type=int, default=512,
+                    help="Device memory budget for vision encoder outputs reused across overlapping frame windows. 0 disables.")
+parser.add_argument("--overwrite", action="store_true",
+                    help="Re-run frames already recorded as complete in the segment's export manifest.")
+parser.add_argument("--prediction-format", choices=["store", "json", "both"], default="store",
+                    help="store appends to the segment's columnar prediction store; json writes one legacy JSON per frame.")
 parser.add_argument("--plot-all-samples", action="store_true",
                     help="Deprecated compatibility flag. Videos are rendered later from saved prediction JSON.")
 global_args = parser.parse_args()
@@ -42,14 +63,23 @@ os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True"
 import numpy as np
 import torch
 import signal
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 
-from alpamayo1_5.load_custom_dataset import load_custom_dataset
+from alpamayo1_5.load_custom_dataset import IMAGE_CACHE, iter_custom_dataset
 from alpamayo1_5.navigation_command import infer_navigation_command
+from alpamayo1_5.path_selection import select_prediction_paths
+from alpamayo1_5.prediction_store import (
+    open_segment_export,
+    path_to_records,
+    write_prediction_json,
+)
 from alpamayo1_5 import helper
 from alpamayo1_5.models.alpamayo1_5 import Alpamayo1_5
+from alpamayo1_5.models.vision_features import VisionEmbeddingCache, image_cache_keys
 
+MODEL_NAME = "nvidia/Alpamayo-1.5-10B"
 
 def extract_cot(extra, idx=0):
     try:
@@ -81,25 +111,75 @@ def run_nav_inference(
     num_traj_samples: int,
     guidance_weight: float,
     max_gen_length: int = 256,
+    fused_guidance: bool = False,
+    vision_cache: VisionEmbeddingCache | None = None,
+    diffusion_overrides: dict | None = None,
 ):
-    messages_nav = helper.create_message(
-        data["image_frames"].flatten(0, 1),
-        camera_indices=data.get("camera_indices"),
-        nav_text=nav_cmd,
-    )
-    inputs_nav = processor.apply_chat_template(
-        messages_nav,
-        tokenize=True,
-        add_generation_prompt=False,
-        continue_final_message=True,
-        return_dict=True,
-        return_tensors="pt",
-    )
+    return run_nav_inference_batch(
+        model=model,
+        processor=processor,
+        batch=[data],
+        device=device,
+        nav_cmds=[nav_cmd],
+        num_traj_samples=num_traj_samples,
+        guidance_weight=guidance_weight,
+        max_gen_length=max_gen_length,
+        fused_guidance=fused_guidance,
+        vision_cache=vision_cache,
+        diffusion_overrides=diffusion_overrides,
+    )[0]
+
+
+def run_nav_inference_batch(
+    model,
+    processor,
+    batch: list[dict],
+    device,
+    nav_cmds: list[str],
+    num_traj_samples: int,
+    guidance_weight: float,
+    max_gen_length: int = 256,
+    fused_guidance: bool = False,
+    vision_cache: VisionEmbeddingCache | None = None,
+    diffusion_overrides: dict | None = None,
+) -> list[tuple]:
+    """Run VLM generation and CFG diffusion for several frames in one model call.
+
+    With ``vision_cache``, images already encoded for an earlier call (the shared
+    timesteps of overlapping frame windows) are not run through the vision encoder again.
+    ``diffusion_overrides`` (``int_method``, ``inference_step``, ``time_schedule``)
+    replace the model's diffusion sampling defaults.
+
+    Returns one ``(pred_xyz, pred_rot, extra)`` tuple per frame, shaped like a
+    single-frame call.
+    """
+    tokenized = []
+    cache_keys = [] if vision_cache is not None else None
+    for data, nav_cmd in zip(batch, nav_cmds):
+        frames = data["image_frames"].flatten(0, 1)
+        if cache_keys is not None:
+            cache_keys.extend(image_cache_keys(frames, processor.image_processor))
+        messages_nav = helper.create_message(
+            frames,
+            camera_indices=data.get("camera_indices"),
+            nav_text=nav_cmd,
+        )
+        tokenized.append(
+            processor.apply_chat_template(
+                messages_nav,
+                tokenize=True,
+                add_generation_prompt=False,
+                continue_final_message=True,
+                return_dict=True,
+                return_tensors="pt",
+            )
+        )
+    inputs_nav = helper.collate_tokenized_inputs(tokenized, model.tokenizer.pad_token_id)
     model_inputs_nav = helper.to_device(
         {
             "tokenized_data": inputs_nav,
-            "ego_history_xyz": data["ego_history_xyz"],
-            "ego_history_rot": data["ego_history_rot"],
+            "ego_history_xyz": torch.cat([data["ego_history_xyz"] for data in batch], dim=0),
+            "ego_history_rot": torch.cat([data["ego_history_rot"] for data in batch], dim=0),
         },
         device,
     )
@@ -113,74 +193,19 @@ def run_nav_inference(
                 num_traj_samples=num_traj_samples,
                 max_generation_length=max_gen_length,
                 return_extra=True,
+                fused_guidance=fused_guidance,
+                vision_cache=vision_cache,
+                image_cache_keys=cache_keys,
                 diffusion_kwargs={
                     "use_classifier_free_guidance": True,
                     "inference_guidance_weight": guidance_weight,
                     "temperature": 0.6,
+                    **(diffusion_overrides or {}),
                 },
             )
         )
 
-    return pred_xyz_nav, pred_rot_nav, extra_nav
-
-
-def select_prediction_path(
-    pred_tensor,
-    nav_cmd: str,
-    num_frames: int,
-    selection_mode: str = "heuristic",
-) -> tuple[np.ndarray, int, int, np.ndarray]:
-    pred_np = pred_tensor.detach().cpu().numpy()[0, 0]
-    if pred_np.shape[0] == 0:
-        return np.zeros((1, 3), dtype=np.float32), 0, 0, pred_np
-
-    if selection_mode == "mean":
-        selected = pred_np.mean(axis=0)
-        sample_idx = int(
-            np.argmin(
-                np.linalg.norm(pred_np[:, :, :2] - selected[None, :, :2], axis=-1).mean(axis=1)
-            )
-        )
-    elif selection_mode == "median":
-        selected = np.median(pred_np, axis=0)
-        sample_idx = int(
-            np.argmin(
-                np.linalg.norm(pred_np[:, :, :2] - selected[None, :, :2], axis=-1).mean(axis=1)
-            )
-        )
-    else:
-        nav_lower = nav_cmd.lower()
-        final_lateral = pred_np[:, -1, 1]
-        final_forward = pred_np[:, -1, 0]
-
-        if "left" in nav_lower:
-            sample_idx = int(np.argmax(final_lateral))
-        elif "right" in nav_lower:
-            sample_idx = int(np.argmin(final_lateral))
-        elif "straight" in nav_lower:
-            sample_idx = int(np.argmin(np.abs(final_lateral)))
-        else:
-            # Fallback to the sample that goes furthest forward while staying centered.
-            sample_idx = int(np.argmax(final_forward - np.abs(final_lateral)))
-
-        selected = pred_np[sample_idx]
-
-    n_frames = min(num_frames, selected.shape[0])
-    return selected[:n_frames], n_frames, sample_idx, pred_np
-
-
-def path_to_records(path: np.ndarray) -> list[dict]:
-    records = []
-    for idx, point in enumerate(path):
-        records.append(
-            {
-                "step_index": int(idx),
-                "x_m": float(point[0]),
-                "y_m": float(point[1]),
-                "z_m": float(point[2]) if len(point) > 2 else 0.0,
-            }
-        )
-    return records
+    return helper.split_batched_predictions(pred_xyz_nav, pred_rot_nav, extra_nav)
 
 
 def samples_to_records(samples: np.ndarray, num_frames: int) -> list[dict]:
@@ -197,6 +222,12 @@ def prediction_json_dir(args, seg_dir: str) -> str:
     return os.path.join(seg_dir, "predictions")
 
 
+def prediction_json_path(args, seg_dir: str, seg_name: str, local_idx: int) -> str:
+    return os.path.join(
+        prediction_json_dir(args, seg_dir), f"{seg_name}_{local_idx:06d}_prediction.json"
+    )
+
+
 def save_prediction_json(
     args,
     route_name: str,
@@ -212,13 +243,12 @@ def save_prediction_json(
     n_frames: int,
     data: dict,
 ) -> str:
-    out_dir = prediction_json_dir(args, seg_dir)
-    os.makedirs(out_dir, exist_ok=True)
-    out_path = os.path.join(out_dir, f"{seg_name}_{local_idx:06d}_prediction.json")
+    out_path = prediction_json_path(args, seg_dir, seg_name, local_idx)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
 
     payload = {
         "schema_version": 1,
-        "model_name": "nvidia/Alpamayo-1.5-10B",
+        "model_name": MODEL_NAME,
         "route": route_name,
         "segment": seg_name,
         "frame_index": int(local_idx),
@@ -238,16 +268,55 @@ def save_prediction_json(
         "cameras": args.cameras,
         "reasoning_text": cot,
         "reasoning": cot,
-        "selected_path": path_to_records(selected_path),
-        "ground_truth_path": path_to_records(gt_xyz[:n_frames]),
+        "selected_path": np.asarray(selected_path),
+        "ground_truth_path": np.asarray(gt_xyz[:n_frames]),
     }
 
-    with open(out_path, "w", encoding="utf-8") as handle:
-        json.dump(payload, handle, indent=2)
+    write_prediction_json(out_path, payload)
 
     return out_path
 
 
+def prediction_store_metadata(args, route_name: str, seg_name: str) -> dict:
+    """Per-run fields stored once in the prediction store instead of in every frame.
+
+    Built from ``export_params`` so the store starts over exactly when the resume
+    manifest does; ``--frames`` is recorded per frame instead.
+    """
+    return {
+        **export_params(args),
+        "route": route_name,
+        "segment": seg_name,
+        "command_source": "ground_truth_heuristic",
+    }
+
+
+def diffusion_overrides(args) -> dict:
+    """Diffusion sampling settings given on the command line; unset ones keep the model config."""
+    overrides = {
+        "int_method": args.int_method,
+        "inference_step": args.inference_steps,
+        "time_schedule": args.time_schedule,
+    }
+    return {key: value for key, value in overrides.items() if value is not None}
+
+
+def export_params(args) -> dict:
+    """Parameters that change exported predictions; part of the resume manifest hash."""
+    params = {
+        "model_name": MODEL_NAME,
+        "num_traj_samples": int(args.num_traj_samples),
+        "guidance_weight": float(args.guidance_weight),
+        "max_generation_length": int(args.max_gen_length),
+        "cameras": sorted(args.cameras),
+        "selection_mode": args.selection_mode,
+    }
+    # Only recorded when set, so manifests written with the model defaults stay valid
+    if diffusion_overrides(args):
+        params["diffusion"] = diffusion_overrides(args)
+    return params
+
+
 def main():
     args = global_args
     
@@ -269,10 +338,12 @@ def main():
         if name not in args.cameras:
             excluded_cameras.append(idx)
 
+    IMAGE_CACHE.max_bytes = args.image_cache_mb * 1024 * 1024
+
     print("Loading Alpamayo model... (This will take a moment)")
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model = Alpamayo1_5.from_pretrained(
-        "nvidia/Alpamayo-1.5-10B", 
+        MODEL_NAME, 
         dtype=torch.bfloat16,
         attn_implementation="eager").to(device)
     if device == "cuda":
@@ -280,6 +351,9 @@ def main():
         model = torch.compile(model)
     
     processor = helper.get_processor(model.tokenizer)
+    vision_cache = (
+        VisionEmbeddingCache(args.vision_cache_mb * 1024 * 1024) if args.vision_cache_mb > 0 else None
+    )
 
     all_segments = sorted([d for d in glob.glob(os.path.join(args.route, 'segment_*')) if os.path.isdir(d)])
     if args.segment:
@@ -344,43 +418,80 @@ def main():
         )
 
         route_name = os.path.basename(os.path.abspath(args.route))
-        for local_idx in range(start_frame, end_frame + 1):
-            if interrupt_flag[0]:
-                break
-
-            try:
-                data = load_custom_dataset(seg_dir, local_idx, exclude_cameras=excluded_cameras)
-            except Exception as e:
-                print(f"Error loading data for {seg_name} frame {local_idx}: {e}")
-                continue
+        write_store = args.prediction_format in ("store", "both")
+        write_json = args.prediction_format in ("json", "both")
+        manifest, store, skip_frames = open_segment_export(
+            prediction_json_dir(args, seg_dir),
+            export_params(args),
+            prediction_store_metadata(args, route_name, seg_name) if write_store else None,
+            range(start_frame, end_frame + 1),
+            reset=args.overwrite,
+            json_path=(
+                (lambda idx: prediction_json_path(args, seg_dir, seg_name, idx)) if write_json else None
+            ),
+        )
+        if manifest.discarded_frames:
+            print(
+                f"Export parameters changed since the last run; "
+                f"re-exporting {manifest.discarded_frames} previously completed frames."
+            )
+        if skip_frames:
+            print(f"Resuming: {len(skip_frames)} frames already exported with matching parameters.")
+
+        frames = iter_custom_dataset(
+            seg_dir,
+            start_frame,
+            end_frame,
+            exclude_cameras=excluded_cameras,
+            workers=args.loader_workers,
+            prefetch=args.prefetch_frames,
+            should_stop=lambda: interrupt_flag[0],
+            skip_frames=skip_frames,
+        )
 
-            gt_xyz = data["ego_future_xyz"][0, 0].numpy()
-            
-            nav_cmd = infer_navigation_command(gt_xyz)
+        inference_seconds = [0.0]
+        inference_frames = [0]
+        IMAGE_CACHE.reset_stats()
+        if vision_cache is not None:
+            vision_cache.reset_stats()
 
+        def process_batch(pending: list[tuple[int, dict, np.ndarray, str]]) -> None:
             # Set fixed seed to match the nav notebook exactly for deterministic conditional inference
             torch.cuda.manual_seed_all(42)
 
-            cot = ""
-            pred_xyz_nav, _, extra_nav = run_nav_inference(
+            start = time.perf_counter()
+            outputs = run_nav_inference_batch(
                 model=model,
                 processor=processor,
-                data=data,
+                batch=[data for _, data, _, _ in pending],
                 device=device,
-                nav_cmd=nav_cmd,
+                nav_cmds=[nav_cmd for _, _, _, nav_cmd in pending],
                 num_traj_samples=args.num_traj_samples,
                 guidance_weight=args.guidance_weight,
                 max_gen_length=args.max_gen_length,
+                fused_guidance=args.fused_guidance,
+                vision_cache=vision_cache,
+                diffusion_overrides=diffusion_overrides(args),
             )
+            inference_seconds[0] += time.perf_counter() - start
+            inference_frames[0] += len(pending)
+
+            # Score every frame of the batch in one pass on a (frames, samples, T, 3) array.
+            selection = select_prediction_paths(
+                torch.stack([pred_xyz[0, 0] for pred_xyz, _, _ in outputs]),
+                [nav_cmd for _, _, _, nav_cmd in pending],
+                args.frames,
+                selection_mode=args.selection_mode,
+            )
+            selected_frames = selection.n_frames
+
+            for i, ((local_idx, data, gt_xyz, nav_cmd), (_, _, extra)) in enumerate(
+                zip(pending, outputs)
+            ):
+                cmd_text = nav_cmd
+                selected_path = selection.selected_paths[i]
+                sample_idx = int(selection.sample_indices[i])
 
-            for cmd_text, pred_xyz, extra in [(nav_cmd, pred_xyz_nav, extra_nav)]:
-                selected_path, selected_frames, sample_idx, _ = select_prediction_path(
-                    pred_xyz,
-                    cmd_text,
-                    args.frames,
-                    selection_mode=args.selection_mode,
-                )
-                
                 cot = extract_cot(extra, sample_idx)
                 if args.selection_mode == "heuristic":
                     print(
@@ -394,22 +505,82 @@ def main():
                         f"Representative Reasoning: \033[38;2;255;165;0m{cot}\033[0m"
                     )
 
-                save_prediction_json(
-                    args=args,
-                    route_name=route_name,
-                    seg_name=seg_name,
-                    seg_dir=seg_dir,
-                    local_idx=local_idx,
-                    nav_cmd=nav_cmd,
-                    cmd_text=cmd_text,
-                    cot=cot,
-                    sample_idx=sample_idx,
-                    selected_path=selected_path,
-                    gt_xyz=gt_xyz,
-                    n_frames=selected_frames,
-                    data=data,
-                )
-        print(f"Finished writing prediction JSON for {seg_name}.")
+                if store is not None:
+                    store.append(
+                        frame_index=local_idx,
+                        selected_path=selected_path,
+                        ground_truth_path=gt_xyz[:selected_frames],
+                        nav_command=nav_cmd,
+                        command_text=cmd_text,
+                        reasoning_text=cot,
+                        selected_sample_index=sample_idx,
+                        clip_id=data.get("clip_id"),
+                        t0_us=data.get("t0_us"),
+                        frames_requested=args.frames,
+                    )
+                if write_json:
+                    save_prediction_json(
+                        args=args,
+                        route_name=route_name,
+                        seg_name=seg_name,
+                        seg_dir=seg_dir,
+                        local_idx=local_idx,
+                        nav_cmd=nav_cmd,
+                        cmd_text=cmd_text,
+                        cot=cot,
+                        sample_idx=sample_idx,
+                        selected_path=selected_path,
+                        gt_xyz=gt_xyz,
+                        n_frames=selected_frames,
+                        data=data,
+                    )
+                manifest.mark_complete(local_idx)
+
+        pending = []
+        for local_idx, data, load_error in frames:
+            if interrupt_flag[0]:
+                break
+
+            if load_error is not None:
+                print(f"Error loading data for {seg_name} frame {local_idx}: {load_error}")
+                continue
+
+            gt_xyz = data["ego_future_xyz"][0, 0].numpy()
+            
+            nav_cmd = infer_navigation_command(gt_xyz)
+            pending.append((local_idx, data, gt_xyz, nav_cmd))
+
+            if len(pending) >= max(args.batch_size, 1):
+                process_batch(pending)
+                pending = []
+
+        if pending and not interrupt_flag[0]:
+            process_batch(pending)
+        frames.close()
+        if store is not None:
+            store.close()
+        print(f"Finished writing predictions for {seg_name}.")
+        cache_stats = IMAGE_CACHE.stats()
+        print(
+            f"Image cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.1%} hit rate), "
+            f"{cache_stats['bytes'] / 2**20:.0f} MiB resident."
+        )
+        if inference_frames[0]:
+            print(
+                f"Inference: {inference_frames[0]} frames, "
+                f"{inference_seconds[0] / inference_frames[0] * 1e3:.0f} ms/frame."
+            )
+        if vision_cache is not None:
+            vision_stats = vision_cache.stats()
+            encoded = vision_stats["encoded_images"]
+            print(
+                f"Vision cache: {vision_stats['hits']} hits, {vision_stats['misses']} misses "
+                f"({vision_stats['hit_rate']:.1%} hit rate), {encoded} images encoded in "
+                f"{vision_stats['encode_seconds']:.1f}s"
+                + (f" ({vision_stats['encode_seconds'] / encoded * 1e3:.1f} ms/image)" if encoded else "")
+                + f", {vision_stats['bytes'] / 2**20:.0f} MiB resident."
+            )
         
         if interrupt_flag[0]:
             print("Processing stopped early by user.")
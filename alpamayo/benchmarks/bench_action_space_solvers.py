@@ -0,0 +1,100 @@
+"""Benchmark UnicycleAccelCurvatureActionSpace.traj_to_action: dense vs. cached/banded solvers.
+
+The dense baseline is the per-call ``construct_DTD`` + ``torch.linalg.cholesky`` path, which
+``solve_xs_eq_y`` / ``solve_single_constraint`` still use for per-element smoothing weights.
+
+Example:
+  python benchmarks/bench_action_space_solvers.py
+  python benchmarks/bench_action_space_solvers.py --trajectories 10000 --device cuda
+"""
+
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+import torch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from alpamayo1_5.action_space import UnicycleAccelCurvatureActionSpace, utils
+
+
+def synthetic_batch(n: int, n_history: int, n_waypoints: int, dt: float, device: str):
+    """Smooth constant-turn trajectories ending at the origin, like the model's ego frame."""
+    g = torch.Generator().manual_seed(0)
+    speed = 5.0 + 10.0 * torch.rand(n, 1, generator=g)
+    yaw_rate = 0.3 * (torch.rand(n, 1, generator=g) - 0.5)
+    t = torch.arange(-n_history + 1, n_waypoints + 1, dtype=torch.float32) * dt
+    yaw = yaw_rate * t
+    xyz = torch.stack(
+        [
+            speed * torch.cumsum(torch.cos(yaw), -1) * dt,
+            speed * torch.cumsum(torch.sin(yaw), -1) * dt,
+        ],
+        dim=-1,
+    )
+    xyz = xyz - xyz[:, n_history - 1 : n_history]
+    xyz = torch.cat([xyz, torch.zeros_like(xyz[..., :1])], dim=-1)
+    cos, sin = torch.cos(yaw), torch.sin(yaw)
+    rot = torch.zeros(n, t.shape[0], 3, 3)
+    rot[..., 0, 0], rot[..., 0, 1], rot[..., 1, 0], rot[..., 1, 1] = cos, -sin, sin, cos
+    rot[..., 2, 2] = 1.0
+    tensors = (xyz[:, :n_history], rot[:, :n_history], xyz[:, n_history:], rot[:, n_history:])
+    return [tensor.to(device) for tensor in tensors]
+
+
+def dense_weight(w):
+    raise TypeError("force the dense solver")
+
+
+def best_of(fn, repeats: int, device: str) -> float:
+    timings = []
+    for _ in range(repeats):
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trajectories", type=int, default=10_000, help="Trajectories per call")
+    parser.add_argument("--history", type=int, default=16, help="History waypoints")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is reported)")
+    parser.add_argument("--device", default="cpu", help="Torch device")
+    args = parser.parse_args()
+
+    action_space = UnicycleAccelCurvatureActionSpace().to(args.device)
+    batch = synthetic_batch(
+        args.trajectories, args.history, action_space.n_waypoints, action_space.dt, args.device
+    )
+
+    def run():
+        return action_space.traj_to_action(*batch)
+
+    with mock.patch.object(utils, "_static_weight", dense_weight):
+        reference = run()
+        dense_s = best_of(run, args.repeats, args.device)
+
+    action = run()
+    cached_s = best_of(run, args.repeats, args.device)
+    max_err = float((action - reference).abs().max())
+
+    print(
+        f"traj_to_action: {args.trajectories} trajectories x {action_space.n_waypoints} waypoints"
+    )
+    print(f"  dense construct_DTD + cholesky : {dense_s * 1e3:10.1f} ms")
+    print(
+        f"  cached factor / banded solver  : {cached_s * 1e3:10.1f} ms  ({dense_s / cached_s:.1f}x)"
+    )
+    print(f"  max |action| difference        : {max_err:.3e}")
+
+
+if __name__ == "__main__":
+    main()
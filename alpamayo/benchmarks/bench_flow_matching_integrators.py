@@ -0,0 +1,111 @@
+"""Benchmark FlowMatching integrators: sample error versus vector field evaluations (NFE).
+
+The vector field is the exact flow matching velocity of a Gaussian mixture over smooth
+(n_waypoints, 2) trajectories, so it runs on CPU without model weights. Every integrator
+and time schedule starts from the same noise and is compared against a 1000-step Heun
+reference solution. With classifier free guidance every NFE costs two expert forwards
+(one with --fused-guidance).
+
+Example:
+  python benchmarks/bench_flow_matching_integrators.py
+  python benchmarks/bench_flow_matching_integrators.py --nfe 4 8 16 --modes 3 --mode-std 0.02
+"""
+
+import argparse
+import os
+import sys
+
+import torch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from alpamayo1_5.diffusion.flow_matching import NFE_PER_STEP, TIME_SCHEDULES, FlowMatching
+
+
+def trajectory_modes(n_modes: int, n_waypoints: int) -> torch.Tensor:
+    """Constant-turn trajectories fanning out from the origin, [n_modes, n_waypoints, 2]."""
+    g = torch.Generator().manual_seed(0)
+    yaw_rate = torch.linspace(-0.8, 0.8, n_modes)[:, None]
+    speed = 1.5 + torch.rand(n_modes, 1, generator=g)
+    s = torch.linspace(0.0, 1.0, n_waypoints)
+    yaw = yaw_rate * s
+    ds = 1.0 / n_waypoints
+    return torch.stack(
+        [
+            speed * torch.cumsum(torch.cos(yaw), -1) * ds,
+            speed * torch.cumsum(torch.sin(yaw), -1) * ds,
+        ],
+        dim=-1,
+    )
+
+
+def mixture_velocity(modes: torch.Tensor, mode_std: float):
+    """Exact marginal velocity of the linear path from N(0, I) to an equal-weight mixture.
+
+    For component k, x_t ~ N(t mu_k, var_t I) with var_t = t^2 std^2 + (1 - t)^2 and
+    E[data - noise | x_t, k] = mu_k + (t std^2 - (1 - t)) (x_t - t mu_k) / var_t.
+    """
+    mu = modes.flatten(1)  # [K, D]
+
+    def step_fn(*, x: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
+        x_flat = x.flatten(1)  # [B, D]
+        t = t.flatten()[0]
+        var_t = t**2 * mode_std**2 + (1 - t) ** 2
+        residual = x_flat[:, None, :] - t * mu[None]  # [B, K, D]
+        log_weights = -(residual**2).sum(-1) / (2 * var_t)
+        weights = torch.softmax(log_weights, dim=-1)  # [B, K]
+        component_v = mu[None] + (t * mode_std**2 - (1 - t)) * residual / var_t
+        return (weights[..., None] * component_v).sum(1).view_as(x)
+
+    return step_fn
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2048, help="Trajectories sampled per run")
+    parser.add_argument("--waypoints", type=int, default=64, help="Waypoints per trajectory")
+    parser.add_argument("--modes", type=int, default=6, help="Mixture components")
+    parser.add_argument(
+        "--mode-std", type=float, default=0.05, help="Standard deviation of every component"
+    )
+    parser.add_argument(
+        "--nfe", type=int, nargs="+", default=[2, 4, 6, 8, 10, 16], help="Evaluation budgets"
+    )
+    args = parser.parse_args()
+
+    modes = trajectory_modes(args.modes, args.waypoints)
+    step_fn = mixture_velocity(modes, args.mode_std)
+    diffusion = FlowMatching(x_dims=(args.waypoints, 2))
+
+    def run(int_method: str, n_steps: int, schedule: str) -> torch.Tensor:
+        torch.manual_seed(0)
+        return diffusion.sample(
+            batch_size=args.samples,
+            step_fn=step_fn,
+            int_method=int_method,
+            inference_step=n_steps,
+            time_schedule=schedule,
+        )
+
+    reference = run("heun", 1000, "uniform")
+    print(
+        f"{args.samples} samples, {args.modes} modes of {args.waypoints} waypoints; "
+        f"error = mean waypoint distance to the 1000-step Heun reference (Euler at 10 NFE is the default)"
+    )
+    print(f"{'method':<14} {'schedule':<10}" + "".join(f"{f'NFE {nfe}':>11}" for nfe in args.nfe))
+    for int_method, nfe_per_step in NFE_PER_STEP.items():
+        for schedule in TIME_SCHEDULES:
+            row = f"{int_method:<14} {schedule:<10}"
+            for nfe in args.nfe:
+                n_steps = nfe // nfe_per_step
+                if n_steps < 1:
+                    row += f"{'-':>11}"
+                    continue
+                samples = run(int_method, n_steps, schedule)
+                error = (samples - reference).norm(dim=-1).mean().item()
+                row += f"{error:11.4f}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark route pose integration: per-sample loop vs. vectorized NumPy vs. batched torch.
+
+Example:
+  python benchmarks/bench_pose_integration.py
+  python benchmarks/bench_pose_integration.py --samples 100000 --routes 8 --device cuda
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from alpamayo1_5.load_custom_dataset import _integrate_segment_pose, integrate_pose_batch
+
+
+def integrate_loop(timestamps_s, speeds_m_s, yaw_rates_rad_s):
+    """The original per-sample midpoint integrator, kept as the baseline."""
+    n = timestamps_s.shape[0]
+    xyz = np.zeros((n, 3), dtype=np.float64)
+    theta = np.zeros(n, dtype=np.float64)
+    for i in range(1, n):
+        dt = max(float(timestamps_s[i] - timestamps_s[i - 1]), 0.0)
+        v_mid = 0.5 * (speeds_m_s[i - 1] + speeds_m_s[i])
+        w_mid = 0.5 * (yaw_rates_rad_s[i - 1] + yaw_rates_rad_s[i])
+        theta_mid = theta[i - 1] + 0.5 * w_mid * dt
+        xyz[i, 0] = xyz[i - 1, 0] + v_mid * np.cos(theta_mid) * dt
+        xyz[i, 1] = xyz[i - 1, 1] + v_mid * np.sin(theta_mid) * dt
+        theta[i] = theta[i - 1] + w_mid * dt
+    return xyz, np.unwrap(theta)
+
+
+def synthetic_route(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    timestamps_s = np.cumsum(rng.uniform(0.045, 0.055, n))
+    speeds_m_s = np.clip(12.0 + np.cumsum(rng.normal(0.0, 0.05, n)), 0.0, None)
+    yaw_rates_rad_s = 0.2 * np.sin(np.linspace(0.0, 200.0, n)) + rng.normal(0.0, 0.01, n)
+    return timestamps_s, speeds_m_s, yaw_rates_rad_s
+
+
+def best_of(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=100_000, help="Samples per route")
+    parser.add_argument("--routes", type=int, default=8, help="Routes in the batched torch run")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats (best is reported)")
+    parser.add_argument("--device", default="cpu", help="Torch device for the batched path")
+    args = parser.parse_args()
+
+    route = synthetic_route(args.samples)
+
+    loop_s = best_of(lambda: integrate_loop(*route), repeats=1)
+    numpy_s = best_of(lambda: _integrate_segment_pose(*route), args.repeats)
+
+    ref_xyz, ref_theta = integrate_loop(*route)
+    xyz, theta = _integrate_segment_pose(*route)
+    max_xy_err = float(np.abs(xyz - ref_xyz).max())
+    max_theta_err = float(np.abs(theta - ref_theta).max())
+
+    routes = [synthetic_route(args.samples, seed=seed) for seed in range(args.routes)]
+    batch = [torch.from_numpy(np.stack(column)).to(args.device) for column in zip(*routes)]
+
+    def run_torch():
+        integrate_pose_batch(*batch)
+        if batch[0].is_cuda:
+            torch.cuda.synchronize()
+
+    run_torch()
+    torch_s = best_of(run_torch, args.repeats)
+
+    print(f"Synthetic route: {args.samples} samples")
+    print(f"  python loop      : {loop_s * 1e3:10.2f} ms")
+    print(f"  numpy cumsum     : {numpy_s * 1e3:10.2f} ms  ({loop_s / numpy_s:.1f}x)")
+    print(f"  max |xy| error   : {max_xy_err:.3e} m")
+    print(f"  max |theta| error: {max_theta_err:.3e} rad")
+    print(
+        f"  torch batch      : {torch_s * 1e3:10.2f} ms for {args.routes} routes on {args.device} "
+        f"({torch_s / args.routes * 1e3:.2f} ms/route)"
+    )
+
+
+if __name__ == "__main__":
+    main()
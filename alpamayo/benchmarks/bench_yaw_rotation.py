@@ -0,0 +1,102 @@
+"""Benchmark get_yaw_rotation_matrices: per-window polyfit loop vs. Savitzky-Golay kernels.
+
+Example:
+  python benchmarks/bench_yaw_rotation.py
+  python benchmarks/bench_yaw_rotation.py --batch 1024 --waypoints 64 --device cuda
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from alpamayo1_5.models.delta_tokenizer import (
+    get_yaw_rotation_matrices,
+    get_yaw_rotation_matrices_torch,
+)
+
+
+def yaw_rotation_loop(trajectory, window_size=10, poly_order=3):
+    """The original per-batch, per-waypoint polyfit, kept as the baseline."""
+    B, N = trajectory.shape[:2]
+    rotation_matrices = np.zeros((B, N, 3, 3))
+    for b in range(B):
+        for i in range(N):
+            start_idx = max(0, i - window_size // 2)
+            end_idx = min(N, start_idx + window_size)
+            if end_idx - start_idx < window_size:
+                start_idx = max(0, end_idx - window_size)
+            window_points = trajectory[b, start_idx:end_idx]
+            t = np.arange(len(window_points))
+            x_deriv = np.polyder(np.polyfit(t, window_points[:, 0], poly_order))
+            y_deriv = np.polyder(np.polyfit(t, window_points[:, 1], poly_order))
+            center_t = min(i - start_idx, window_size - 1)
+            yaw = np.arctan2(np.polyval(y_deriv, center_t), np.polyval(x_deriv, center_t))
+            cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+            rotation_matrices[b, i] = [[cos_yaw, -sin_yaw, 0], [sin_yaw, cos_yaw, 0], [0, 0, 1]]
+    return rotation_matrices
+
+
+def synthetic_trajectories(batch: int, n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    yaw = np.cumsum(rng.normal(0.0, 0.05, (batch, n)), axis=1)
+    step = rng.uniform(0.5, 2.0, (batch, 1))
+    xyz = np.zeros((batch, n, 3))
+    xyz[..., 0] = np.cumsum(step * np.cos(yaw), axis=1)
+    xyz[..., 1] = np.cumsum(step * np.sin(yaw), axis=1)
+    return xyz
+
+
+def best_of(fn, repeats: int, device: str = "cpu") -> float:
+    timings = []
+    for _ in range(repeats):
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch", type=int, default=1024, help="Trajectories per call")
+    parser.add_argument("--waypoints", type=int, default=64, help="Waypoints per trajectory")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats (best is reported)")
+    parser.add_argument("--device", default="cpu", help="Torch device for the torch path")
+    args = parser.parse_args()
+
+    trajectory = synthetic_trajectories(args.batch, args.waypoints)
+    trajectory_t = torch.from_numpy(trajectory).to(args.device)
+
+    reference = yaw_rotation_loop(trajectory)
+    loop_s = best_of(lambda: yaw_rotation_loop(trajectory), 1)
+    numpy_s = best_of(lambda: get_yaw_rotation_matrices(trajectory), args.repeats)
+    torch_s = best_of(
+        lambda: get_yaw_rotation_matrices_torch(trajectory_t), args.repeats, args.device
+    )
+
+    numpy_err = np.abs(get_yaw_rotation_matrices(trajectory) - reference).max()
+    torch_err = np.abs(
+        get_yaw_rotation_matrices_torch(trajectory_t).cpu().numpy() - reference
+    ).max()
+
+    print(f"get_yaw_rotation_matrices: B={args.batch}, N={args.waypoints}")
+    print(f"  polyfit loop          : {loop_s * 1e3:10.1f} ms")
+    print(
+        f"  SG kernel (numpy)     : {numpy_s * 1e3:10.2f} ms  ({loop_s / numpy_s:.0f}x)  max err {numpy_err:.1e}"
+    )
+    print(
+        f"  SG kernel (torch)     : {torch_s * 1e3:10.2f} ms  ({loop_s / torch_s:.0f}x)  max err {torch_err:.1e}"
+    )
+
+
+if __name__ == "__main__":
+    main()
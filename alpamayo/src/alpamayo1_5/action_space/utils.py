@@ -158,6 +158,217 @@ def construct_DTD(
     return DTD
 
 
+# Factorizations depend only on (N, smoothing weights, lam, ridge, dt, dtype, device) and the
+# uniform data weight, all fixed per action-space instance, so they are computed once.
+_DTD_CACHE: dict[tuple, torch.Tensor] = {}
+_FACTOR_CACHE: dict[tuple, torch.Tensor] = {}
+_MAX_CACHE_ENTRIES = 64
+# A singular system is retried with a ridge of at least _MIN_RETRY_RIDGE, increased tenfold per retry
+_MIN_RETRY_RIDGE = 1e-6
+_MAX_RIDGE_RETRIES = 8
+
+
+def _static_weight(w: float | torch.Tensor | None) -> float | None:
+    """Return a hashable scalar smoothing weight, raising TypeError for per-element weights."""
+    if w is None:
+        return None
+    if isinstance(w, (float, int)):
+        return float(w)
+    raise TypeError("per-element smoothing weights are not cacheable")
+
+
+def _cache_put(cache: dict, key: tuple, value: torch.Tensor) -> torch.Tensor:
+    if len(cache) >= _MAX_CACHE_ENTRIES:
+        cache.pop(next(iter(cache)))
+    cache[key] = value
+    return value
+
+
+def cached_DTD(
+    N: int,
+    device: torch.device,
+    dtype: torch.dtype,
+    w_smooth1: float | None = None,
+    w_smooth2: float | None = None,
+    w_smooth3: float | None = None,
+    lam: float = 1e-3,
+    dt: float = 1.0,
+) -> torch.Tensor:
+    """Return the unbatched (N, N) ``construct_DTD`` matrix for scalar weights, built once."""
+    key = (N, w_smooth1, w_smooth2, w_smooth3, lam, dt, dtype, str(device))
+    DTD = _DTD_CACHE.get(key)
+    if DTD is None:
+        DTD = construct_DTD(
+            N,
+            (),
+            device=device,
+            dtype=dtype,
+            w_smooth1=w_smooth1,
+            w_smooth2=w_smooth2,
+            w_smooth3=w_smooth3,
+            lam=lam,
+            dt=dt,
+        )
+        DTD = _cache_put(_DTD_CACHE, key, DTD)
+    return DTD
+
+
+def _smoothing_bandwidth(w_smooth1, w_smooth2, w_smooth3) -> int:
+    """Half-bandwidth of D^T D: 1 (tri-), 2 (penta-) or 3 (heptadiagonal)."""
+    if w_smooth3 is not None:
+        return 3
+    if w_smooth2 is not None:
+        return 2
+    return 1
+
+
+def _uniform_value(w: torch.Tensor) -> float | None:
+    """Return the common value of ``w`` if all its elements are equal, otherwise None."""
+    first = w.reshape(-1)[:1]
+    if first.numel() == 0 or not torch.equal(w, first.expand_as(w)):
+        return None
+    return float(first.item())
+
+
+def _retry_ridges(ridge: float):
+    """Yield ``ridge``, then up to ``_MAX_RIDGE_RETRIES`` tenfold larger ridges.
+
+    The retries start from ``_MIN_RETRY_RIDGE`` so that a zero ridge still grows.
+    """
+    yield ridge
+    ridge = max(ridge, _MIN_RETRY_RIDGE)
+    for _ in range(_MAX_RIDGE_RETRIES):
+        ridge *= 10
+        logger.warning(f"Resolving singularity using ridge {ridge}")
+        yield ridge
+
+
+def _singular_system_error(ridge: float) -> RuntimeError:
+    return RuntimeError(
+        f"Smoothing system is not positive definite even with ridge {ridge}; "
+        "check the data weights for NaN or infinite values."
+    )
+
+
+def _cached_cholesky(
+    key: tuple,
+    DTD: torch.Tensor,
+    diag: float,
+    ridge: float,
+) -> torch.Tensor:
+    """Cholesky factor of ``(diag + ridge) * I + DTD``, cached by ``key``.
+
+    Mirrors the dense solver: if the matrix is not positive definite, the ridge is increased
+    (see ``_retry_ridges``) until it is.
+    """
+    L = _FACTOR_CACHE.get(key)
+    if L is not None:
+        return L
+    eye = torch.eye(DTD.shape[-1], dtype=DTD.dtype, device=DTD.device)
+    for trial_ridge in _retry_ridges(ridge):
+        L, info = torch.linalg.cholesky_ex(DTD + (diag + trial_ridge) * eye)
+        if int(info) == 0:
+            return _cache_put(_FACTOR_CACHE, key, L)
+    raise _singular_system_error(trial_ridge)
+
+
+def _cholesky_solve_shared(L: torch.Tensor, rhs: torch.Tensor) -> torch.Tensor:
+    """Solve ``A x = rhs`` for a batch of right-hand sides sharing one factor ``L`` of ``A``."""
+    N = rhs.shape[-1]
+    x = torch.cholesky_solve(rhs.reshape(-1, N).T, L).T
+    return x.reshape(rhs.shape)
+
+
+def _banded_cholesky_solve(
+    bands: list[torch.Tensor],
+    rhs: torch.Tensor,
+) -> torch.Tensor | None:
+    """Solve a batch of symmetric positive definite banded systems.
+
+    Args:
+        bands: ``bands[k][..., i]`` holds ``A[..., i, i - k]`` for ``k = 0..p`` (zero for i < k).
+        rhs: (..., N) right-hand side.
+
+    Returns:
+        x: (..., N), or None if any system is not positive definite.
+    """
+    p = len(bands) - 1
+    N = rhs.shape[-1]
+    A = [band.expand_as(rhs).unbind(-1) for band in bands]
+    # L[i][k] holds the factor entry L[i, i - k].
+    L: list[list[torch.Tensor]] = []
+    min_pivot = None
+    for i in range(N):
+        row = [None] * (min(i, p) + 1)
+        for k in range(min(i, p), 0, -1):
+            j = i - k
+            acc = A[k][i]
+            for m in range(max(0, i - p), j):
+                acc = acc - row[i - m] * L[j][j - m]
+            row[k] = acc / L[j][0]
+        pivot = A[0][i]
+        for k in range(1, len(row)):
+            pivot = pivot - row[k] * row[k]
+        min_pivot = pivot if min_pivot is None else torch.minimum(min_pivot, pivot)
+        row[0] = torch.sqrt(pivot)
+        L.append(row)
+    if not bool((min_pivot > 0).all()):
+        return None
+
+    b = rhs.unbind(-1)
+    z = []
+    for i in range(N):
+        acc = b[i]
+        for k in range(1, len(L[i])):
+            acc = acc - L[i][k] * z[i - k]
+        z.append(acc / L[i][0])
+    x = [None] * N
+    for i in range(N - 1, -1, -1):
+        acc = z[i]
+        for k in range(1, p + 1):
+            if i + k < N:
+                acc = acc - L[i + k][k] * x[i + k]
+        x[i] = acc / L[i][0]
+    return torch.stack(x, dim=-1)
+
+
+def _dtd_bands(DTD: torch.Tensor, bandwidth: int) -> list[torch.Tensor]:
+    """Extract the lower bands of an (N, N) matrix in ``_banded_cholesky_solve`` layout."""
+    N = DTD.shape[-1]
+    bands = []
+    for k in range(bandwidth + 1):
+        band = torch.zeros(N, dtype=DTD.dtype, device=DTD.device)
+        band[k:] = torch.diagonal(DTD, offset=-k)
+        bands.append(band)
+    return bands
+
+
+def _solve_diag_plus_dtd(
+    diag: torch.Tensor,
+    rhs: torch.Tensor,
+    DTD: torch.Tensor,
+    bandwidth: int,
+    ridge: float,
+    cache_key: tuple,
+) -> torch.Tensor:
+    """Solve ``(diag(diag) + DTD + ridge * I) x = rhs`` with a cached or banded factorization.
+
+    A uniform ``diag`` reuses one cached Cholesky factor for the whole batch; otherwise every
+    system is factored with the banded solver in O(N * bandwidth^2).
+    """
+    uniform = _uniform_value(diag)
+    if uniform is not None:
+        L = _cached_cholesky((*cache_key, uniform, ridge), DTD, uniform, ridge)
+        return _cholesky_solve_shared(L, rhs)
+
+    bands = _dtd_bands(DTD, bandwidth)
+    for trial_ridge in _retry_ridges(ridge):
+        x = _banded_cholesky_solve([bands[0] + diag + trial_ridge, *bands[1:]], rhs)
+        if x is not None:
+            return x
+    raise _singular_system_error(trial_ridge)
+
+
 @torch.amp.autocast(device_type="cuda", enabled=False)
 @torch.no_grad()
 @torch._dynamo.disable()
@@ -201,7 +412,25 @@ def solve_single_constraint(
         w_data = torch.ones_like(x_target)
     x_init = torch.as_tensor(x_init, dtype=dtype, device=device)
 
-    # Solve the normal equation
+    try:
+        weights = tuple(_static_weight(w) for w in (w_smooth1, w_smooth2, w_smooth3))
+    except TypeError:
+        weights = None
+    if weights is not None:
+        # The dim is N + 1 because we have x_init as the first element
+        DTD = cached_DTD(N + 1, device, dtype, *weights, lam=lam, dt=dt)
+        rhs = w_data * x_target - DTD[1:, 0] * x_init.unsqueeze(-1)
+        x = _solve_diag_plus_dtd(
+            w_data,
+            rhs,
+            DTD[1:, 1:],
+            _smoothing_bandwidth(*weights),
+            ridge,
+            cache_key=("single", N, *weights, lam, dt, dtype, str(device)),
+        )
+        return torch.cat([x_init.unsqueeze(-1), x], dim=-1)
+
+    # Per-element smoothing weights: solve the dense normal equation
     # (A^TA + D^TD + ridge * I) x = A^T b
     A_data = torch.eye(N, dtype=dtype, device=device).expand(*lead, N, N)
     Aw_data = A_data * w_data.unsqueeze(-1)
@@ -273,7 +502,22 @@ def solve_xs_eq_y(
     if w_data.shape != y.shape:
         raise ValueError("w_data must have the same shape as y")
 
-    # Solve the normal equation
+    try:
+        weights = tuple(_static_weight(w) for w in (w_smooth1, w_smooth2, w_smooth3))
+    except TypeError:
+        weights = None
+    if weights is not None:
+        DTD = cached_DTD(N, device, dtype, *weights, lam=lam, dt=dt)
+        return _solve_diag_plus_dtd(
+            w_data * s * s,
+            w_data * s * y,
+            DTD,
+            _smoothing_bandwidth(*weights),
+            ridge,
+            cache_key=("xs_eq_y", N, *weights, lam, dt, dtype, str(device)),
+        )
+
+    # Per-element smoothing weights: solve the dense normal equation
     # (A^TA + D^TD + ridge * I) x = A^T b
     A_data = torch.diag_embed(s)
     Aw_data = A_data * w_data.unsqueeze(-1)
@@ -13,27 +13,73 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import math
 from typing import Literal
 
 import torch
 from alpamayo1_5.diffusion.base import BaseDiffusion, StepFn
 
+IntMethod = Literal["euler", "midpoint", "heun", "dpm_solver_2m"]
+TimeSchedule = Literal["uniform", "cosine", "quadratic"]
+
+# Vector field evaluations per integration step (doubled by classifier free guidance
+# unless the guided and unguided conditions are fused into one call)
+NFE_PER_STEP = {"euler": 1, "midpoint": 2, "heun": 2, "dpm_solver_2m": 1}
+TIME_SCHEDULES = ("uniform", "cosine", "quadratic")
+
+
+def make_time_steps(
+    num_steps: int, schedule: TimeSchedule = "uniform", device: torch.device = torch.device("cpu")
+) -> torch.Tensor:
+    """Integration times from noise (t=0) to data (t=1).
+
+    Args:
+        num_steps: The number of integration steps.
+        schedule: ``uniform`` spaces the steps evenly, ``cosine`` concentrates them at
+            both ends and ``quadratic`` towards the data end, where the learned
+            trajectories bend the most.
+        device: The device to use.
+
+    Returns:
+        torch.Tensor: [num_steps + 1] increasing times with t[0] = 0 and t[-1] = 1.
+    """
+    s = torch.linspace(0.0, 1.0, num_steps + 1, device=device)
+    if schedule == "uniform":
+        return s
+    if schedule == "cosine":
+        time_steps = (1 - torch.cos(math.pi * s)) / 2
+    elif schedule == "quadratic":
+        time_steps = 1 - (1 - s) ** 2
+    else:
+        raise ValueError(f"Invalid time schedule: {schedule}")
+    time_steps[0], time_steps[-1] = 0.0, 1.0
+    return time_steps
+
 
 class FlowMatching(BaseDiffusion):
     """Flow Matching model.
 
+    Sampling integrates the learned vector field from noise at t=0 to data at t=1
+    along the linear path x_t = (1 - t) * noise + t * data. Besides Euler, the
+    second order ``midpoint`` and ``heun`` methods and the ``dpm_solver_2m``
+    multistep method reach the same accuracy with fewer vector field evaluations;
+    see ``NFE_PER_STEP``.
+
     References:
     Flow Matching for Generative Modeling
         https://arxiv.org/pdf/2210.02747
     Guided Flows for Generative Modeling and Decision Making
         https://arxiv.org/pdf/2311.13443
+    DPM-Solver++: Fast Solver for Guided Sampling of Diffusion Probabilistic Models
+        https://arxiv.org/pdf/2211.01095
     """
 
     def __init__(
         self,
-        int_method: Literal["euler"] = "euler",
+        int_method: IntMethod = "euler",
         num_inference_steps: int = 10,
         inference_guidance_weight: float = 1.0,
+        time_schedule: TimeSchedule = "uniform",
         *args,
         **kwargs,
     ):
@@ -43,11 +89,13 @@ class FlowMatching(BaseDiffusion):
             int_method: The integration method used in inference.
             num_inference_steps: The number of inference steps.
             inference_guidance_weight: The weight of the guidance during inference.
+            time_schedule: The spacing of the inference steps (see ``make_time_steps``).
         """
         super().__init__(*args, **kwargs)
         self.int_method = int_method
         self.num_inference_steps = num_inference_steps
         self.inference_guidance_weight = inference_guidance_weight
+        self.time_schedule = time_schedule
 
     @torch.no_grad()
     def sample(
@@ -58,10 +106,12 @@ class FlowMatching(BaseDiffusion):
         device: torch.device = torch.device("cpu"),
         return_all_steps: bool = False,
         inference_step: int | None = None,
-        int_method: Literal["euler"] | None = None,
+        int_method: IntMethod | None = None,
         use_classifier_free_guidance: bool | None = None,
         inference_guidance_weight: float | None = None,
         temperature: float = 1.0,
+        fused_guidance: bool = False,
+        time_schedule: TimeSchedule | None = None,
         *args,
         **kwargs,
     ) -> torch.Tensor | tuple[torch.Tensor, torch.Tensor]:
@@ -82,6 +132,10 @@ class FlowMatching(BaseDiffusion):
             inference_guidance_weight: The weight of the guidance during inference. (override self.inference_guidance_weight)
             temperature: The temperature for controlling the initial noise. Note that using
                 temperature < 1.0 will result in a more stable sampling with less diversity.
+            fused_guidance: Whether step_fn evaluates both classifier free guidance conditions
+                in one call, on inputs stacked as [guided; unguided] along the batch dimension
+                (2B rows). unguided_step_fn is then not used.
+            time_schedule: The spacing of the inference steps. (override self.time_schedule)
 
         Returns:
             torch.Tensor | tuple[torch.Tensor, torch.Tensor]:
@@ -90,34 +144,42 @@ class FlowMatching(BaseDiffusion):
         """
         int_method = int_method or self.int_method
         inference_step = inference_step or self.num_inference_steps
+        time_schedule = time_schedule or self.time_schedule
         if use_classifier_free_guidance is None:
             use_classifier_free_guidance = self.use_classifier_free_guidance
         if inference_guidance_weight is None:
             inference_guidance_weight = self.inference_guidance_weight
-        if use_classifier_free_guidance and unguided_step_fn is None:
+        if fused_guidance and not use_classifier_free_guidance:
+            raise ValueError("fused_guidance requires classifier free guidance")
+        if use_classifier_free_guidance and not fused_guidance and unguided_step_fn is None:
             raise ValueError("unguided_step_fn is required when using classifier free guidance")
-        if int_method == "euler":
-            return self._euler(
-                batch_size=batch_size,
-                step_fn=step_fn,
-                unguided_step_fn=unguided_step_fn,
-                device=device,
-                return_all_steps=return_all_steps,
-                inference_step=inference_step,
-                inference_guidance_weight=inference_guidance_weight,
-                use_classifier_free_guidance=use_classifier_free_guidance,
-                temperature=temperature,
-            )
-        else:
+        if int_method not in NFE_PER_STEP:
             raise ValueError(f"Invalid integration method: {int_method}")
+        if time_schedule not in TIME_SCHEDULES:
+            raise ValueError(f"Invalid time schedule: {time_schedule}")
+        return self._integrate(
+            int_method=int_method,
+            batch_size=batch_size,
+            step_fn=step_fn,
+            unguided_step_fn=unguided_step_fn,
+            device=device,
+            return_all_steps=return_all_steps,
+            inference_step=inference_step,
+            inference_guidance_weight=inference_guidance_weight,
+            use_classifier_free_guidance=use_classifier_free_guidance,
+            temperature=temperature,
+            fused_guidance=fused_guidance,
+            time_schedule=time_schedule,
+        )
 
     @staticmethod
     def _guided_v(
         step_fn: StepFn,
         x: torch.Tensor,
         t: torch.Tensor,
-        unguided_step_fn: StepFn,
+        unguided_step_fn: StepFn | None,
         inference_guidance_weight: float,
+        fused_guidance: bool = False,
     ) -> torch.Tensor:
         """Guided v for flow matching.
 
@@ -130,13 +192,20 @@ class FlowMatching(BaseDiffusion):
             t: The timestep.
             unguided_step_fn: The denoising step function. (assumed to be without guidance)
             inference_guidance_weight: The weight of the guidance during inference.
+            fused_guidance: Whether step_fn returns [guided; unguided] for inputs stacked
+                along the batch dimension, in which case unguided_step_fn is not used.
         """
-        guided_v = step_fn(x=x, t=t)
-        unguided_v = unguided_step_fn(x=x, t=t)
+        if fused_guidance:
+            v = step_fn(x=torch.cat([x, x]), t=torch.cat([t, t]))
+            guided_v, unguided_v = v.chunk(2)
+        else:
+            guided_v = step_fn(x=x, t=t)
+            unguided_v = unguided_step_fn(x=x, t=t)
         return (1 - inference_guidance_weight) * unguided_v + inference_guidance_weight * guided_v
 
-    def _euler(
+    def _integrate(
         self,
+        int_method: IntMethod,
         batch_size: int,
         step_fn: StepFn,
         unguided_step_fn: StepFn | None = None,
@@ -146,10 +215,19 @@ class FlowMatching(BaseDiffusion):
         inference_guidance_weight: float | None = None,
         use_classifier_free_guidance: bool | None = None,
         temperature: float = 1.0,
+        fused_guidance: bool = False,
+        time_schedule: TimeSchedule = "uniform",
     ) -> torch.Tensor | tuple[torch.Tensor, torch.Tensor]:
-        """Euler integration for flow matching.
+        """ODE integration for flow matching.
+
+        ``midpoint`` and ``heun`` are the explicit second order Runge-Kutta methods.
+        ``dpm_solver_2m`` is the DPM-Solver++(2M) multistep method written for the linear
+        path, where the first order step reduces to Euler: it converts each velocity to a
+        data prediction and extrapolates it from the previous step, at one evaluation
+        per step. Its last step into t=1 is first order.
 
         Args:
+            int_method: The integration method.
             batch_size: The batch size.
             step_fn: The denoising step function that takes a noisy x and a
                 timestep t and returns either a denoised x, a vector field or noise depending on
@@ -163,32 +241,59 @@ class FlowMatching(BaseDiffusion):
             use_classifier_free_guidance: Whether to use classifier free guidance.
             temperature: The temperature for controlling the initial noise. Note that using
                 temperature < 1.0 will result in a more stable sampling with less diversity.
+            fused_guidance: Whether step_fn evaluates [guided; unguided] stacked inputs.
+            time_schedule: The spacing of the inference steps.
         Returns:
             torch.Tensor | tuple[torch.Tensor, torch.Tensor]:
                 The final sampled tensor [B, *x_dims] if return_all_steps is False,
                 otherwise a tuple of all sampled tensors [B, T, *x_dims] and the time steps [T].
         """
         x = torch.randn(batch_size, *self.x_dims, device=device) * temperature
-        time_steps = torch.linspace(0.0, 1.0, inference_step + 1, device=device)
+        time_steps = make_time_steps(inference_step, time_schedule, device=device)
         n_dim = len(self.x_dims)
         if return_all_steps:
             all_steps = [x]
 
-        for i in range(inference_step):
-            dt = time_steps[i + 1] - time_steps[i]
-            dt = dt.view(1, *[1] * n_dim).expand(batch_size, *[1] * n_dim)
-            t_start = time_steps[i].view(1, *[1] * n_dim).expand(batch_size, *[1] * n_dim)
+        def broadcast(value: torch.Tensor) -> torch.Tensor:
+            return value.view(1, *[1] * n_dim).expand(batch_size, *[1] * n_dim)
+
+        def velocity(x: torch.Tensor, t: torch.Tensor) -> torch.Tensor:
             if use_classifier_free_guidance:
-                v = self._guided_v(
+                return self._guided_v(
                     step_fn=step_fn,
                     x=x,
-                    t=t_start,
+                    t=t,
                     unguided_step_fn=unguided_step_fn,
                     inference_guidance_weight=inference_guidance_weight,
+                    fused_guidance=fused_guidance,
                 )
+            return step_fn(x=x, t=t)
+
+        # log-SNR of the linear path (alpha_t = t, sigma_t = 1 - t), for dpm_solver_2m
+        log_snr = torch.log(time_steps) - torch.log1p(-time_steps)
+        prev_data_pred = None
+        for i in range(inference_step):
+            dt = broadcast(time_steps[i + 1] - time_steps[i])
+            t_start = broadcast(time_steps[i])
+            v = velocity(x, t_start)
+            if int_method == "euler":
+                x = x + dt * v
+            elif int_method == "midpoint":
+                x = x + dt * velocity(x + dt / 2 * v, t_start + dt / 2)
+            elif int_method == "heun":
+                v_end = velocity(x + dt * v, broadcast(time_steps[i + 1]))
+                x = x + dt / 2 * (v + v_end)
             else:
-                v = step_fn(x=x, t=t_start)
-            x = x + dt * v
+                # x_{i+1} = ((1 - t_{i+1}) x_i + (t_{i+1} - t_i) D) / (1 - t_i); with D the
+                # data prediction x + (1 - t) v this is exactly the Euler step
+                data_pred = x + (1 - t_start) * v
+                correction = data_pred
+                if prev_data_pred is not None and i < inference_step - 1:
+                    # r = h_{i-1} / h_i; infinite after the t=0 step, so that step stays first order
+                    r = (log_snr[i] - log_snr[i - 1]) / (log_snr[i + 1] - log_snr[i])
+                    correction = data_pred + (data_pred - prev_data_pred) / (2 * r)
+                x = ((1 - time_steps[i + 1]) * x + dt * correction) / (1 - t_start)
+                prev_data_pred = data_pred
             if return_all_steps:
                 all_steps.append(x)
         if return_all_steps:
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Completion manifest for resumable per-segment batch export.
+#
+# The manifest lives in a segment's predictions/ folder and records which
+# frames were exported with which inference parameters. A restarted export
+# skips frames that are already complete for the same parameter hash; any
+# parameter change starts the manifest over.
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILENAME = "export_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    """Write text through a temp file and ``os.replace`` so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(text)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write_json(path: str, payload, indent: int | None = 2) -> None:
+    """Write JSON through a temp file and ``os.replace`` so readers never see a partial file."""
+    atomic_write_text(path, json.dumps(payload, indent=indent))
+
+
+def export_params_hash(params: dict) -> str:
+    """Return a stable hash of the parameters that affect exported predictions."""
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class ExportManifest:
+    """Set of completed frame indices for one segment and one parameter hash."""
+
+    def __init__(self, path: str, params: dict):
+        self.path = path
+        self.params = params
+        self.params_hash = export_params_hash(params)
+        self.completed_frames: set[int] = set()
+        self.discarded_frames = 0
+
+    @classmethod
+    def load(cls, predictions_dir: str, params: dict, reset: bool = False) -> ExportManifest:
+        """Load the manifest for ``params``; a mismatched or unreadable manifest starts empty."""
+        manifest = cls(os.path.join(predictions_dir, MANIFEST_FILENAME), params)
+        if reset or not os.path.exists(manifest.path):
+            return manifest
+
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as handle:
+                stored = json.load(handle)
+        except (OSError, ValueError):
+            return manifest
+
+        completed = [int(idx) for idx in stored.get("completed_frames", [])]
+        if (
+            stored.get("version") == MANIFEST_VERSION
+            and stored.get("params_hash") == manifest.params_hash
+        ):
+            manifest.completed_frames = set(completed)
+        else:
+            manifest.discarded_frames = len(completed)
+        return manifest
+
+    def is_complete(self, frame_idx: int) -> bool:
+        return frame_idx in self.completed_frames
+
+    def mark_complete(self, frame_idx: int, save: bool = True) -> None:
+        self.completed_frames.add(int(frame_idx))
+        if save:
+            self.save()
+
+    def discard(self) -> None:
+        """Forget every completed frame, e.g. because the outputs they refer to were reset."""
+        self.discarded_frames += len(self.completed_frames)
+        self.completed_frames.clear()
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write_json(
+            self.path,
+            {
+                "version": MANIFEST_VERSION,
+                "params_hash": self.params_hash,
+                "params": self.params,
+                "completed_frames": sorted(self.completed_frames),
+            },
+            indent=None,
+        )
@@ -17,6 +17,7 @@ from transformers import AutoProcessor, AutoTokenizer
 
 from typing import Any
 
+import numpy as np
 import torch
 import collections.abc
 
@@ -217,3 +218,70 @@ def to_device(
         return [to_device(elem, device=device, dtype=dtype) for elem in data]
     else:
         return data
+
+
+def collate_tokenized_inputs(
+    inputs: list[collections.abc.Mapping[str, torch.Tensor]],
+    pad_token_id: int,
+) -> dict[str, torch.Tensor]:
+    """Batch per-frame ``processor.apply_chat_template`` outputs into one model input.
+
+    ``input_ids`` and ``attention_mask`` are left-padded to the longest prompt so
+    every frame's generation starts at the same position. Vision tensors
+    (``pixel_values``, ``image_grid_thw``, ...) are stored per image rather than
+    per sample, so they are concatenated along dim 0 in frame order.
+
+    Args:
+        inputs: Tokenized chat templates, each with ``input_ids`` of shape ``(1, L_i)``.
+        pad_token_id: Token ID used for left padding.
+
+    Returns:
+        A dict with ``input_ids`` and ``attention_mask`` of shape ``(B, max(L_i))``
+        plus the concatenated vision tensors.
+    """
+    assert inputs, "collate_tokenized_inputs needs at least one input"
+    max_len = max(item["input_ids"].shape[1] for item in inputs)
+    first_ids = inputs[0]["input_ids"]
+
+    input_ids = torch.full(
+        (len(inputs), max_len), pad_token_id, dtype=first_ids.dtype, device=first_ids.device
+    )
+    attention_mask = torch.zeros((len(inputs), max_len), dtype=torch.long, device=first_ids.device)
+    for i, item in enumerate(inputs):
+        ids = item["input_ids"]
+        assert ids.shape[0] == 1, f"{ids.shape=}, expected a single tokenized prompt"
+        length = ids.shape[1]
+        input_ids[i, max_len - length :] = ids[0]
+        mask = item.get("attention_mask")
+        attention_mask[i, max_len - length :] = 1 if mask is None else mask[0]
+
+    batch = {"input_ids": input_ids, "attention_mask": attention_mask}
+    if "mm_token_type_ids" in inputs[0]:
+        # Newer processors also return a per-token type; padding is text (0)
+        batch["mm_token_type_ids"] = torch.zeros_like(input_ids)
+        for i, item in enumerate(inputs):
+            token_types = item["mm_token_type_ids"]
+            batch["mm_token_type_ids"][i, max_len - token_types.shape[1] :] = token_types[0]
+    for key in inputs[0]:
+        if key not in batch:
+            batch[key] = torch.cat([item[key] for item in inputs], dim=0)
+    return batch
+
+
+def split_batched_predictions(
+    pred_xyz: torch.Tensor,
+    pred_rot: torch.Tensor,
+    extra: dict[str, np.ndarray] | None = None,
+) -> list[tuple[torch.Tensor, torch.Tensor, dict[str, np.ndarray] | None]]:
+    """Split batched sampler outputs back into per-frame ``(pred_xyz, pred_rot, extra)``.
+
+    Each returned item keeps a leading batch dimension of 1 so it matches the
+    output of a single-frame call.
+    """
+    results = []
+    for i in range(pred_xyz.shape[0]):
+        frame_extra = None
+        if extra is not None:
+            frame_extra = {key: value[i : i + 1] for key, value in extra.items()}
+        results.append((pred_xyz[i : i + 1], pred_rot[i : i + 1], frame_extra))
+    return results
@@ -3,13 +3,18 @@
 #
 # Custom dataset loader for Alpamayo inference on route folders.
 
-import json
 import os
+import threading
+from collections import OrderedDict, deque
+from collections.abc import Callable, Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import torch
 from PIL import Image, ImageOps
 
+from alpamayo1_5.telemetry_index import load_telemetry_index
+
 
 CAMERA_DIRS = [
     ("raw_left", 0),   # cross-left
@@ -26,62 +31,79 @@ NOTEBOOKS_DIR = os.path.join(ALPAMAYO_DIR, "notebooks")
 
 ROUTE_CONTEXT_CACHE: dict[str, dict] = {}
 
+IMAGE_SIZE = (640, 480)
+DEFAULT_IMAGE_CACHE_BYTES = 512 * 1024 * 1024
 
-def _timestamp_seconds(data: dict) -> float:
-    """Return telemetry timestamp in seconds."""
-    if "timestamp_seconds" in data:
-        return float(data["timestamp_seconds"])
-    if "timestamp_eof" in data:
-        return float(data["timestamp_eof"]) * 1e-9
-    raise KeyError("Telemetry entry is missing timestamp_seconds/timestamp_eof")
-
-
-def _yaw_rate_rad_s(data: dict, speed_m_s: float) -> float:
-    """Use measured yaw rate when available, otherwise bicycle-model fallback."""
-    yaw_rate = float(data.get("yaw_rate", 0.0))
-    steer_deg = float(data.get("steering_angle_deg", 0.0))
-    if abs(yaw_rate) < 1e-4 and abs(steer_deg) > 0.5:
-        steer_rad = np.deg2rad(steer_deg) / 15.49
-        yaw_rate = speed_m_s * np.tan(steer_rad) / 2.7
-    return yaw_rate
-
-
-def _load_telemetry_series(telemetry_dir: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Load timestamps, longitudinal speed, and yaw rate from telemetry."""
-    json_files = sorted(
-        name for name in os.listdir(telemetry_dir) if name.lower().endswith(".json")
-    )
-    if not json_files:
-        raise FileNotFoundError(f"No telemetry json files found in {telemetry_dir}")
-
-    timestamps_s = []
-    speeds_m_s = []
-    yaw_rates_rad_s = []
-
-    for name in json_files:
-        path = os.path.join(telemetry_dir, name)
-        with open(path, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
 
-        speed_m_s = float(data.get("v_ego", 0.0))
-        yaw_rate_rad_s = _yaw_rate_rad_s(data, speed_m_s)
+class DecodedImageCache:
+    """Thread-safe LRU cache of decoded, padded RGB frames bounded by total bytes.
 
-        if data.get("gear_shifter") == "reverse":
-            speed_m_s = -speed_m_s
-            yaw_rate_rad_s = -yaw_rate_rad_s
-
-        timestamps_s.append(_timestamp_seconds(data))
-        speeds_m_s.append(speed_m_s)
-        yaw_rates_rad_s.append(yaw_rate_rad_s)
-
-    timestamps_s = np.asarray(timestamps_s, dtype=np.float64)
-    speeds_m_s = np.asarray(speeds_m_s, dtype=np.float64)
-    yaw_rates_rad_s = np.asarray(yaw_rates_rad_s, dtype=np.float64)
-
-    if np.any(np.diff(timestamps_s) < 0):
-        raise RuntimeError("Telemetry timestamps are not monotonic")
+    Consecutive export frames share 3 of their 4 image timesteps per camera, so
+    caching the padded ``uint8`` arrays avoids re-decoding most PNGs. Cached
+    arrays are read-only; callers copy them when stacking into tensors.
+    """
 
-    return timestamps_s, speeds_m_s, yaw_rates_rad_s
+    def __init__(self, max_bytes: int = DEFAULT_IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str, int], np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple[str, str, int]) -> np.ndarray | None:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key: tuple[str, str, int], image: np.ndarray) -> None:
+        if image.nbytes > self.max_bytes:
+            return
+        image.flags.writeable = False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = image
+            self.current_bytes += image.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+IMAGE_CACHE = DecodedImageCache()
 
 
 def _resolve_segment_dir(segment_dir: str) -> str:
@@ -171,41 +193,29 @@ def _load_route_context(segment_dir: str) -> dict:
     if cached is not None:
         return cached
 
-    timestamps_parts = []
-    speeds_parts = []
-    yaw_rates_parts = []
-    frame_records: list[tuple[str, int]] = []
-    segment_start_indices: dict[str, int] = {}
-
-    for seg_dir in segment_dirs:
-        telemetry_dir = os.path.join(seg_dir, "telemetry")
-        if not os.path.isdir(telemetry_dir):
-            continue
-
-        timestamps_s, speeds_m_s, yaw_rates_rad_s = _load_telemetry_series(telemetry_dir)
-        if timestamps_s.size == 0:
-            continue
-
-        segment_start_indices[seg_dir] = len(frame_records)
-        frame_records.extend((seg_dir, local_idx) for local_idx in range(len(timestamps_s)))
-        timestamps_parts.append(timestamps_s)
-        speeds_parts.append(speeds_m_s)
-        yaw_rates_parts.append(yaw_rates_rad_s)
-
-    if not timestamps_parts:
+    telemetry_index = load_telemetry_index(cache_key, segment_dirs)
+    if len(telemetry_index) == 0:
         raise FileNotFoundError(f"No telemetry json files found for route context rooted at {segment_dir}")
 
-    timestamps_s = np.concatenate(timestamps_parts)
-    speeds_m_s = np.concatenate(speeds_parts)
-    yaw_rates_rad_s = np.concatenate(yaw_rates_parts)
-
+    timestamps_s = telemetry_index.timestamps_s
     if np.any(np.diff(timestamps_s) < 0):
         raise RuntimeError("Route telemetry timestamps are not monotonic")
 
+    frame_records: list[tuple[str, int]] = []
+    segment_start_indices: dict[str, int] = {}
+    segment_frame_counts: dict[str, int] = {}
+    parent_dir = os.path.dirname(os.path.abspath(segment_dirs[0]))
+    for name in telemetry_index.segment_names:
+        seg_dir = os.path.join(parent_dir, name)
+        start, end = telemetry_index.segment_bounds(name)
+        segment_start_indices[seg_dir] = start
+        segment_frame_counts[seg_dir] = end - start
+        frame_records.extend((seg_dir, local_idx) for local_idx in range(end - start))
+
     absolute_xyz, absolute_theta = _integrate_segment_pose(
         timestamps_s,
-        speeds_m_s,
-        yaw_rates_rad_s,
+        telemetry_index.speeds_m_s,
+        telemetry_index.yaw_rates_rad_s,
     )
 
     context = {
@@ -214,6 +224,7 @@ def _load_route_context(segment_dir: str) -> dict:
         "absolute_theta": absolute_theta,
         "frame_records": frame_records,
         "segment_start_indices": segment_start_indices,
+        "segment_frame_counts": segment_frame_counts,
     }
     ROUTE_CONTEXT_CACHE[cache_key] = context
     return context
@@ -224,24 +235,92 @@ def _integrate_segment_pose(
     speeds_m_s: np.ndarray,
     yaw_rates_rad_s: np.ndarray,
 ) -> tuple[np.ndarray, np.ndarray]:
-    """Integrate absolute XY pose over the segment."""
+    """Integrate absolute XY pose over the segment.
+
+    Midpoint rule: each step advances along the heading at the middle of the
+    interval using the averaged speed and yaw rate, so theta and XY are plain
+    cumulative sums of per-step increments.
+    """
     n = timestamps_s.shape[0]
     xyz = np.zeros((n, 3), dtype=np.float64)
     theta = np.zeros(n, dtype=np.float64)
+    if n < 2:
+        return xyz, theta
 
-    for i in range(1, n):
-        dt = max(float(timestamps_s[i] - timestamps_s[i - 1]), 0.0)
-        v_mid = 0.5 * (speeds_m_s[i - 1] + speeds_m_s[i])
-        w_mid = 0.5 * (yaw_rates_rad_s[i - 1] + yaw_rates_rad_s[i])
-        theta_mid = theta[i - 1] + 0.5 * w_mid * dt
+    dt = np.maximum(np.diff(timestamps_s), 0.0)
+    v_mid = 0.5 * (speeds_m_s[:-1] + speeds_m_s[1:])
+    w_mid = 0.5 * (yaw_rates_rad_s[:-1] + yaw_rates_rad_s[1:])
 
-        xyz[i, 0] = xyz[i - 1, 0] + v_mid * np.cos(theta_mid) * dt
-        xyz[i, 1] = xyz[i - 1, 1] + v_mid * np.sin(theta_mid) * dt
-        theta[i] = theta[i - 1] + w_mid * dt
+    np.cumsum(w_mid * dt, out=theta[1:])
+    theta_mid = theta[:-1] + 0.5 * w_mid * dt
+    np.cumsum(v_mid * np.cos(theta_mid) * dt, out=xyz[1:, 0])
+    np.cumsum(v_mid * np.sin(theta_mid) * dt, out=xyz[1:, 1])
 
     return xyz, np.unwrap(theta)
 
 
+def _unwrap_torch(theta: torch.Tensor) -> torch.Tensor:
+    """Torch equivalent of ``np.unwrap`` along the last dimension."""
+    d_theta = torch.diff(theta, dim=-1)
+    wrapped = torch.remainder(d_theta + torch.pi, 2 * torch.pi) - torch.pi
+    wrapped = torch.where((wrapped == -torch.pi) & (d_theta > 0), torch.pi, wrapped)
+    correction = torch.where(d_theta.abs() < torch.pi, 0.0, wrapped - d_theta)
+    return torch.cat(
+        [theta[..., :1], theta[..., 1:] + torch.cumsum(correction, dim=-1)],
+        dim=-1,
+    )
+
+
+def integrate_pose_batch(
+    timestamps_s: torch.Tensor,
+    speeds_m_s: torch.Tensor,
+    yaw_rates_rad_s: torch.Tensor,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Batched torch version of :func:`_integrate_segment_pose`.
+
+    Args:
+        timestamps_s: Telemetry timestamps, shape ``(..., N)``. Routes shorter
+            than ``N`` can be padded by repeating their last timestamp, which
+            makes the padded steps zero-length.
+        speeds_m_s: Signed longitudinal speed, shape ``(..., N)``.
+        yaw_rates_rad_s: Signed yaw rate, shape ``(..., N)``.
+
+    Returns:
+        ``xyz`` of shape ``(..., N, 3)`` and unwrapped ``theta`` of shape ``(..., N)``,
+        on the device and dtype of ``timestamps_s``.
+    """
+    dt = torch.clamp(torch.diff(timestamps_s, dim=-1), min=0.0)
+    v_mid = 0.5 * (speeds_m_s[..., :-1] + speeds_m_s[..., 1:])
+    w_mid = 0.5 * (yaw_rates_rad_s[..., :-1] + yaw_rates_rad_s[..., 1:])
+
+    zero = torch.zeros_like(timestamps_s[..., :1])
+    theta = torch.cat([zero, torch.cumsum(w_mid * dt, dim=-1)], dim=-1)
+    theta_mid = theta[..., :-1] + 0.5 * w_mid * dt
+    x = torch.cat([zero, torch.cumsum(v_mid * torch.cos(theta_mid) * dt, dim=-1)], dim=-1)
+    y = torch.cat([zero, torch.cumsum(v_mid * torch.sin(theta_mid) * dt, dim=-1)], dim=-1)
+
+    xyz = torch.stack([x, y, torch.zeros_like(x)], dim=-1)
+    return xyz, _unwrap_torch(theta)
+
+
+def _load_padded_image(segment_dir: str, camera_dir: str, local_idx: int) -> np.ndarray:
+    """Decode one camera frame padded to ``IMAGE_SIZE``, going through ``IMAGE_CACHE``."""
+    key = (segment_dir, camera_dir, local_idx)
+    cached = IMAGE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    img_path = os.path.join(segment_dir, camera_dir, f"{local_idx:06d}.png")
+    if not os.path.exists(img_path):
+        return np.zeros((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.uint8)
+
+    img = Image.open(img_path).convert("RGB")
+    img = ImageOps.pad(img, IMAGE_SIZE, method=Image.Resampling.BILINEAR)
+    img_np = np.array(img)
+    IMAGE_CACHE.put(key, img_np)
+    return img_np
+
+
 def _nearest_indices(timestamps_s: np.ndarray, query_times_s: np.ndarray) -> np.ndarray:
     """Find nearest frame indices for a set of timestamps."""
     indices = np.searchsorted(timestamps_s, query_times_s, side="left")
@@ -337,11 +416,11 @@ def load_custom_dataset(
     if abs_segment_dir not in segment_start_indices:
         raise RuntimeError(f"Segment {segment_dir} is missing from the route telemetry context")
 
-    local_timestamps_s, _, _ = _load_telemetry_series(telemetry_dir)
-    if frame_idx < 0 or frame_idx >= len(local_timestamps_s):
+    segment_frame_count = route_context["segment_frame_counts"][abs_segment_dir]
+    if frame_idx < 0 or frame_idx >= segment_frame_count:
         raise IndexError(
             f"frame_idx {frame_idx} is out of range for {segment_dir} "
-            f"(0..{len(local_timestamps_s) - 1})"
+            f"(0..{segment_frame_count - 1})"
         )
 
     timestamps_s = route_context["timestamps_s"]
@@ -419,14 +498,7 @@ def load_custom_dataset(
         images = []
         for idx in image_indices:
             image_segment_dir, image_local_idx = frame_records[int(idx)]
-            img_path = os.path.join(image_segment_dir, dir_name, f"{image_local_idx:06d}.png")
-            if os.path.exists(img_path):
-                img = Image.open(img_path).convert("RGB")
-                img = ImageOps.pad(img, (640, 480), method=Image.Resampling.BILINEAR)
-                img_np = np.array(img)
-            else:
-                img_np = np.zeros((480, 640, 3), dtype=np.uint8)
-            images.append(img_np)
+            images.append(_load_padded_image(image_segment_dir, dir_name, image_local_idx))
 
         cam_tensor = torch.tensor(np.stack(images), dtype=torch.uint8).permute(0, 3, 1, 2)
         all_camera_frames.append(cam_tensor)
@@ -464,6 +536,89 @@ def load_custom_dataset(
     }
 
 
+def iter_custom_dataset(
+    segment_dir: str,
+    start_frame: int,
+    end_frame: int,
+    exclude_cameras: list[int] | None = None,
+    workers: int = 2,
+    prefetch: int | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    skip_frames: Collection[int] | None = None,
+    **loader_kwargs,
+) -> Iterator[tuple[int, dict | None, Exception | None]]:
+    """
+    Yield ``(frame_idx, data, error)`` for frames ``start_frame..end_frame`` (inclusive), in order.
+
+    Up to ``prefetch`` frames (default ``2 * workers``) are decoded ahead of the
+    consumer on a thread pool, so PNG decode and padding overlap with inference.
+    A frame that fails to load is yielded with ``data=None`` and the raised
+    exception as ``error``. ``workers=0`` loads synchronously on the caller's thread.
+
+    ``should_stop`` is polled before each frame is handed out; once it returns
+    True, queued frames are cancelled and the iterator ends after in-flight
+    loads finish. Frames listed in ``skip_frames`` are neither loaded nor yielded.
+    """
+    skip_frames = skip_frames or ()
+    frame_indices = iter(
+        [idx for idx in range(start_frame, end_frame + 1) if idx not in skip_frames]
+    )
+
+    if workers <= 0:
+        for frame_idx in frame_indices:
+            if should_stop is not None and should_stop():
+                return
+            try:
+                data = load_custom_dataset(
+                    segment_dir, frame_idx, exclude_cameras=exclude_cameras, **loader_kwargs
+                )
+            except Exception as exc:
+                yield frame_idx, None, exc
+            else:
+                yield frame_idx, data, None
+        return
+
+    if prefetch is None:
+        prefetch = 2 * workers
+
+    # Build the shared route context once up front instead of racing in every worker.
+    resolved_segment_dir = os.path.abspath(_resolve_segment_dir(segment_dir))
+    if os.path.isdir(os.path.join(resolved_segment_dir, "telemetry")):
+        _load_route_context(resolved_segment_dir)
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="custom_dataset")
+    pending = deque()
+
+    def submit_next() -> None:
+        frame_idx = next(frame_indices, None)
+        if frame_idx is not None:
+            future = pool.submit(
+                load_custom_dataset,
+                segment_dir,
+                frame_idx,
+                exclude_cameras=exclude_cameras,
+                **loader_kwargs,
+            )
+            pending.append((frame_idx, future))
+
+    try:
+        for _ in range(max(prefetch, 1)):
+            submit_next()
+
+        while pending:
+            if should_stop is not None and should_stop():
+                return
+            frame_idx, future = pending.popleft()
+            try:
+                data, error = future.result(), None
+            except Exception as exc:
+                data, error = None, exc
+            submit_next()
+            yield frame_idx, data, error
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
 if __name__ == "__main__":
     segment_dir = "../../datasets/route_1/segment_00"
     frame_idx = 100
@@ -22,6 +22,7 @@ import einops
 import hydra.utils as hyu
 import numpy as np
 import torch
+import transformers
 from transformers import (
     AutoConfig,
     AutoModel,
@@ -34,16 +35,49 @@ from alpamayo1_5.action_space import ActionSpace
 from alpamayo1_5.models.base_model import ReasoningVLA
 from alpamayo1_5.config import Alpamayo1_5Config
 from alpamayo1_5.diffusion.base import BaseDiffusion
+from alpamayo1_5.models.expert_utils import (
+    ExpertMaskFormat,
+    build_expert_pos_ids_and_attn_mask,
+    find_eos_offset,
+    stack_kv_caches,
+)
 from alpamayo1_5.models.token_utils import (
     StopAfterEOS,
     extract_text_tokens,
     replace_padding_after_eos,
     to_special_token,
 )
-from alpamayo1_5.nav_utils import remove_nav_text
+from alpamayo1_5.models.vision_features import SharedImageFeatures, VisionEmbeddingCache
+from alpamayo1_5.nav_utils import get_nav_token_span, remove_nav_text
 
 logger = logging.getLogger(__name__)
 
+# transformers 5 measures the RoPE deltas from the unpadded prompt length
+_ROPE_DELTAS_EXCLUDE_PADDING = int(transformers.__version__.split(".")[0]) >= 5
+
+
+def _prompt_rope_deltas(
+    rope_deltas: torch.Tensor, prompt_mask: torch.Tensor | None, n_rows: int
+) -> torch.Tensor:
+    """Per-row RoPE deltas relative to the padded prompt length, as the expert positions use them.
+
+    Depending on the transformers version, the VLM keeps one delta per prompt or per returned
+    sequence, and measures it from the padded or the unpadded prompt length.
+
+    Args:
+        rope_deltas: [B, 1] or [n_rows, 1] deltas left on the VLM by the last prefill.
+        prompt_mask: [n_rows, L] attention mask of the prompt, or None if it is not padded.
+        n_rows: number of rows (B * num_return_sequences).
+
+    Returns:
+        [n_rows, 1] RoPE deltas.
+    """
+    rope_deltas = rope_deltas.repeat_interleave(n_rows // rope_deltas.shape[0], dim=0)
+    if _ROPE_DELTAS_EXCLUDE_PADDING and prompt_mask is not None:
+        n_padding = prompt_mask.shape[1] - prompt_mask.sum(dim=1, keepdim=True)
+        rope_deltas = rope_deltas - n_padding.to(rope_deltas)
+    return rope_deltas
+
 
 class ExpertLogitsProcessor(LogitsProcessor):
     """Masks out the logits for discrete trajectory tokens."""
@@ -128,88 +162,17 @@ class Alpamayo1_5(ReasoningVLA):
 
         self.post_init()
 
-    @staticmethod
-    def _find_eos_offset(
-        sequences: torch.Tensor,
-        eos_token_id: int,
-        device: torch.device,
-        warn: bool = True,
-    ) -> torch.Tensor:
-        """Find the first eos_token_id position in each sequence and return offset = pos + 1.
-
-        Falls back to the last token position when eos_token_id is not found.
-        The returned offset marks the boundary between VLM-generated tokens and
-        the region where expert diffusion tokens will be appended.
-        """
-        b_star = sequences.shape[0]
-        mask = sequences == eos_token_id
-        has_eos = mask.any(dim=1)  # [b_star]
-        if warn:
-            for i in range(b_star):
-                if not has_eos[i]:
-                    logger.warning(
-                        f"No <traj_future_start> token found in generated sequences"
-                        f" for sequence {i}"
-                    )
-        eos_positions = mask.int().argmax(dim=1)  # [b_star], first occurrence
-        last_positions = torch.full((b_star,), sequences.shape[1] - 1, device=device)
-        return torch.where(has_eos, eos_positions, last_positions) + 1
-
-    @staticmethod
-    def _build_expert_pos_ids_and_attn_mask(
-        offset: torch.Tensor,
-        rope_deltas: torch.Tensor,
-        kv_cache_seq_len: int,
-        n_diffusion_tokens: int,
-        b_star: int,
-        device: torch.device,
-        prefix_mask: torch.Tensor | None = None,
-    ) -> tuple[torch.Tensor, torch.Tensor]:
-        """Build position IDs and 4D attention mask for the expert denoiser.
-
-        Args:
-            offset: [b_star] — token position right after <traj_future_start>.
-            rope_deltas: [b_star, 1] — RoPE delta from the VLM.
-            kv_cache_seq_len: sequence length already in the KV cache.
-            n_diffusion_tokens: number of expert diffusion tokens to append.
-            b_star: batch size (B * num_return_sequences).
-            device: torch device.
-            prefix_mask: [b_star, L] optional 1D attention mask (already repeated
-                to match b_star); zeros mark padding positions that should be
-                masked in the expert's cross-attention to the KV cache.
+    _find_eos_offset = staticmethod(find_eos_offset)
+    _build_expert_pos_ids_and_attn_mask = staticmethod(build_expert_pos_ids_and_attn_mask)
 
-        Returns:
-            position_ids: [3, b_star, n_diffusion_tokens] — Qwen2.5-VL RoPE ids.
-            attention_mask: [b_star, 1, n_diffusion_tokens, KV] — 4D float mask
-                (0 = attend, -inf = masked).
-        """
-        # Qwen2.5-VL uses 3-component (temporal, height, width) RoPE
-        position_ids = torch.arange(n_diffusion_tokens, device=device)
-        position_ids = einops.repeat(position_ids, "l -> 3 b l", b=b_star).clone()
-        position_ids += (rope_deltas + offset[:, None]).to(position_ids.device)
-
-        # [b_star, H, Q, KV] — mask the gap between offset and diffusion tokens
-        attention_mask = torch.zeros(
-            (b_star, 1, n_diffusion_tokens, kv_cache_seq_len + n_diffusion_tokens),
-            dtype=torch.float32,
-            device=device,
-        )
-        for i in range(b_star):
-            attention_mask[i, :, :, offset[i] : -n_diffusion_tokens] = torch.finfo(
-                attention_mask.dtype
-            ).min
-
-        # Propagate input padding mask (left-padding) into the KV prefix region
-        if prefix_mask is not None:
-            # [b_star, H, Q, KV]
-            input_mask = prefix_mask[:, None, None, :]
-            attention_mask[:, :, :, : input_mask.shape[-1]] = torch.where(
-                input_mask == 0,
-                torch.finfo(attention_mask.dtype).min,
-                attention_mask[:, :, :, : input_mask.shape[-1]],
-            )
-
-        return position_ids, attention_mask
+    def _expert_mask_format(self) -> ExpertMaskFormat:
+        """Smallest expert attention mask form the expert's attention implementation accepts."""
+        attn_implementation = self.expert.config._attn_implementation
+        if attn_implementation == "sdpa":
+            return "bool"
+        if attn_implementation == "eager":
+            return "compact"
+        return "dense"
 
     def sample_trajectories_from_data_with_vlm_rollout(
         self,
@@ -220,6 +183,8 @@ class Alpamayo1_5(ReasoningVLA):
         num_traj_samples: int = 6,
         num_traj_sets: int = 1,
         diffusion_kwargs: dict[str, Any] | None = None,
+        vision_cache: VisionEmbeddingCache | None = None,
+        image_cache_keys: list[str] | None = None,
         *args: Any,
         **kwargs: Any,
     ) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
@@ -232,6 +197,10 @@ class Alpamayo1_5(ReasoningVLA):
             temperature: The temperature for sampling.
             num_traj_samples: The number of trajectory samples.
             num_traj_sets: The number of trajectory sets.
+            vision_cache: Optional cache of per-image vision encoder outputs shared
+                across calls, e.g. by overlapping camera windows of consecutive frames.
+            image_cache_keys: Cache key of every image in the batch, in prompt order
+                (see ``vision_features.image_cache_keys``). The cache is only used when both are given.
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
 
@@ -282,14 +251,25 @@ class Alpamayo1_5(ReasoningVLA):
                 )
             ]
         )
-        vlm_outputs = self.vlm.generate(
-            input_ids=input_ids,
-            generation_config=generation_config,
-            stopping_criteria=stopping_criteria,
-            logits_processor=logits_processor,
-            **tokenized_data,
-        )
-        vlm_outputs.rope_deltas = self.vlm.model.rope_deltas
+        # generate repeats pixel_values per returned sequence; encode each image once instead
+        image_features = SharedImageFeatures(
+            self.vlm.model,
+            tokenized_data.get("pixel_values"),
+            tokenized_data.get("image_grid_thw"),
+            input_ids,
+            self.vlm.config.image_token_id,
+            cache=vision_cache,
+            image_keys=image_cache_keys,
+        )
+        with image_features:
+            vlm_outputs = self.vlm.generate(
+                input_ids=input_ids,
+                generation_config=generation_config,
+                stopping_criteria=stopping_criteria,
+                logits_processor=logits_processor,
+                **tokenized_data,
+            )
+        del image_features
 
         # manually replace padding after EOS token
         vlm_outputs.sequences = replace_padding_after_eos(
@@ -310,6 +290,9 @@ class Alpamayo1_5(ReasoningVLA):
         prefix_mask = tokenized_data.get("attention_mask")
         if prefix_mask is not None:
             prefix_mask = torch.repeat_interleave(prefix_mask, n_samples_total, dim=0)
+        vlm_outputs.rope_deltas = _prompt_rope_deltas(
+            self.vlm.model.rope_deltas, prefix_mask, b_star
+        )
         position_ids, attention_mask = self._build_expert_pos_ids_and_attn_mask(
             offset=offset,
             rope_deltas=vlm_outputs.rope_deltas,
@@ -318,6 +301,7 @@ class Alpamayo1_5(ReasoningVLA):
             b_star=b_star,
             device=device,
             prefix_mask=prefix_mask,
+            mask_format=self._expert_mask_format(),
         )
 
         forward_kwargs = {}
@@ -410,6 +394,9 @@ class Alpamayo1_5(ReasoningVLA):
         num_traj_samples: int = 6,
         num_traj_sets: int = 1,
         diffusion_kwargs: dict[str, Any] | None = None,
+        fused_guidance: bool = False,
+        vision_cache: VisionEmbeddingCache | None = None,
+        image_cache_keys: list[str] | None = None,
         *args: Any,
         **kwargs: Any,
     ) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
@@ -422,6 +409,13 @@ class Alpamayo1_5(ReasoningVLA):
             temperature: The temperature for sampling.
             num_traj_samples: The number of trajectory samples.
             num_traj_sets: The number of trajectory sets.
+            fused_guidance: Whether to run the guided and unguided conditions in one expert
+                forward per diffusion step, on their KV caches stacked along the batch
+                dimension. Only used when classifier free guidance is enabled.
+            vision_cache: Optional cache of per-image vision encoder outputs shared
+                across calls, e.g. by overlapping camera windows of consecutive frames.
+            image_cache_keys: Cache key of every image in the batch, in prompt order
+                (see ``vision_features.image_cache_keys``). The cache is only used when both are given.
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
 
@@ -444,6 +438,11 @@ class Alpamayo1_5(ReasoningVLA):
         }
         input_ids = self.fuse_traj_tokens(input_ids, traj_data_vlm)
         device = input_ids.device
+        if diffusion_kwargs is None:
+            diffusion_kwargs = {}
+        fused_guidance = fused_guidance and diffusion_kwargs.get(
+            "use_classifier_free_guidance", self.diffusion.use_classifier_free_guidance
+        )
 
         # 1) run autoregressive generation for the VLM
         max_generation_length = kwargs.get(
@@ -472,17 +471,27 @@ class Alpamayo1_5(ReasoningVLA):
                 )
             ]
         )
-        vlm_outputs = self.vlm.generate(
-            input_ids=input_ids,
-            generation_config=generation_config,
-            stopping_criteria=stopping_criteria,
-            logits_processor=logits_processor,
-            **tokenized_data,
-        )
+        # generate repeats pixel_values per returned sequence; encode each image once instead
+        image_features = SharedImageFeatures(
+            self.vlm.model,
+            tokenized_data.get("pixel_values"),
+            tokenized_data.get("image_grid_thw"),
+            input_ids,
+            self.vlm.config.image_token_id,
+            cache=vision_cache,
+            image_keys=image_cache_keys,
+        )
+        with image_features:
+            vlm_outputs = self.vlm.generate(
+                input_ids=input_ids,
+                generation_config=generation_config,
+                stopping_criteria=stopping_criteria,
+                logits_processor=logits_processor,
+                **tokenized_data,
+            )
         # Free generate outputs we no longer need before building unguided cache
         del vlm_outputs.logits
         torch.cuda.empty_cache()
-        vlm_outputs.rope_deltas = self.vlm.model.rope_deltas
 
         # manually replace padding after EOS token
         vlm_outputs.sequences = replace_padding_after_eos(
@@ -502,21 +511,22 @@ class Alpamayo1_5(ReasoningVLA):
         prefix_mask = tokenized_data.get("attention_mask")
         if prefix_mask is not None:
             prefix_mask = torch.repeat_interleave(prefix_mask, n_samples_total, dim=0)
-        position_ids, attention_mask = self._build_expert_pos_ids_and_attn_mask(
-            offset=offset,
-            rope_deltas=vlm_outputs.rope_deltas,
-            kv_cache_seq_len=prompt_cache.get_seq_length(),
-            n_diffusion_tokens=n_diffusion_tokens,
-            b_star=b_star,
-            device=device,
-            prefix_mask=prefix_mask,
+        vlm_outputs.rope_deltas = _prompt_rope_deltas(
+            self.vlm.model.rope_deltas, prefix_mask, b_star
         )
 
         # 2) construct unguided kv cache
         # Build unguided input_ids by removing <|route_start|>...<|route_end|> span
         unguided_input_ids = []
+        token_types = tokenized_data.get("mm_token_type_ids")
+        unguided_token_types = []
         for i in range(input_ids.shape[0]):
             unguided_input_ids.append(remove_nav_text(input_ids, self.tokenizer, i)[0])
+            if token_types is not None:
+                start, end = get_nav_token_span(input_ids, self.tokenizer, i)
+                unguided_token_types.append(
+                    torch.cat([token_types[i, :start], token_types[i, end + 1 :]])
+                )
         unguided_input_ids = torch.nn.utils.rnn.pad_sequence(
             unguided_input_ids,
             batch_first=True,
@@ -524,17 +534,32 @@ class Alpamayo1_5(ReasoningVLA):
             padding_side="left",
         ).to(device)
         unguided_prefix_mask = unguided_input_ids.ne(self.tokenizer.pad_token_id).long()
+        prefill_kwargs = {}
+        if token_types is not None:
+            # Newer transformers place the images in M-RoPE from the multimodal token types
+            prefill_kwargs["mm_token_type_ids"] = torch.nn.utils.rnn.pad_sequence(
+                unguided_token_types, batch_first=True, padding_value=0, padding_side="left"
+            ).to(device)
 
         # Step 1: Prefill unguided prefix ONCE with original batch (B samples).
-        # Vision encoder runs only once — no pixel_values repetition needed.
-        unguided_prefill_outputs = self.vlm(
-            input_ids=unguided_input_ids,
-            attention_mask=unguided_prefix_mask,
-            image_grid_thw=tokenized_data.get("image_grid_thw"),
-            pixel_values=tokenized_data.get("pixel_values"),
-            use_cache=True,
-            logits_to_keep=1,
+        # Removing the route text leaves the images in place, so the prefill reuses the
+        # image features already encoded for generate instead of running the vision encoder.
+        with image_features:
+            unguided_prefill_outputs = self.vlm(
+                input_ids=unguided_input_ids,
+                attention_mask=unguided_prefix_mask,
+                image_grid_thw=tokenized_data.get("image_grid_thw"),
+                pixel_values=tokenized_data.get("pixel_values"),
+                use_cache=True,
+                logits_to_keep=1,
+                **prefill_kwargs,
+            )
+        logger.debug(
+            "Vision encoder calls: %d, reused: %d",
+            image_features.encoder_calls,
+            image_features.reused_calls,
         )
+        del image_features
 
         # Step 2: Repeat KV cache for n_samples_total (cheap memory copy, no recomputation)
         # Free the prefill outputs first — we only need the KV cache, not the logits
@@ -559,12 +584,19 @@ class Alpamayo1_5(ReasoningVLA):
             device=device,
             dtype=torch.long,
         )
+        # Text positions continue from the prefill's rope deltas, as the VLM derives them
+        # itself during generation
+        unguided_rope_deltas = _prompt_rope_deltas(
+            self.vlm.model.rope_deltas, prefix_mask_repeated, b_star
+        )
+        gen_position_ids = (cache_position[None, :] + unguided_rope_deltas).expand(3, -1, -1)
 
         unguided_vlm_outputs = self.vlm(
             input_ids=generated_tokens,
             attention_mask=full_attention_mask,
             past_key_values=unguided_prompt_cache,
             cache_position=cache_position,
+            position_ids=gen_position_ids,
             use_cache=True,
             logits_to_keep=1,
         )
@@ -585,14 +617,34 @@ class Alpamayo1_5(ReasoningVLA):
         unguided_prefix_mask_repeated = torch.repeat_interleave(
             unguided_prefix_mask, n_samples_total, dim=0
         )
+
+        kv_cache_seq_len = prompt_cache.get_seq_length()
+        unguided_kv_cache_seq_len = unguided_prompt_cache.get_seq_length()
+        if fused_guidance:
+            # Both caches are right-padded to one length when stacked; the padding lies in the
+            # masked gap between each offset and the diffusion tokens.
+            kv_cache_seq_len = unguided_kv_cache_seq_len = max(
+                kv_cache_seq_len, unguided_kv_cache_seq_len
+            )
+        position_ids, attention_mask = self._build_expert_pos_ids_and_attn_mask(
+            offset=offset,
+            rope_deltas=vlm_outputs.rope_deltas,
+            kv_cache_seq_len=kv_cache_seq_len,
+            n_diffusion_tokens=n_diffusion_tokens,
+            b_star=b_star,
+            device=device,
+            prefix_mask=prefix_mask,
+            mask_format=self._expert_mask_format(),
+        )
         unguided_position_ids, unguided_attention_mask = self._build_expert_pos_ids_and_attn_mask(
             offset=unguided_offset,
-            rope_deltas=unguided_vlm_outputs.rope_deltas,
-            kv_cache_seq_len=unguided_prompt_cache.get_seq_length(),
+            rope_deltas=unguided_rope_deltas,
+            kv_cache_seq_len=unguided_kv_cache_seq_len,
             n_diffusion_tokens=n_diffusion_tokens,
             b_star=b_star,
             device=device,
             prefix_mask=unguided_prefix_mask_repeated,
+            mask_format=self._expert_mask_format(),
         )
 
         forward_kwargs = {}
@@ -637,25 +689,41 @@ class Alpamayo1_5(ReasoningVLA):
 
         # 4) Diffusion sampling in action space with multiple samples per input
         total_batch = B * n_samples_total
-        if diffusion_kwargs is None:
-            diffusion_kwargs = {}
+        if fused_guidance:
+            # One expert forward per step over [guided; unguided] rows. stack_kv_caches
+            # releases the source caches layer by layer.
+            fused_cache = stack_kv_caches([prompt_cache, unguided_prompt_cache])
+            torch.cuda.empty_cache()
+            guidance_fns = {
+                "step_fn": partial(
+                    step_fn,
+                    past_key_values=fused_cache,
+                    attention_mask=torch.cat([attention_mask, unguided_attention_mask]),
+                    position_ids=torch.cat([position_ids, unguided_position_ids], dim=1),
+                ),
+                "fused_guidance": True,
+            }
+        else:
+            guidance_fns = {
+                "step_fn": partial(
+                    step_fn,
+                    past_key_values=prompt_cache,
+                    attention_mask=attention_mask,
+                    position_ids=position_ids,
+                ),
+                "unguided_step_fn": partial(
+                    step_fn,
+                    past_key_values=unguided_prompt_cache,
+                    attention_mask=unguided_attention_mask,
+                    position_ids=unguided_position_ids,
+                ),
+            }
 
         sampled_action = self.diffusion.sample(
             batch_size=total_batch,
-            step_fn=partial(
-                step_fn,
-                past_key_values=prompt_cache,
-                attention_mask=attention_mask,
-                position_ids=position_ids,
-            ),
-            unguided_step_fn=partial(
-                step_fn,
-                past_key_values=unguided_prompt_cache,
-                attention_mask=unguided_attention_mask,
-                position_ids=unguided_position_ids,
-            ),
             device=device,
             return_all_steps=False,
+            **guidance_fns,
             **diffusion_kwargs,
         )
 
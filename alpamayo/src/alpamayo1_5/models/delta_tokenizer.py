@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+
 import einops
 import numpy as np
 import torch
@@ -128,9 +130,7 @@ class DeltaTrajectoryTokenizer:
         xyz = xyz * (ego_xyz_max - ego_xyz_min) + ego_xyz_min
         fut_xyz = torch.cumsum(xyz, dim=1)
         if not self._predict_yaw:
-            xyz_cpu = fut_xyz.cpu().numpy().astype(float)
-            fut_rot = get_yaw_rotation_matrices(xyz_cpu)
-            fut_rot = torch.tensor(fut_rot, device=fut_xyz.device, dtype=fut_xyz.dtype)
+            fut_rot = get_yaw_rotation_matrices_torch(fut_xyz.double()).to(fut_xyz.dtype)
             return fut_xyz, fut_rot, None
         yaw_tokens = xyzw[..., 3]
         yaw = yaw_tokens.float() / (self.num_bins - 1)
@@ -154,9 +154,49 @@ class DeltaTrajectoryTokenizer:
         return fut_xyz, fut_rot, None
 
 
+@functools.lru_cache(maxsize=32)
+def savgol_derivative_kernel(
+    n_points: int, window_size: int = 10, poly_order: int = 3
+) -> np.ndarray:
+    """First-derivative Savitzky-Golay filter for a sequence of ``n_points`` samples.
+
+    Row ``i`` holds the weights that give the derivative of the degree-``poly_order``
+    least-squares polynomial fitted to the window around sample ``i``. Windows are
+    shifted (not truncated) at the ends of the sequence, so the edge rows are the
+    asymmetric kernels. Because ``np.polyfit`` is linear in its targets, fitting the
+    identity reproduces the per-window fits exactly.
+
+    Returns:
+        kernel: float64 array of shape (n_points, n_points); ``d = kernel @ x``.
+    """
+    kernel = np.zeros((n_points, n_points), dtype=np.float64)
+    window_fits = {}
+    for i in range(n_points):
+        # Same window placement as the original per-point fit
+        start_idx = max(0, i - window_size // 2)
+        end_idx = min(n_points, start_idx + window_size)
+        if end_idx - start_idx < window_size:
+            start_idx = max(0, end_idx - window_size)
+        length = end_idx - start_idx
+
+        if length not in window_fits:
+            t = np.arange(length)
+            coeffs = np.polyfit(t, np.eye(length), poly_order)  # (poly_order + 1, length)
+            powers = np.arange(poly_order, 0, -1)
+            window_fits[length] = (coeffs[:-1] * powers[:, None], powers - 1)
+        deriv_coeffs, deriv_powers = window_fits[length]
+        center_t = min(i - start_idx, window_size - 1)
+        kernel[i, start_idx:end_idx] = (float(center_t) ** deriv_powers) @ deriv_coeffs
+    kernel.setflags(write=False)
+    return kernel
+
+
 def get_yaw_rotation_matrices(trajectory, window_size=10, poly_order=3):
     """Calculate yaw rotation matrices using polynomial fitting for both x(t) and y(t)
 
+    The per-window polynomial fits are applied as one precomputed Savitzky-Golay
+    derivative filter over the whole batch (see ``savgol_derivative_kernel``).
+
     Args:
         trajectory: np.array of shape (B, N, 3) for batch of x,y,z coordinates
         window_size: size of window for polynomial fitting
@@ -165,52 +205,51 @@ def get_yaw_rotation_matrices(trajectory, window_size=10, poly_order=3):
     Returns:
         rotation_matrices: rotation matrices at each point, shape (B, N, 3, 3)
     """
-    B, N = trajectory.shape[:2]
-    rotation_matrices = []
-
-    for b in range(B):
-        traj_batch = trajectory[b]  # (N, 3)
-        batch_matrices = []
-        batch_yaws = []
-
-        for i in range(N):
-            # Get window indices with padding for edges
-            start_idx = max(0, i - window_size // 2)
-            end_idx = min(N, start_idx + window_size)
-
-            # Adjust window if at edges
-            if end_idx - start_idx < window_size:
-                start_idx = max(0, end_idx - window_size)
+    trajectory = np.asarray(trajectory, dtype=np.float64)
+    kernel = savgol_derivative_kernel(trajectory.shape[1], window_size, poly_order)
+    dxy = kernel @ trajectory[..., :2]  # (B, N, 2)
+    yaw = np.arctan2(dxy[..., 1], dxy[..., 0])
+
+    # Create 3x3 rotation matrices for yaw
+    cos_yaw, sin_yaw = np.cos(yaw), np.sin(yaw)
+    rotation_matrices = np.zeros(yaw.shape + (3, 3), dtype=np.float64)
+    rotation_matrices[..., 0, 0] = cos_yaw
+    rotation_matrices[..., 0, 1] = -sin_yaw
+    rotation_matrices[..., 1, 0] = sin_yaw
+    rotation_matrices[..., 1, 1] = cos_yaw
+    rotation_matrices[..., 2, 2] = 1.0
+    return rotation_matrices
+
+
+def get_yaw_rotation_matrices_torch(
+    trajectory: torch.Tensor, window_size: int = 10, poly_order: int = 3
+) -> torch.Tensor:
+    """Torch version of ``get_yaw_rotation_matrices`` that stays on the input's device.
 
-            # Get points in window
-            window_points = traj_batch[start_idx:end_idx]
-
-            # Use time parameter t
-            t = np.arange(len(window_points))
-
-            # Fit polynomials to both x(t) and y(t)
-            x_coeffs = np.polyfit(t, window_points[:, 0], poly_order)
-            y_coeffs = np.polyfit(t, window_points[:, 1], poly_order)
-
-            # Calculate derivatives at center point
-            center_t = min(i - start_idx, window_size - 1)
-            x_deriv = np.polyder(x_coeffs)
-            y_deriv = np.polyder(y_coeffs)
-
-            dx = np.polyval(x_deriv, center_t)
-            dy = np.polyval(y_deriv, center_t)
-
-            # Calculate yaw angle from dx, dy
-            yaw = np.arctan2(dy, dx)
-            batch_yaws.append(yaw)
-
-            # Create 3x3 rotation matrix for yaw
-            cos_yaw = np.cos(yaw)
-            sin_yaw = np.sin(yaw)
-            rotation_matrix = np.array([[cos_yaw, -sin_yaw, 0], [sin_yaw, cos_yaw, 0], [0, 0, 1]])
-
-            batch_matrices.append(rotation_matrix)
-
-        rotation_matrices.append(batch_matrices)
+    Args:
+        trajectory (torch.Tensor): Batch of x, y, z coordinates. Shape: (B, N, 3).
+        window_size (int): Size of window for polynomial fitting.
+        poly_order (int): Order of polynomial to fit.
 
-    return np.array(rotation_matrices)
+    Returns:
+        torch.Tensor: Rotation matrices at each point. Shape: (B, N, 3, 3).
+    """
+    dtype = torch.promote_types(trajectory.dtype, torch.float32)
+    kernel = torch.tensor(
+        savgol_derivative_kernel(trajectory.shape[1], window_size, poly_order),
+        dtype=dtype,
+        device=trajectory.device,
+    )
+    dxy = kernel @ trajectory[..., :2].to(dtype)  # (B, N, 2)
+    yaw = torch.atan2(dxy[..., 1], dxy[..., 0])
+
+    cos_yaw, sin_yaw = torch.cos(yaw), torch.sin(yaw)
+    zeros, ones = torch.zeros_like(cos_yaw), torch.ones_like(cos_yaw)
+    return torch.stack(
+        [
+            torch.stack([cos_yaw, -sin_yaw, zeros], dim=-1),
+            torch.stack([sin_yaw, cos_yaw, zeros], dim=-1),
+            torch.stack([zeros, zeros, ones], dim=-1),
+        ],
+        dim=-2,
+    )
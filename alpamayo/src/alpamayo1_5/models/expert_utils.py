@@ -0,0 +1,149 @@
+# SPDX-FileCopyrightText: Copyright (c) 2026 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from collections.abc import Sequence
+from typing import Literal
+
+import einops
+import torch
+import torch.nn.functional as F
+from transformers import DynamicCache
+
+logger = logging.getLogger(__name__)
+
+ExpertMaskFormat = Literal["dense", "compact", "bool"]
+
+
+def find_eos_offset(
+    sequences: torch.Tensor,
+    eos_token_id: int,
+    device: torch.device,
+    warn: bool = True,
+) -> torch.Tensor:
+    """Find the first eos_token_id position in each sequence and return offset = pos + 1.
+
+    Falls back to the last token position when eos_token_id is not found.
+    The returned offset marks the boundary between VLM-generated tokens and
+    the region where expert diffusion tokens will be appended.
+    """
+    b_star = sequences.shape[0]
+    mask = sequences == eos_token_id
+    has_eos = mask.any(dim=1)  # [b_star]
+    if warn and not has_eos.all():
+        missing = (~has_eos).nonzero().flatten().tolist()
+        logger.warning(
+            f"No <traj_future_start> token found in generated sequences for sequences {missing}"
+        )
+    eos_positions = mask.int().argmax(dim=1)  # [b_star], first occurrence
+    last_positions = torch.full((b_star,), sequences.shape[1] - 1, device=device)
+    return torch.where(has_eos, eos_positions, last_positions) + 1
+
+
+def build_expert_pos_ids_and_attn_mask(
+    offset: torch.Tensor,
+    rope_deltas: torch.Tensor,
+    kv_cache_seq_len: int,
+    n_diffusion_tokens: int,
+    b_star: int,
+    device: torch.device,
+    prefix_mask: torch.Tensor | None = None,
+    mask_format: ExpertMaskFormat = "dense",
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Build position IDs and 4D attention mask for the expert denoiser.
+
+    The diffusion tokens attend to the whole prefix up to ``offset``, skip the gap
+    between ``offset`` and the end of the KV cache, and attend to each other. That
+    row is the same for every query, so the compact formats store it once and let
+    attention broadcast it over the queries.
+
+    Args:
+        offset: [b_star] — token position right after <traj_future_start>.
+        rope_deltas: [b_star, 1] — RoPE delta from the VLM.
+        kv_cache_seq_len: sequence length already in the KV cache.
+        n_diffusion_tokens: number of expert diffusion tokens to append.
+        b_star: batch size (B * num_return_sequences).
+        device: torch device.
+        prefix_mask: [b_star, L] optional 1D attention mask (already repeated
+            to match b_star); zeros mark padding positions that should be
+            masked in the expert's cross-attention to the KV cache.
+        mask_format: ``dense`` returns the full float mask; ``compact`` the same
+            values with a query dimension of 1, for eager or SDPA attention;
+            ``bool`` a [b_star, 1, 1, KV] boolean mask (True = attend) that SDPA
+            consumes directly.
+
+    Returns:
+        position_ids: [3, b_star, n_diffusion_tokens] — Qwen2.5-VL RoPE ids.
+        attention_mask: [b_star, 1, n_diffusion_tokens, KV] — 4D float mask
+            (0 = attend, -inf = masked). The query dimension is 1 for ``compact``
+            and ``bool``; ``bool`` masks are True where attended.
+    """
+    # Qwen2.5-VL uses 3-component (temporal, height, width) RoPE
+    position_ids = torch.arange(n_diffusion_tokens, device=device)
+    position_ids = einops.repeat(position_ids, "l -> 3 b l", b=b_star).clone()
+    position_ids += (rope_deltas + offset[:, None]).to(position_ids.device)
+
+    # [b_star, KV] — mask the gap between offset and diffusion tokens
+    kv_positions = torch.arange(kv_cache_seq_len + n_diffusion_tokens, device=device)
+    attend = (kv_positions < offset.to(device)[:, None]) | (kv_positions >= kv_cache_seq_len)
+
+    # Propagate input padding mask (left-padding) into the KV prefix region
+    if prefix_mask is not None:
+        prefix_len = prefix_mask.shape[-1]
+        attend[:, :prefix_len] &= prefix_mask.to(device) != 0
+
+    # [b_star, H, Q, KV]
+    attend = attend[:, None, None, :]
+    if mask_format == "bool":
+        return position_ids, attend
+    attention_mask = torch.zeros(attend.shape, dtype=torch.float32, device=device)
+    attention_mask.masked_fill_(~attend, torch.finfo(attention_mask.dtype).min)
+    if mask_format == "dense":
+        attention_mask = attention_mask.expand(-1, -1, n_diffusion_tokens, -1).contiguous()
+    elif mask_format != "compact":
+        raise ValueError(f"Invalid expert mask format: {mask_format}")
+    return position_ids, attention_mask
+
+
+def stack_kv_caches(caches: Sequence[DynamicCache]) -> DynamicCache:
+    """Stack KV caches along the batch dimension, right-padding them to a common length.
+
+    Used to run the guided and unguided CFG conditions in one expert forward.
+    The zero padding sits after every sequence's ``offset``, inside the gap that
+    ``build_expert_pos_ids_and_attn_mask`` already masks, as long as the masks
+    are built with ``kv_cache_seq_len`` set to the stacked cache length.
+
+    The source caches are consumed: each layer is released as soon as it has
+    been stacked, so peak memory grows by one layer rather than a whole cache.
+
+    Args:
+        caches: Caches with the same number of layers, heads and head dims.
+
+    Returns:
+        DynamicCache: Cache with batch ``sum(cache batch sizes)`` and sequence
+            length ``max(cache.get_seq_length())``.
+    """
+    seq_len = max(cache.get_seq_length() for cache in caches)
+    stacked = DynamicCache()
+    for layer_idx in range(len(caches[0].layers)):
+        keys, values = [], []
+        for cache in caches:
+            layer = cache.layers[layer_idx]
+            pad = seq_len - layer.keys.shape[-2]
+            keys.append(F.pad(layer.keys, (0, 0, 0, pad)))
+            values.append(F.pad(layer.values, (0, 0, 0, pad)))
+            layer.keys = layer.values = None
+        stacked.update(torch.cat(keys), torch.cat(values), layer_idx)
+    return stacked
@@ -0,0 +1,366 @@
+# SPDX-FileCopyrightText: Copyright (c) 2026 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Any, NamedTuple, Self
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISION_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class ImageFeatures(NamedTuple):
+    """Vision encoder output for one image."""
+
+    embeds: torch.Tensor  # [tokens, hidden] visual tokens spliced into the prompt
+    deepstack: tuple[torch.Tensor, ...]  # one [tokens, hidden] tensor per deepstack level
+
+    @property
+    def nbytes(self) -> int:
+        return sum(t.numel() * t.element_size() for t in (self.embeds, *self.deepstack))
+
+
+def _split_per_image(features: Any) -> list[ImageFeatures]:
+    """Split the output of ``get_image_features`` into one ``ImageFeatures`` per image.
+
+    transformers 4.x returns ``(per-image embeds, deepstack embeds)`` with each deepstack
+    level concatenated over images; newer versions return a model output whose
+    ``pooler_output`` and ``deepstack_features`` levels are split per image.
+    """
+    if isinstance(features, tuple):
+        image_embeds, deepstack_embeds = features
+        tokens_per_image = [embed.shape[0] for embed in image_embeds]
+        deepstack_embeds = [torch.split(level, tokens_per_image) for level in deepstack_embeds]
+    else:
+        image_embeds, deepstack_embeds = features.pooler_output, features.deepstack_features
+    return [
+        ImageFeatures(embed, tuple(level[i] for level in deepstack_embeds))
+        for i, embed in enumerate(image_embeds)
+    ]
+
+
+def _pack_features(images: Sequence[ImageFeatures], output_type: type) -> Any:
+    """Inverse of ``_split_per_image``: build a ``get_image_features`` output of ``output_type``."""
+    n_levels = len(images[0].deepstack) if images else 0
+    if output_type is tuple:
+        return (
+            tuple(image.embeds for image in images),
+            [torch.cat([image.deepstack[level] for image in images]) for level in range(n_levels)],
+        )
+    return output_type(
+        pooler_output=tuple(image.embeds for image in images),
+        deepstack_features=[
+            tuple(image.deepstack[level] for image in images) for level in range(n_levels)
+        ],
+    )
+
+
+def _images_per_sample(
+    input_ids: torch.Tensor, image_token_id: int, tokens_per_image: list[int]
+) -> list[int] | None:
+    """Number of consecutive images belonging to each row of ``input_ids``."""
+    counts = []
+    image_idx = 0
+    for n_tokens in (input_ids == image_token_id).sum(dim=1).tolist():
+        n_images = 0
+        while n_tokens > 0 and image_idx < len(tokens_per_image):
+            n_tokens -= tokens_per_image[image_idx]
+            image_idx += 1
+            n_images += 1
+        if n_tokens != 0:
+            return None
+        counts.append(n_images)
+    return counts if image_idx == len(tokens_per_image) else None
+
+
+def image_cache_keys(frames: torch.Tensor, image_processor: Any) -> list[str]:
+    """Content keys for ``VisionEmbeddingCache``, one per frame.
+
+    Each key hashes the raw frame together with the image processor's settings
+    (resize bounds, patch and merge sizes, normalization), so the same frame
+    processed differently never shares an entry.
+
+    Args:
+        frames: Camera frames in prompt order, shape ``(N, C, H, W)``.
+        image_processor: The processor's ``image_processor``.
+    """
+    settings = json.dumps(image_processor.to_dict(), sort_keys=True, default=str).encode()
+    settings_digest = hashlib.blake2b(settings, digest_size=16).digest()
+    keys = []
+    for frame in frames:
+        frame = frame.detach().cpu().contiguous()
+        digest = hashlib.blake2b(settings_digest, digest_size=16)
+        digest.update(f"{tuple(frame.shape)}{frame.dtype}".encode())
+        digest.update(frame.numpy().data)
+        keys.append(digest.hexdigest())
+    return keys
+
+
+class VisionEmbeddingCache:
+    """LRU cache of per-image vision encoder outputs bounded by total bytes.
+
+    Each export frame feeds 4 timesteps per camera to the vision tower and
+    consecutive frames share 3 of them, so caching the visual tokens of every
+    image lets ``SharedImageFeatures`` encode only the newest timestep. Entries
+    stay on the device they were encoded on.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_VISION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, ImageFeatures] = OrderedDict()
+        self._lock = threading.Lock()
+        self.output_type: type | None = None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.encoded_images = 0
+        self.encode_seconds = 0.0
+
+    def get(self, key: str) -> ImageFeatures | None:
+        with self._lock:
+            features = self._entries.get(key)
+            if features is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return features
+
+    def put(self, key: str, features: ImageFeatures) -> None:
+        if features.nbytes > self.max_bytes:
+            return
+        # Copy out of the batch tensors so an entry never keeps a whole batch alive
+        features = ImageFeatures(
+            features.embeds.clone(), tuple(level.clone() for level in features.deepstack)
+        )
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = features
+            self.current_bytes += features.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def record_encode(self, n_images: int, seconds: float) -> None:
+        with self._lock:
+            self.encoded_images += n_images
+            self.encode_seconds += seconds
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.encoded_images = 0
+            self.encode_seconds = 0.0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, encoder time and current occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "encoded_images": self.encoded_images,
+                "encode_seconds": self.encode_seconds,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class SharedImageFeatures:
+    """Encode a batch's images once and reuse them across VLM forwards.
+
+    ``generate`` with ``num_return_sequences=n`` repeats ``pixel_values`` per sample
+    and re-encodes every image n times, and the unguided CFG prefill encodes them once
+    more. While this context is active, ``get_image_features`` on ``vlm_model`` is
+    served from a single encoding of ``pixel_values`` whenever it is called with the
+    same images, either as-is or repeated per sample as ``generate`` does. Any other
+    input falls through to the vision tower.
+
+    With a ``cache`` and per-image ``image_keys``, that single encoding only runs the
+    vision tower on images missing from the cache and splices the cached visual
+    tokens in for the rest.
+
+    The encoding is kept across ``with`` blocks, so the same instance can wrap both
+    ``generate`` and the unguided prefill.
+
+    Args:
+        vlm_model: The VLM backbone that owns ``get_image_features`` (``vlm.model``).
+        pixel_values: Flattened image patches for the whole batch.
+        image_grid_thw: [num_images, 3] patch grid of every image.
+        input_ids: [B, L] prompt ids, used to assign images to samples.
+        image_token_id: Id of the image placeholder token.
+        cache: Optional cross-call cache of per-image features.
+        image_keys: Cache key of every image in ``pixel_values`` (see ``image_cache_keys``).
+    """
+
+    def __init__(
+        self,
+        vlm_model: torch.nn.Module,
+        pixel_values: torch.Tensor | None,
+        image_grid_thw: torch.Tensor | None,
+        input_ids: torch.Tensor,
+        image_token_id: int,
+        cache: VisionEmbeddingCache | None = None,
+        image_keys: Sequence[str] | None = None,
+    ):
+        if (
+            image_keys is not None
+            and image_grid_thw is not None
+            and len(image_keys) != len(image_grid_thw)
+        ):
+            raise ValueError(f"Got {len(image_keys)} image keys for {len(image_grid_thw)} images")
+        self.vlm_model = vlm_model
+        self.pixel_values = pixel_values
+        self.image_grid_thw = image_grid_thw
+        self.input_ids = input_ids
+        self.image_token_id = image_token_id
+        self.cache = cache if image_keys is not None else None
+        self.image_keys = image_keys
+        self.encoder_calls = 0
+        self.reused_calls = 0
+        self._images: list[ImageFeatures] | None = None
+        self._output_type: type | None = None
+        self._images_per_sample: list[int] | None = None
+        self._encode = None
+
+    def __enter__(self) -> Self:
+        if self.pixel_values is not None and self.image_grid_thw is not None:
+            self._encode = self.vlm_model.get_image_features
+            self.vlm_model.get_image_features = self._get_image_features
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._encode is not None:
+            del self.vlm_model.get_image_features
+            self._encode = None
+
+    def _encode_batch(self, **kwargs) -> None:
+        """Encode ``pixel_values``, running the vision tower only on uncached images."""
+        if self.cache is None:
+            features = self._encode(self.pixel_values, self.image_grid_thw, **kwargs)
+            self.encoder_calls += 1
+            self._output_type = type(features) if not isinstance(features, tuple) else tuple
+            self._images = _split_per_image(features)
+            return
+
+        # Overlapping windows of a batch share frames: look each distinct key up and
+        # encode it once, then fan the features out to every image that uses it
+        unique_keys = list(dict.fromkeys(self.image_keys))
+        features_by_key = {key: self.cache.get(key) for key in unique_keys}
+        missing_keys = [key for key in unique_keys if features_by_key[key] is None]
+        if missing_keys:
+            first_index = {}
+            for i, key in enumerate(self.image_keys):
+                first_index.setdefault(key, i)
+            missing = [first_index[key] for key in missing_keys]
+            patches = self.image_grid_thw.prod(dim=-1).tolist()
+            chunks = torch.split(self.pixel_values, patches)
+            if self.pixel_values.is_cuda:
+                torch.cuda.synchronize(self.pixel_values.device)
+            start = time.perf_counter()
+            features = self._encode(
+                torch.cat([chunks[i] for i in missing]), self.image_grid_thw[missing], **kwargs
+            )
+            if self.pixel_values.is_cuda:
+                torch.cuda.synchronize(self.pixel_values.device)
+            self.cache.record_encode(len(missing), time.perf_counter() - start)
+            self.encoder_calls += 1
+            self.cache.output_type = type(features) if not isinstance(features, tuple) else tuple
+            for key, image in zip(missing_keys, _split_per_image(features)):
+                features_by_key[key] = image
+                self.cache.put(key, image)
+        images = [features_by_key[key] for key in self.image_keys]
+        self._output_type = self.cache.output_type
+        self._images = images
+
+    def _expanded_order(
+        self, pixel_values: torch.Tensor, image_grid_thw: torch.Tensor
+    ) -> list[int] | None:
+        """Image order of ``pixel_values`` if it holds the batch images repeated per sample."""
+        base_rows = self.pixel_values.shape[0]
+        rows = pixel_values.shape[0]
+        if pixel_values.shape[1:] != self.pixel_values.shape[1:] or rows % base_rows:
+            return None
+        repeats = rows // base_rows
+        if repeats == 1:
+            pixel_matches = pixel_values is self.pixel_values or torch.equal(
+                pixel_values, self.pixel_values
+            )
+            grid_matches = torch.equal(image_grid_thw.cpu(), self.image_grid_thw.cpu())
+            return list(range(len(self._images))) if pixel_matches and grid_matches else None
+        if self._images_per_sample is None:
+            return None
+
+        order = []
+        sample_rows = []
+        patches = self.image_grid_thw.prod(dim=-1).tolist()
+        image_start = 0
+        for n_images in self._images_per_sample:
+            order.extend(list(range(image_start, image_start + n_images)) * repeats)
+            sample_rows.append(sum(patches[image_start : image_start + n_images]))
+            image_start += n_images
+        if not torch.equal(image_grid_thw.cpu(), self.image_grid_thw.cpu()[order]):
+            return None
+
+        # One comparison per sample: its patches repeated ``repeats`` times
+        base_segments = torch.split(self.pixel_values, sample_rows)
+        segments = torch.split(pixel_values, [n_rows * repeats for n_rows in sample_rows])
+        for segment, base in zip(segments, base_segments):
+            if not torch.equal(
+                segment.view(repeats, *base.shape), base.expand(repeats, *base.shape)
+            ):
+                return None
+        return order
+
+    def _get_image_features(self, pixel_values, image_grid_thw=None, **kwargs):
+        if self._images is None:
+            self._encode_batch(**kwargs)
+            self._images_per_sample = _images_per_sample(
+                self.input_ids,
+                self.image_token_id,
+                [image.embeds.shape[0] for image in self._images],
+            )
+
+        order = (
+            None if image_grid_thw is None else self._expanded_order(pixel_values, image_grid_thw)
+        )
+        if order is None:
+            logger.debug("Image features not shared: inputs differ from the encoded batch")
+            self.encoder_calls += 1
+            return self._encode(pixel_values, image_grid_thw, **kwargs)
+        self.reused_calls += 1
+        return _pack_features([self._images[i] for i in order], self._output_type)
@@ -0,0 +1,135 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Batched selection of the displayed path from sampled trajectories.
+#
+# Batch export draws ``num_traj_samples`` trajectories per frame and keeps one
+# path per frame. ``select_prediction_paths`` scores every frame of a model call
+# at once on a ``(frames, samples, T, 3)`` array instead of looping per frame.
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+SELECTION_MODES = ("heuristic", "mean", "median", "medoid")
+
+
+@dataclass
+class PathSelection:
+    """Selected paths for a batch of frames.
+
+    Attributes:
+        selected_paths: Selected path per frame, truncated to ``n_frames``.
+            Shape ``[F, n_frames, 3]``.
+        sample_indices: Index of the representative sample per frame. For the
+            mean and median modes this is the sample closest to the aggregate.
+            Shape ``[F]``.
+        n_frames: Number of waypoints kept per path.
+        samples: The sampled trajectories the selection was made from.
+            Shape ``[F, S, T, 3]``.
+    """
+
+    selected_paths: np.ndarray
+    sample_indices: np.ndarray
+    n_frames: int
+    samples: np.ndarray
+
+
+def heuristic_scores(samples: np.ndarray, nav_cmds: list[str]) -> np.ndarray:
+    """Per-sample scores for the navigation heuristic; the best sample has the highest score.
+
+    ``left`` prefers the largest final lateral offset, ``right`` the smallest,
+    ``straight`` the most centered, and anything else the sample that goes
+    furthest forward while staying centered.
+    """
+    final_forward = samples[:, :, -1, 0]
+    final_lateral = samples[:, :, -1, 1]
+    nav_lower = [cmd.lower() for cmd in nav_cmds]
+    is_left = np.array(["left" in cmd for cmd in nav_lower])[:, None]
+    is_right = np.array(["right" in cmd for cmd in nav_lower])[:, None]
+    is_straight = np.array(["straight" in cmd for cmd in nav_lower])[:, None]
+    return np.where(
+        is_left,
+        final_lateral,
+        np.where(
+            is_right,
+            -final_lateral,
+            np.where(
+                is_straight,
+                -np.abs(final_lateral),
+                final_forward - np.abs(final_lateral),
+            ),
+        ),
+    )
+
+
+def _closest_sample(samples: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Index of the sample with the smallest mean XY distance to ``reference`` ``[F, T, 3]``."""
+    distance = np.linalg.norm(samples[..., :2] - reference[:, None, :, :2], axis=-1)
+    return distance.mean(axis=-1).argmin(axis=1)
+
+
+def _medoid_sample(samples: np.ndarray) -> np.ndarray:
+    """Index of the sample with the smallest summed mean XY distance to all other samples."""
+    xy = samples[..., :2]
+    pairwise = np.linalg.norm(xy[:, :, None] - xy[:, None, :], axis=-1).mean(axis=-1)
+    return pairwise.sum(axis=-1).argmin(axis=1)
+
+
+def select_prediction_paths(
+    samples,
+    nav_cmds: list[str],
+    num_frames: int,
+    selection_mode: str = "heuristic",
+) -> PathSelection:
+    """Select one path per frame from sampled trajectories.
+
+    Args:
+        samples: Sampled trajectories, ``[F, S, T, 3]`` NumPy array or tensor.
+        nav_cmds: Navigation command per frame; only used by the heuristic mode.
+        num_frames: Maximum number of waypoints to keep per path.
+        selection_mode: One of ``SELECTION_MODES``.
+
+    Returns:
+        PathSelection with float32 paths.
+    """
+    if selection_mode not in SELECTION_MODES:
+        raise ValueError(
+            f"Unknown selection mode {selection_mode!r}; expected one of {SELECTION_MODES}"
+        )
+    if hasattr(samples, "detach"):
+        samples = samples.detach().float().cpu().numpy()
+    samples = np.asarray(samples, dtype=np.float32)
+    num_paths, num_samples = samples.shape[:2]
+    if len(nav_cmds) != num_paths:
+        raise ValueError(f"Expected {num_paths} navigation commands, got {len(nav_cmds)}")
+
+    if num_samples == 0:
+        return PathSelection(
+            selected_paths=np.zeros((num_paths, 1, 3), dtype=np.float32),
+            sample_indices=np.zeros(num_paths, dtype=np.int64),
+            n_frames=0,
+            samples=samples,
+        )
+
+    frame_range = np.arange(num_paths)
+    if selection_mode in ("mean", "median"):
+        aggregate = samples.mean(axis=1) if selection_mode == "mean" else np.median(samples, axis=1)
+        sample_indices = _closest_sample(samples, aggregate)
+        selected = aggregate
+    else:
+        if selection_mode == "medoid":
+            sample_indices = _medoid_sample(samples)
+        else:
+            sample_indices = heuristic_scores(samples, nav_cmds).argmax(axis=1)
+        selected = samples[frame_range, sample_indices]
+
+    n_frames = min(num_frames, selected.shape[1])
+    return PathSelection(
+        selected_paths=np.ascontiguousarray(selected[:, :n_frames], dtype=np.float32),
+        sample_indices=sample_indices.astype(np.int64),
+        n_frames=n_frames,
+        samples=samples,
+    )
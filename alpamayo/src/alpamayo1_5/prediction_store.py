@@ -0,0 +1,390 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Append-only, columnar prediction store for one segment.
+#
+# A segment's predictions/ folder holds three files instead of one JSON per frame:
+#   prediction_store.json   run metadata, written once
+#   prediction_store.f32    float32 trajectory points (selected path, then ground truth)
+#   prediction_store.jsonl  one line per frame: offsets into the .f32 file plus text
+# Frames are appended as they are exported; a frame exported twice keeps its last
+# record. ``PredictionStore.payload`` rebuilds the per-frame JSON dict so existing
+# consumers (video renderer, DB importer) keep working, and ``export_json`` writes
+# the legacy ``*_prediction.json`` files. Paths are serialized straight from their
+# arrays (``dumps_prediction_payload``) rather than through per-waypoint dicts.
+# Only depends on NumPy.
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+from typing import Self
+
+import numpy as np
+
+from alpamayo1_5.export_manifest import ExportManifest, atomic_write_json, atomic_write_text
+
+STORE_METADATA_FILENAME = "prediction_store.json"
+STORE_TRAJECTORY_FILENAME = "prediction_store.f32"
+STORE_RECORDS_FILENAME = "prediction_store.jsonl"
+STORE_VERSION = 1
+PREDICTION_SCHEMA_VERSION = 1
+
+
+def _store_paths(predictions_dir: str) -> tuple[str, str, str]:
+    return (
+        os.path.join(predictions_dir, STORE_METADATA_FILENAME),
+        os.path.join(predictions_dir, STORE_TRAJECTORY_FILENAME),
+        os.path.join(predictions_dir, STORE_RECORDS_FILENAME),
+    )
+
+
+def prediction_json_name(segment: str, frame_index: int) -> str:
+    """File name used for a frame's legacy prediction JSON."""
+    return f"{segment}_{int(frame_index):06d}_prediction.json"
+
+
+def path_to_records(path: np.ndarray) -> list[dict]:
+    """Convert an ``(N, 2|3)`` path to the ``selected_path`` list-of-dicts JSON form."""
+    if len(path) == 0:
+        return []
+    path = np.asarray(path, dtype=np.float64).reshape(len(path), -1)
+    return [
+        {
+            "step_index": int(idx),
+            "x_m": float(point[0]),
+            "y_m": float(point[1]),
+            "z_m": float(point[2]) if len(point) > 2 else 0.0,
+        }
+        for idx, point in enumerate(path)
+    ]
+
+
+def path_records_json(path: np.ndarray, level: int = 0, indent: int = 2) -> str:
+    """Serialize a path exactly like ``json.dumps(path_to_records(path), indent=indent)``.
+
+    ``level`` is the nesting depth of the list in the enclosing document. The text
+    is built from the array rows directly, so no per-waypoint dicts are created.
+    """
+    if len(path) == 0:
+        return "[]"
+    path = np.asarray(path, dtype=np.float64).reshape(len(path), -1)
+    if path.shape[1] < 3:
+        path = np.concatenate([path, np.zeros((path.shape[0], 1))], axis=1)
+    outer = " " * (indent * level)
+    item = outer + " " * indent
+    field = item + " " * indent
+    if np.isfinite(path[:, :3]).all():
+        number = repr
+    else:
+        number = json.dumps  # NaN / Infinity spelled the way json writes them
+    rows = ",\n".join(
+        f'{item}{{\n{field}"step_index": {idx},\n{field}"x_m": {number(x)},\n'
+        f'{field}"y_m": {number(y)},\n{field}"z_m": {number(z)}\n{item}}}'
+        for idx, (x, y, z) in enumerate(path[:, :3].tolist())
+    )
+    return f"[\n{rows}\n{outer}]"
+
+
+def dumps_prediction_payload(payload: dict, indent: int = 2) -> str:
+    """``json.dumps(payload, indent=indent)`` where path fields may be ``(N, 3)`` arrays.
+
+    Array values are written in the ``path_to_records`` form via ``path_records_json``,
+    giving the same text as converting them to records first.
+    """
+    placeholders = {}
+    encoded = {}
+    for key, value in payload.items():
+        if isinstance(value, np.ndarray):
+            token = f"__prediction_path_{len(placeholders)}__"
+            placeholders[json.dumps(token)] = value
+            value = token
+        encoded[key] = value
+    text = json.dumps(encoded, indent=indent)
+    for token, path in placeholders.items():
+        text = text.replace(token, path_records_json(path, level=1, indent=indent), 1)
+    return text
+
+
+def write_prediction_json(path: str, payload: dict) -> None:
+    """Atomically write a per-frame prediction JSON whose path fields may be arrays."""
+    atomic_write_text(path, dumps_prediction_payload(payload))
+
+
+def _read_metadata(metadata_path: str) -> dict | None:
+    try:
+        with open(metadata_path, "r", encoding="utf-8") as handle:
+            metadata = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if metadata.get("store_version") != STORE_VERSION:
+        return None
+    return metadata
+
+
+def _trim_partial_line(records_path: str) -> None:
+    """Drop a trailing record left half-written by an interrupted append."""
+    if not os.path.exists(records_path):
+        return
+    with open(records_path, "rb+") as handle:
+        data = handle.read()
+        if not data or data.endswith(b"\n"):
+            return
+        handle.truncate(data.rfind(b"\n") + 1)
+
+
+class PredictionStoreWriter:
+    """Appends exported frames to a segment's prediction store.
+
+    ``metadata`` holds the fields that are identical for every frame of the run
+    (model name, route, segment, sampling parameters, cameras, ...). Opening a
+    store whose stored metadata differs starts it over, mirroring how the export
+    manifest discards frames when the export parameters change; ``discarded`` is
+    then true when an existing store was wiped.
+    """
+
+    def __init__(self, predictions_dir: str, metadata: dict, reset: bool = False):
+        self.predictions_dir = predictions_dir
+        self.metadata = {"store_version": STORE_VERSION, **metadata}
+        self.metadata_path, self.trajectory_path, self.records_path = _store_paths(predictions_dir)
+        os.makedirs(predictions_dir, exist_ok=True)
+
+        self.discarded = False
+        if reset or _read_metadata(self.metadata_path) != self.metadata:
+            self.discarded = any(
+                os.path.exists(path)
+                for path in (self.metadata_path, self.trajectory_path, self.records_path)
+            )
+            for path in (self.trajectory_path, self.records_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            atomic_write_json(self.metadata_path, self.metadata, indent=2)
+        _trim_partial_line(self.records_path)
+
+        # Both files stay open for appends until close(); the stack closes the first
+        # one if opening the second fails.
+        with contextlib.ExitStack() as stack:
+            self._trajectories = stack.enter_context(open(self.trajectory_path, "ab"))
+            self._records = stack.enter_context(open(self.records_path, "a", encoding="utf-8"))
+            self._files = stack.pop_all()
+
+    def append(
+        self,
+        frame_index: int,
+        selected_path: np.ndarray,
+        ground_truth_path: np.ndarray,
+        nav_command: str,
+        command_text: str,
+        reasoning_text: str,
+        selected_sample_index: int,
+        clip_id: str | None = None,
+        t0_us: int | None = None,
+        frames_requested: int | None = None,
+    ) -> None:
+        """Append one frame. Trajectory points are written before the record that references them."""
+        selected = np.ascontiguousarray(np.asarray(selected_path, dtype=np.float32).reshape(-1, 3))
+        ground_truth = np.ascontiguousarray(
+            np.asarray(ground_truth_path, dtype=np.float32).reshape(-1, 3)
+        )
+
+        offset = self._trajectories.seek(0, os.SEEK_END) // 4
+        self._trajectories.write(selected.tobytes())
+        self._trajectories.write(ground_truth.tobytes())
+        self._trajectories.flush()
+
+        record = {
+            "frame_index": int(frame_index),
+            "offset": int(offset),
+            "selected_steps": int(selected.shape[0]),
+            "ground_truth_steps": int(ground_truth.shape[0]),
+            "selected_sample_index": int(selected_sample_index),
+            "clip_id": clip_id,
+            "t0_us": None if t0_us is None else int(t0_us),
+            "frames_requested": None if frames_requested is None else int(frames_requested),
+            "nav_command": nav_command,
+            "command_text": command_text,
+            "reasoning_text": reasoning_text,
+        }
+        self._records.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._records.flush()
+        os.fsync(self._records.fileno())
+
+    def close(self) -> None:
+        self._files.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PredictionStore:
+    """Read-only view of a segment's prediction store, loaded in one pass."""
+
+    def __init__(self, metadata: dict, records: dict[int, dict], points: np.ndarray):
+        self.metadata = metadata
+        self.records = records
+        self.points = points
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, frame_index: int) -> bool:
+        return int(frame_index) in self.records
+
+    def frame_indices(self) -> list[int]:
+        return sorted(self.records)
+
+    def _points(self, start: int, steps: int) -> np.ndarray:
+        return self.points[start : start + steps * 3].reshape(steps, 3)
+
+    def selected_path(self, frame_index: int) -> np.ndarray:
+        """Selected prediction path as a float32 ``(N, 3)`` array."""
+        record = self.records[int(frame_index)]
+        return self._points(record["offset"], record["selected_steps"])
+
+    def ground_truth_path(self, frame_index: int) -> np.ndarray:
+        """Ground-truth path as a float32 ``(N, 3)`` array."""
+        record = self.records[int(frame_index)]
+        start = record["offset"] + record["selected_steps"] * 3
+        return self._points(start, record["ground_truth_steps"])
+
+    def payload(self, frame_index: int, path_arrays: bool = False) -> dict:
+        """Rebuild the per-frame prediction JSON dict written by batch export.
+
+        With ``path_arrays`` the path fields stay float32 ``(N, 3)`` arrays, ready
+        for ``dumps_prediction_payload``.
+        """
+        record = self.records[int(frame_index)]
+        metadata = self.metadata
+        paths = self.selected_path(frame_index), self.ground_truth_path(frame_index)
+        if not path_arrays:
+            paths = tuple(path_to_records(path) for path in paths)
+        return {
+            "schema_version": PREDICTION_SCHEMA_VERSION,
+            "model_name": metadata.get("model_name"),
+            "route": metadata.get("route"),
+            "segment": metadata.get("segment"),
+            "frame_index": record["frame_index"],
+            "clip_id": record.get("clip_id"),
+            "t0_us": record.get("t0_us"),
+            "nav_command": record["nav_command"],
+            "command": record["command_text"],
+            "command_text": record["command_text"],
+            "command_source": metadata.get("command_source"),
+            "selection_mode": metadata.get("selection_mode"),
+            "selected_sample_index": record["selected_sample_index"],
+            "num_traj_samples": metadata.get("num_traj_samples"),
+            "guidance_weight": metadata.get("guidance_weight"),
+            "max_generation_length": metadata.get("max_generation_length"),
+            "frames_requested": record.get("frames_requested", metadata.get("frames_requested")),
+            "frames_stored": record["selected_steps"],
+            "cameras": metadata.get("cameras"),
+            "reasoning_text": record["reasoning_text"],
+            "reasoning": record["reasoning_text"],
+            "selected_path": paths[0],
+            "ground_truth_path": paths[1],
+        }
+
+    def payloads(self, path_arrays: bool = False):
+        """Yield ``(frame_index, payload)`` in frame order."""
+        for frame_index in self.frame_indices():
+            yield frame_index, self.payload(frame_index, path_arrays=path_arrays)
+
+
+def load_prediction_store(predictions_dir: str) -> PredictionStore | None:
+    """Load a segment's prediction store, or return ``None`` when the folder has none.
+
+    Records whose trajectory points are missing (an interrupted append) and a
+    truncated final line are ignored.
+    """
+    metadata_path, trajectory_path, records_path = _store_paths(predictions_dir)
+    metadata = _read_metadata(metadata_path)
+    if metadata is None or not os.path.exists(records_path):
+        return None
+
+    points = (
+        np.fromfile(trajectory_path, dtype=np.float32)
+        if os.path.exists(trajectory_path)
+        else np.zeros(0, dtype=np.float32)
+    )
+    records = {}
+    with open(records_path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            end = record["offset"] + 3 * (record["selected_steps"] + record["ground_truth_steps"])
+            if end <= points.shape[0]:
+                records[int(record["frame_index"])] = record
+    return PredictionStore(metadata, records, points)
+
+
+def open_segment_export(
+    predictions_dir: str,
+    params: dict,
+    store_metadata: dict | None,
+    frame_indices,
+    reset: bool = False,
+    json_path=None,
+) -> tuple[ExportManifest, PredictionStoreWriter | None, set[int]]:
+    """Open a segment's export manifest and store and return the frames to skip.
+
+    ``store_metadata`` is ``None`` when the run writes no store, and ``json_path``
+    maps a frame index to its legacy JSON path when the run writes those. The
+    store is opened first: when it starts over, the manifest is discarded too, so
+    no frame is skipped whose prediction the reset just deleted. A frame is
+    skipped only when the manifest and every requested output have it.
+    """
+    writer = (
+        PredictionStoreWriter(predictions_dir, store_metadata, reset=reset)
+        if store_metadata is not None
+        else None
+    )
+    manifest = ExportManifest.load(predictions_dir, params, reset=reset)
+    if writer is not None and writer.discarded:
+        manifest.discard()
+
+    stored = load_prediction_store(predictions_dir) if writer is not None else None
+    skip_frames = {
+        idx
+        for idx in frame_indices
+        if manifest.is_complete(idx)
+        and (stored is None or idx in stored)
+        and (json_path is None or os.path.exists(json_path(idx)))
+    }
+    return manifest, writer, skip_frames
+
+
+def export_json(store: PredictionStore, output_dir: str) -> list[str]:
+    """Write one legacy ``*_prediction.json`` per stored frame and return the paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for frame_index, payload in store.payloads(path_arrays=True):
+        path = os.path.join(output_dir, prediction_json_name(payload["segment"], frame_index))
+        write_prediction_json(path, payload)
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Export a segment's prediction store as per-frame prediction JSON."
+    )
+    parser.add_argument("predictions_dir", help="Segment predictions/ folder holding the store")
+    parser.add_argument("--output-dir", default=None, help="Defaults to predictions_dir")
+    args = parser.parse_args()
+
+    store = load_prediction_store(args.predictions_dir)
+    if store is None:
+        raise SystemExit(f"No prediction store found in {args.predictions_dir}")
+    paths = export_json(store, args.output_dir or args.predictions_dir)
+    print(f"Wrote {len(paths)} prediction JSON files.")
+
+
+if __name__ == "__main__":
+    main()
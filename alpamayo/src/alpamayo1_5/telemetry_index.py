@@ -0,0 +1,247 @@
+# SPDX-FileCopyrightText: Copyright (c) 2025 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+#
+# Persistent per-route telemetry index for route folders.
+#
+# Parsing every telemetry JSON in a route is the slowest part of preparing a
+# custom frame, so the parsed columns are cached once per route in a single
+# ``telemetry_index.npz`` next to the ``segment_*`` folders. The index is rebuilt
+# automatically when the set of segments or any ``telemetry/`` directory mtime
+# changes. This module only depends on NumPy so the frame extraction tools can
+# share it without pulling in torch.
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+TELEMETRY_INDEX_FILENAME = "telemetry_index.npz"
+TELEMETRY_INDEX_VERSION = 1
+
+
+def _timestamp_seconds(data: dict) -> float:
+    """Return telemetry timestamp in seconds."""
+    if "timestamp_seconds" in data:
+        return float(data["timestamp_seconds"])
+    if "timestamp_eof" in data:
+        return float(data["timestamp_eof"]) * 1e-9
+    raise KeyError("Telemetry entry is missing timestamp_seconds/timestamp_eof")
+
+
+def _yaw_rate_rad_s(data: dict, speed_m_s: float) -> float:
+    """Use measured yaw rate when available, otherwise bicycle-model fallback."""
+    yaw_rate = float(data.get("yaw_rate", 0.0))
+    steer_deg = float(data.get("steering_angle_deg", 0.0))
+    if abs(yaw_rate) < 1e-4 and abs(steer_deg) > 0.5:
+        steer_rad = np.deg2rad(steer_deg) / 15.49
+        yaw_rate = speed_m_s * np.tan(steer_rad) / 2.7
+    return yaw_rate
+
+
+def load_telemetry_series(telemetry_dir: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Load timestamps, longitudinal speed, and yaw rate from telemetry."""
+    json_files = sorted(
+        name for name in os.listdir(telemetry_dir) if name.lower().endswith(".json")
+    )
+    if not json_files:
+        raise FileNotFoundError(f"No telemetry json files found in {telemetry_dir}")
+
+    timestamps_s = []
+    speeds_m_s = []
+    yaw_rates_rad_s = []
+
+    for name in json_files:
+        path = os.path.join(telemetry_dir, name)
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+
+        speed_m_s = float(data.get("v_ego", 0.0))
+        yaw_rate_rad_s = _yaw_rate_rad_s(data, speed_m_s)
+
+        if data.get("gear_shifter") == "reverse":
+            speed_m_s = -speed_m_s
+            yaw_rate_rad_s = -yaw_rate_rad_s
+
+        timestamps_s.append(_timestamp_seconds(data))
+        speeds_m_s.append(speed_m_s)
+        yaw_rates_rad_s.append(yaw_rate_rad_s)
+
+    timestamps_s = np.asarray(timestamps_s, dtype=np.float64)
+    speeds_m_s = np.asarray(speeds_m_s, dtype=np.float64)
+    yaw_rates_rad_s = np.asarray(yaw_rates_rad_s, dtype=np.float64)
+
+    if np.any(np.diff(timestamps_s) < 0):
+        raise RuntimeError("Telemetry timestamps are not monotonic")
+
+    return timestamps_s, speeds_m_s, yaw_rates_rad_s
+
+
+@dataclass
+class TelemetryIndex:
+    """Columnar telemetry for every segment of a route.
+
+    Attributes:
+        timestamps_s: Route-wide telemetry timestamps in seconds, shape ``(N,)``.
+        speeds_m_s: Signed longitudinal speed, shape ``(N,)``.
+        yaw_rates_rad_s: Signed yaw rate, shape ``(N,)``.
+        segment_names: Basenames of the segments with telemetry, in route order.
+        segment_offsets: Start offset of each segment in the columns plus the
+            total length, shape ``(len(segment_names) + 1,)``.
+    """
+
+    timestamps_s: np.ndarray
+    speeds_m_s: np.ndarray
+    yaw_rates_rad_s: np.ndarray
+    segment_names: list[str]
+    segment_offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.segment_offsets[-1])
+
+    def segment_bounds(self, segment: str) -> tuple[int, int]:
+        """Return the ``[start, end)`` route offsets for a segment name or path."""
+        name = os.path.basename(os.path.normpath(segment))
+        try:
+            position = self.segment_names.index(name)
+        except ValueError as exc:
+            raise KeyError(f"Segment {name} is not part of the telemetry index") from exc
+        return int(self.segment_offsets[position]), int(self.segment_offsets[position + 1])
+
+    def segment_length(self, segment: str) -> int:
+        """Return the number of telemetry frames in a segment."""
+        start, end = self.segment_bounds(segment)
+        return end - start
+
+    def segment_timestamps(self, segment: str) -> np.ndarray:
+        """Return the telemetry timestamps of a single segment."""
+        start, end = self.segment_bounds(segment)
+        return self.timestamps_s[start:end]
+
+
+def discover_segment_dirs(route_dir: str) -> list[str]:
+    """Return the ordered ``segment_*`` directories of a route."""
+    return [
+        os.path.abspath(os.path.join(route_dir, name))
+        for name in sorted(os.listdir(route_dir))
+        if name.startswith("segment_") and os.path.isdir(os.path.join(route_dir, name))
+    ]
+
+
+def _telemetry_mtimes_ns(segment_dirs: list[str]) -> np.ndarray:
+    return np.asarray(
+        [os.stat(os.path.join(seg_dir, "telemetry")).st_mtime_ns for seg_dir in segment_dirs],
+        dtype=np.int64,
+    )
+
+
+def build_telemetry_index(segment_dirs: list[str]) -> TelemetryIndex:
+    """Parse the telemetry JSON of every segment into one columnar index."""
+    timestamps_parts = []
+    speeds_parts = []
+    yaw_rates_parts = []
+    segment_names = []
+    segment_offsets = [0]
+
+    for seg_dir in segment_dirs:
+        timestamps_s, speeds_m_s, yaw_rates_rad_s = load_telemetry_series(
+            os.path.join(seg_dir, "telemetry")
+        )
+        timestamps_parts.append(timestamps_s)
+        speeds_parts.append(speeds_m_s)
+        yaw_rates_parts.append(yaw_rates_rad_s)
+        segment_names.append(os.path.basename(os.path.normpath(seg_dir)))
+        segment_offsets.append(segment_offsets[-1] + len(timestamps_s))
+
+    if not timestamps_parts:
+        empty = np.zeros(0, dtype=np.float64)
+        return TelemetryIndex(empty, empty.copy(), empty.copy(), [], np.zeros(1, dtype=np.int64))
+
+    return TelemetryIndex(
+        timestamps_s=np.concatenate(timestamps_parts),
+        speeds_m_s=np.concatenate(speeds_parts),
+        yaw_rates_rad_s=np.concatenate(yaw_rates_parts),
+        segment_names=segment_names,
+        segment_offsets=np.asarray(segment_offsets, dtype=np.int64),
+    )
+
+
+def _read_index_file(
+    index_path: str,
+    segment_names: list[str],
+    mtimes_ns: np.ndarray,
+) -> TelemetryIndex | None:
+    """Return the stored index when it is still valid for the given segments."""
+    try:
+        with np.load(index_path, allow_pickle=False) as stored:
+            if int(stored["version"]) != TELEMETRY_INDEX_VERSION:
+                return None
+            if stored["segment_names"].tolist() != segment_names:
+                return None
+            if not np.array_equal(stored["telemetry_mtimes_ns"], mtimes_ns):
+                return None
+            return TelemetryIndex(
+                timestamps_s=stored["timestamps_s"],
+                speeds_m_s=stored["speeds_m_s"],
+                yaw_rates_rad_s=stored["yaw_rates_rad_s"],
+                segment_names=segment_names,
+                segment_offsets=stored["segment_offsets"],
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _write_index_file(index_path: str, index: TelemetryIndex, mtimes_ns: np.ndarray) -> None:
+    """Write the index atomically; read-only route folders just skip persistence."""
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as handle:
+            np.savez(
+                handle,
+                version=np.int64(TELEMETRY_INDEX_VERSION),
+                timestamps_s=index.timestamps_s,
+                speeds_m_s=index.speeds_m_s,
+                yaw_rates_rad_s=index.yaw_rates_rad_s,
+                segment_names=np.asarray(index.segment_names, dtype=str),
+                segment_offsets=index.segment_offsets,
+                telemetry_mtimes_ns=mtimes_ns,
+            )
+        os.replace(tmp_path, index_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_telemetry_index(
+    root_dir: str,
+    segment_dirs: list[str] | None = None,
+    rebuild: bool = False,
+) -> TelemetryIndex:
+    """Load the persistent telemetry index for a route, building it if stale.
+
+    Args:
+        root_dir: Directory that owns the index file, normally the route folder.
+        segment_dirs: Ordered segment directories to index. Defaults to the
+            ``segment_*`` folders under ``root_dir``. Directories without a
+            ``telemetry/`` folder are skipped.
+        rebuild: Ignore any stored index and re-parse the telemetry JSON.
+    """
+    if segment_dirs is None:
+        segment_dirs = discover_segment_dirs(root_dir)
+    segment_dirs = [
+        seg_dir for seg_dir in segment_dirs if os.path.isdir(os.path.join(seg_dir, "telemetry"))
+    ]
+    segment_names = [os.path.basename(os.path.normpath(seg_dir)) for seg_dir in segment_dirs]
+    mtimes_ns = _telemetry_mtimes_ns(segment_dirs)
+    index_path = os.path.join(root_dir, TELEMETRY_INDEX_FILENAME)
+
+    if not rebuild:
+        stored = _read_index_file(index_path, segment_names, mtimes_ns)
+        if stored is not None:
+            return stored
+
+    index = build_telemetry_index(segment_dirs)
+    _write_index_file(index_path, index, mtimes_ns)
+    return index
@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+import torch
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.action_space.utils import (
+    construct_DTD,
+    solve_single_constraint,
+    solve_xs_eq_y,
+)
+
+
+def _dense_xs_eq_y(s, y, w_data, ridge=0.0, **smooth):
+    *lead, N = y.shape
+    DTD = construct_DTD(N, lead, device=y.device, dtype=y.dtype, **smooth)
+    lhs = torch.diag_embed(w_data * s * s) + DTD + ridge * torch.eye(N, dtype=y.dtype)
+    return torch.linalg.solve(lhs, (w_data * s * y).unsqueeze(-1)).squeeze(-1)
+
+
+def _dense_single_constraint(x_init, x_target, w_data, **smooth):
+    *lead, N = x_target.shape
+    DTD = construct_DTD(N + 1, lead, device=x_target.device, dtype=x_target.dtype, **smooth)
+    rhs = w_data * x_target - DTD[..., 1:, 0] * x_init.unsqueeze(-1)
+    lhs = torch.diag_embed(w_data) + DTD[..., 1:, 1:]
+    x = torch.linalg.solve(lhs, rhs.unsqueeze(-1)).squeeze(-1)
+    return torch.cat([x_init.unsqueeze(-1), x], dim=-1)
+
+
+def test_solve_xs_eq_y_matches_dense_solve_for_uniform_and_banded_systems():
+    g = torch.Generator().manual_seed(0)
+    y = torch.randn(6, 32, generator=g, dtype=torch.float64)
+    w_data = torch.ones_like(y)
+    smooth = {"w_smooth1": 0.5, "w_smooth2": 1.0, "lam": 0.1, "dt": 0.1}
+
+    # Uniform diagonal: reuses one cached factorization for the whole batch.
+    ones = torch.ones_like(y)
+    expected = _dense_xs_eq_y(ones, y, w_data, ridge=1e-4, **smooth)
+    torch.testing.assert_close(solve_xs_eq_y(ones, y, w_data, ridge=1e-4, **smooth), expected)
+    torch.testing.assert_close(solve_xs_eq_y(ones, y, w_data, ridge=1e-4, **smooth), expected)
+
+    # Per-sample slopes: banded Cholesky.
+    s = 0.5 + torch.rand(6, 32, generator=g, dtype=torch.float64)
+    expected = _dense_xs_eq_y(s, y, w_data, ridge=1e-4, **smooth)
+    torch.testing.assert_close(solve_xs_eq_y(s, y, w_data, ridge=1e-4, **smooth), expected)
+
+    # Per-element smoothing weights keep the dense path.
+    w2 = torch.full((6, 30), 1.0, dtype=torch.float64)
+    dense = solve_xs_eq_y(s, y, w_data, ridge=1e-4, **{**smooth, "w_smooth2": w2})
+    torch.testing.assert_close(dense, expected)
+
+
+def test_solve_single_constraint_matches_dense_solve():
+    g = torch.Generator().manual_seed(1)
+    x_target = torch.randn(5, 24, generator=g, dtype=torch.float64)
+    x_init = torch.randn(5, generator=g, dtype=torch.float64)
+    smooth = {"w_smooth3": 1.0, "lam": 1.0, "dt": 0.1}
+
+    uniform = torch.ones_like(x_target)
+    expected = _dense_single_constraint(x_init, x_target, uniform, **smooth)
+    torch.testing.assert_close(
+        solve_single_constraint(x_init, x_target, uniform, **smooth), expected
+    )
+
+    weighted = 0.1 + torch.rand(5, 24, generator=g, dtype=torch.float64)
+    expected = _dense_single_constraint(x_init, x_target, weighted, **smooth)
+    torch.testing.assert_close(
+        solve_single_constraint(x_init, x_target, weighted, **smooth), expected
+    )
+
+
+def test_singular_systems_retry_with_a_ridge_and_non_finite_weights_raise():
+    x_target = torch.arange(1.0, 9.0).expand(2, 8)
+    x_init = torch.zeros(2)
+
+    # Without smoothing a zero data weight leaves the system singular at the default ridge of 0
+    uniform = solve_single_constraint(
+        x_init, x_target, w_data=torch.zeros_like(x_target), w_smooth1=0.0
+    )
+    assert torch.equal(uniform, torch.zeros(2, 9))
+    w_data = torch.tensor([0.0, 1.0]).repeat(2, 4)
+    banded = solve_single_constraint(x_init, x_target, w_data=w_data, w_smooth1=0.0)
+    torch.testing.assert_close(banded[:, 1:], w_data * x_target, rtol=1e-4, atol=1e-4)
+
+    for w_data in (
+        torch.full_like(x_target, float("nan")),
+        torch.tensor([1.0, float("nan")]).repeat(2, 4),
+    ):
+        with pytest.raises(RuntimeError, match="not positive definite"):
+            solve_single_constraint(x_init, x_target, w_data=w_data, w_smooth1=1.0)
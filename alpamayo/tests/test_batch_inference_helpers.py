@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import torch
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.helper import collate_tokenized_inputs, split_batched_predictions
+
+
+def _tokenized(length, num_images, fill):
+    return {
+        "input_ids": torch.full((1, length), fill, dtype=torch.long),
+        "attention_mask": torch.ones((1, length), dtype=torch.long),
+        "pixel_values": torch.full((num_images * 4, 6), float(fill)),
+        "image_grid_thw": torch.tensor([[1, 2, 2]] * num_images),
+    }
+
+
+def test_collate_left_pads_prompts_and_concatenates_vision_inputs():
+    batch = collate_tokenized_inputs([_tokenized(3, 2, 7), _tokenized(5, 2, 9)], pad_token_id=0)
+
+    assert batch["input_ids"].tolist() == [[0, 0, 7, 7, 7], [9, 9, 9, 9, 9]]
+    assert batch["attention_mask"].tolist() == [[0, 0, 1, 1, 1], [1, 1, 1, 1, 1]]
+    assert batch["pixel_values"].shape == (16, 6)
+    assert torch.equal(batch["pixel_values"][8:], torch.full((8, 6), 9.0))
+    assert batch["image_grid_thw"].shape == (4, 3)
+
+
+def test_collate_left_pads_multimodal_token_types():
+    short, long = _tokenized(3, 1, 7), _tokenized(5, 1, 9)
+    short["mm_token_type_ids"] = torch.tensor([[0, 1, 0]])
+    long["mm_token_type_ids"] = torch.tensor([[0, 1, 1, 0, 0]])
+
+    batch = collate_tokenized_inputs([short, long], pad_token_id=0)
+
+    assert batch["mm_token_type_ids"].tolist() == [[0, 0, 0, 1, 0], [0, 1, 1, 0, 0]]
+
+
+def test_collate_single_input_is_unchanged():
+    item = _tokenized(4, 1, 3)
+    batch = collate_tokenized_inputs([item], pad_token_id=0)
+
+    for key, value in item.items():
+        assert torch.equal(batch[key], value)
+
+
+def test_split_batched_predictions_keeps_single_frame_shapes():
+    pred_xyz = torch.randn(3, 1, 2, 64, 3)
+    pred_rot = torch.randn(3, 1, 2, 64, 3, 3)
+    extra = {"cot": np.array([[["a0", "a1"]], [["b0", "b1"]], [["c0", "c1"]]])}
+
+    frames = split_batched_predictions(pred_xyz, pred_rot, extra)
+
+    assert len(frames) == 3
+    xyz, rot, frame_extra = frames[1]
+    assert xyz.shape == (1, 1, 2, 64, 3)
+    assert rot.shape == (1, 1, 2, 64, 3, 3)
+    assert torch.equal(xyz, pred_xyz[1:2])
+    assert frame_extra["cot"].tolist() == [[["b0", "b1"]]]
@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import torch
+from PIL import Image
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.load_custom_dataset import iter_custom_dataset, load_custom_dataset
+
+
+def _write_route(route_dir, num_segments=2, frames_per_segment=12):
+    for seg in range(num_segments):
+        seg_dir = os.path.join(route_dir, f"segment_{seg:02d}")
+        os.makedirs(os.path.join(seg_dir, "telemetry"))
+        os.makedirs(os.path.join(seg_dir, "raw"))
+        for idx in range(frames_per_segment):
+            t = (seg * frames_per_segment + idx) * 0.05
+            with open(os.path.join(seg_dir, "telemetry", f"{idx:06d}.json"), "w") as handle:
+                json.dump({"timestamp_seconds": t, "v_ego": 8.0, "yaw_rate": 0.05}, handle)
+            image = np.full((24, 32, 3), 10 * idx, dtype=np.uint8)
+            Image.fromarray(image).save(os.path.join(seg_dir, "raw", f"{idx:06d}.png"))
+    return [os.path.join(route_dir, f"segment_{seg:02d}") for seg in range(num_segments)]
+
+
+def test_prefetching_iterator_yields_frames_in_order():
+    with tempfile.TemporaryDirectory() as route_dir:
+        seg_dir = _write_route(route_dir)[1]
+
+        results = list(iter_custom_dataset(seg_dir, 2, 9, workers=3, prefetch=4))
+
+        assert [frame_idx for frame_idx, _, _ in results] == list(range(2, 10))
+        for frame_idx, data, error in results:
+            assert error is None
+            expected = load_custom_dataset(seg_dir, frame_idx)
+            assert torch.equal(data["image_frames"], expected["image_frames"])
+            assert torch.equal(data["ego_future_xyz"], expected["ego_future_xyz"])
+
+
+def test_prefetching_iterator_reports_errors_and_stops():
+    with tempfile.TemporaryDirectory() as route_dir:
+        seg_dir = _write_route(route_dir)[0]
+
+        results = list(iter_custom_dataset(seg_dir, 10, 13, workers=2))
+        assert [frame_idx for frame_idx, _, _ in results] == [10, 11, 12, 13]
+        assert isinstance(results[-1][2], IndexError)
+
+        yielded = []
+        for frame_idx, _, _ in iter_custom_dataset(
+            seg_dir, 0, 11, workers=2, should_stop=lambda: len(yielded) >= 3
+        ):
+            yielded.append(frame_idx)
+        assert yielded == [0, 1, 2]
+
+
+def test_decoded_image_cache_reuses_overlapping_windows():
+    from alpamayo1_5.load_custom_dataset import IMAGE_CACHE
+
+    with tempfile.TemporaryDirectory() as route_dir:
+        seg_dir = _write_route(route_dir, num_segments=1)[0]
+        IMAGE_CACHE.clear()
+        IMAGE_CACHE.reset_stats()
+
+        first = load_custom_dataset(seg_dir, 8)
+        assert IMAGE_CACHE.stats()["misses"] == 4
+        assert IMAGE_CACHE.stats()["hits"] == 0
+
+        again = load_custom_dataset(seg_dir, 8)
+        assert IMAGE_CACHE.stats()["hits"] == 4
+        assert torch.equal(first["image_frames"], again["image_frames"])
+
+        IMAGE_CACHE.reset_stats()
+        load_custom_dataset(seg_dir, 10)
+        assert IMAGE_CACHE.stats()["hits"] == 3
+        assert IMAGE_CACHE.stats()["misses"] == 1
+        IMAGE_CACHE.clear()
+
+
+def test_decoded_image_cache_evicts_by_bytes():
+    from alpamayo1_5.load_custom_dataset import DecodedImageCache
+
+    cache = DecodedImageCache(max_bytes=250)
+    for idx in range(3):
+        cache.put(("seg", "raw", idx), np.zeros(100, dtype=np.uint8))
+
+    assert cache.get(("seg", "raw", 0)) is None
+    assert cache.get(("seg", "raw", 2)) is not None
+    assert cache.stats()["bytes"] == 200
+    assert cache.stats()["evictions"] == 1
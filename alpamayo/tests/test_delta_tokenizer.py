@@ -0,0 +1,74 @@
+import os
+import sys
+
+import numpy as np
+import torch
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.models.delta_tokenizer import (
+    DeltaTrajectoryTokenizer,
+    get_yaw_rotation_matrices,
+    get_yaw_rotation_matrices_torch,
+)
+
+
+def _loop_reference(trajectory, window_size=10, poly_order=3):
+    B, N = trajectory.shape[:2]
+    yaws = np.zeros((B, N))
+    for b in range(B):
+        for i in range(N):
+            start_idx = max(0, i - window_size // 2)
+            end_idx = min(N, start_idx + window_size)
+            if end_idx - start_idx < window_size:
+                start_idx = max(0, end_idx - window_size)
+            window_points = trajectory[b, start_idx:end_idx]
+            t = np.arange(len(window_points))
+            x_deriv = np.polyder(np.polyfit(t, window_points[:, 0], poly_order))
+            y_deriv = np.polyder(np.polyfit(t, window_points[:, 1], poly_order))
+            center_t = min(i - start_idx, window_size - 1)
+            yaws[b, i] = np.arctan2(np.polyval(y_deriv, center_t), np.polyval(x_deriv, center_t))
+    return yaws
+
+
+def _curved_trajectories(batch, n, seed=0):
+    rng = np.random.default_rng(seed)
+    yaw = np.cumsum(rng.normal(0.0, 0.05, (batch, n)), axis=1)
+    step = rng.uniform(0.5, 2.0, (batch, 1))
+    xyz = np.zeros((batch, n, 3))
+    xyz[..., 0] = np.cumsum(step * np.cos(yaw), axis=1)
+    xyz[..., 1] = np.cumsum(step * np.sin(yaw), axis=1)
+    xyz[..., 2] = rng.normal(0.0, 0.01, (batch, n))
+    return xyz
+
+
+def _yaw(rot):
+    return np.arctan2(rot[..., 1, 0], rot[..., 0, 0])
+
+
+def test_vectorized_yaw_matches_per_window_polyfit():
+    for n, window_size, poly_order in ((64, 10, 3), (7, 10, 3), (25, 5, 2)):
+        trajectory = _curved_trajectories(4, n)
+        expected = _loop_reference(trajectory, window_size, poly_order)
+        rot = get_yaw_rotation_matrices(trajectory, window_size, poly_order)
+        assert rot.shape == (4, n, 3, 3)
+        np.testing.assert_allclose(_yaw(rot), expected, atol=1e-9)
+        np.testing.assert_allclose(rot[..., 2, :], np.broadcast_to([0.0, 0.0, 1.0], (4, n, 3)))
+
+        rot_torch = get_yaw_rotation_matrices_torch(torch.from_numpy(trajectory).float())
+        if (window_size, poly_order) == (10, 3):
+            np.testing.assert_allclose(_yaw(rot_torch.numpy()), expected, atol=1e-4)
+
+
+def test_decode_without_yaw_uses_vectorized_rotations():
+    tokenizer = DeltaTrajectoryTokenizer()
+    fut_xyz = torch.from_numpy(_curved_trajectories(2, 16, seed=3)).float() * 0.1
+    tokens = tokenizer.encode(None, None, fut_xyz, None)
+    decoded_xyz, decoded_rot, _ = tokenizer.decode(
+        torch.zeros(2, 1, 3), torch.eye(3).expand(2, 1, 3, 3), tokens
+    )
+    expected = _loop_reference(decoded_xyz.double().numpy())
+    assert decoded_rot.dtype == torch.float32
+    np.testing.assert_allclose(_yaw(decoded_rot.double().numpy()), expected, atol=1e-6)
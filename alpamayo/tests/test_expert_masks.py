@@ -0,0 +1,112 @@
+import logging
+import os
+import sys
+
+import torch
+from transformers import DynamicCache
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(TESTS_DIR, "..", "src"))
+for path in (SRC_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from tiny_models import tiny_expert
+
+from alpamayo1_5.models.expert_utils import build_expert_pos_ids_and_attn_mask, find_eos_offset
+
+MIN = torch.finfo(torch.float32).min
+CPU = torch.device("cpu")
+
+
+def test_dense_mask_masks_the_generation_gap_and_prefix_padding():
+    offset = torch.tensor([3, 5])
+    prefix_mask = torch.tensor([[0, 1, 1, 1], [1, 1, 1, 1]])
+
+    position_ids, mask = build_expert_pos_ids_and_attn_mask(
+        offset, torch.tensor([[1], [0]]), 6, 2, 2, CPU, prefix_mask
+    )
+
+    expected_rows = torch.tensor(
+        [
+            # prefix (4)   generated     diffusion
+            [MIN, 0, 0, MIN, MIN, MIN, 0, 0],
+            [0, 0, 0, 0, 0, MIN, 0, 0],
+        ]
+    )
+    assert mask.shape == (2, 1, 2, 8)
+    assert torch.equal(mask, expected_rows[:, None, None, :].expand(2, 1, 2, 8))
+    assert torch.equal(position_ids[:, 0], torch.tensor([[4, 5]] * 3))
+    assert torch.equal(position_ids[:, 1], torch.tensor([[5, 6]] * 3))
+
+
+def test_compact_and_bool_masks_broadcast_to_the_dense_mask():
+    g = torch.Generator().manual_seed(0)
+    offset = torch.randint(1, 21, (5,), generator=g)
+    rope_deltas = torch.randint(-3, 3, (5, 1), generator=g)
+    prefix_mask = (torch.rand(5, 12, generator=g) > 0.3).long()
+    args = (offset, rope_deltas, 20, 7, 5, CPU, prefix_mask)
+
+    _, dense = build_expert_pos_ids_and_attn_mask(*args)
+    _, compact = build_expert_pos_ids_and_attn_mask(*args, mask_format="compact")
+    _, boolean = build_expert_pos_ids_and_attn_mask(*args, mask_format="bool")
+
+    assert compact.shape == boolean.shape == (5, 1, 1, 27)
+    assert boolean.dtype == torch.bool
+    assert torch.equal(compact.expand_as(dense), dense)
+    assert torch.equal(boolean.expand(dense.shape), dense == 0)
+
+
+def test_expert_output_is_unchanged_by_the_compact_masks():
+    b_star, seq_len, n_tokens = 3, 11, 4
+    offset = torch.tensor([11, 8, 9])
+    rope_deltas = torch.tensor([[2], [0], [5]])
+    prefix_mask = torch.tensor([[1] * 7, [0, 0] + [1] * 5, [1] * 7])
+    embeds = torch.randn(b_star, n_tokens, 32, generator=torch.Generator().manual_seed(1))
+
+    for attn_implementation, mask_format in (
+        ("eager", "compact"),
+        ("sdpa", "compact"),
+        ("sdpa", "bool"),
+    ):
+        expert = tiny_expert(attn_implementation=attn_implementation)
+        outputs = []
+        for fmt in ("dense", mask_format):
+            position_ids, attention_mask = build_expert_pos_ids_and_attn_mask(
+                offset, rope_deltas, seq_len, n_tokens, b_star, CPU, prefix_mask, mask_format=fmt
+            )
+            g = torch.Generator().manual_seed(2)
+            cache = DynamicCache()
+            for layer_idx in range(2):
+                shape = (b_star, 2, seq_len, 8)
+                cache.update(
+                    torch.randn(shape, generator=g), torch.randn(shape, generator=g), layer_idx
+                )
+            with torch.no_grad():
+                outputs.append(
+                    expert(
+                        inputs_embeds=embeds,
+                        position_ids=position_ids,
+                        past_key_values=cache,
+                        attention_mask=attention_mask,
+                        use_cache=True,
+                    ).last_hidden_state
+                )
+        torch.testing.assert_close(outputs[1], outputs[0], rtol=0, atol=0)
+
+
+def test_find_eos_offset_warns_once_for_all_sequences_without_eos():
+    sequences = torch.tensor([[4, 9, 5, 5], [4, 4, 4, 4], [9, 4, 4, 4], [4, 4, 4, 4]])
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger("alpamayo1_5.models.expert_utils")
+    logger.addHandler(handler)
+    try:
+        offset = find_eos_offset(sequences, eos_token_id=9, device=CPU)
+    finally:
+        logger.removeHandler(handler)
+
+    assert offset.tolist() == [2, 4, 1, 4]
+    assert len(records) == 1
+    assert "[1, 3]" in records[0].getMessage()
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+import tempfile
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.export_manifest import ExportManifest, atomic_write_json
+
+PARAMS = {
+    "num_traj_samples": 16,
+    "guidance_weight": 1.5,
+    "max_generation_length": 256,
+    "cameras": ["front", "left", "right", "wide"],
+    "selection_mode": "heuristic",
+}
+
+
+def test_manifest_resumes_completed_frames_for_matching_params():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        manifest = ExportManifest.load(predictions_dir, PARAMS)
+        manifest.mark_complete(3)
+        manifest.mark_complete(4)
+
+        resumed = ExportManifest.load(predictions_dir, dict(PARAMS))
+        assert resumed.is_complete(3) and resumed.is_complete(4)
+        assert not resumed.is_complete(5)
+
+        assert not ExportManifest.load(predictions_dir, PARAMS, reset=True).is_complete(3)
+
+
+def test_manifest_discards_frames_when_params_change():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        ExportManifest.load(predictions_dir, PARAMS).mark_complete(7)
+
+        changed = ExportManifest.load(predictions_dir, {**PARAMS, "guidance_weight": 2.0})
+
+        assert not changed.is_complete(7)
+        assert changed.discarded_frames == 1
+
+
+def test_atomic_write_json_leaves_no_temp_files():
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = os.path.join(out_dir, "frame.json")
+        atomic_write_json(path, {"frame_index": 1})
+        atomic_write_json(path, {"frame_index": 2})
+
+        assert os.listdir(out_dir) == ["frame.json"]
+        with open(path, encoding="utf-8") as handle:
+            assert json.load(handle) == {"frame_index": 2}
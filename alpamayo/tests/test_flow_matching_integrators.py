@@ -0,0 +1,131 @@
+import os
+import sys
+
+import pytest
+import torch
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.diffusion.flow_matching import (
+    NFE_PER_STEP,
+    TIME_SCHEDULES,
+    FlowMatching,
+    make_time_steps,
+)
+
+MU = torch.tensor([1.0, -2.0, 0.5])
+STD = 0.3
+
+
+def gaussian_velocity(x, t):
+    """Exact flow matching velocity from N(0, I) to N(MU, STD^2 I); the flow maps x0 to MU + STD * x0."""
+    var_t = t**2 * STD**2 + (1 - t) ** 2
+    return MU + (t * STD**2 - (1 - t)) * (x - t * MU) / var_t
+
+
+def _sample_error(int_method, inference_step, time_schedule="uniform"):
+    diffusion = FlowMatching(x_dims=(3,))
+    torch.manual_seed(0)
+    expected = MU + STD * torch.randn(4, 3)
+    torch.manual_seed(0)
+    samples = diffusion.sample(
+        batch_size=4,
+        step_fn=gaussian_velocity,
+        int_method=int_method,
+        inference_step=inference_step,
+        time_schedule=time_schedule,
+    )
+    return (samples - expected).abs().max().item()
+
+
+def test_euler_matches_explicit_uniform_steps():
+    weights = torch.randn(2, 2, generator=torch.Generator().manual_seed(1))
+
+    def step_fn(x, t):
+        return torch.tanh(x @ weights) * (1 - t) + t
+
+    torch.manual_seed(0)
+    x = torch.randn(5, 4, 2)
+    for i in range(10):
+        x = x + 0.1 * step_fn(x, torch.full((5, 1, 1), i / 10))
+
+    torch.manual_seed(0)
+    samples = FlowMatching(x_dims=(4, 2), num_inference_steps=10).sample(
+        batch_size=5, step_fn=step_fn
+    )
+    torch.testing.assert_close(samples, x)
+
+
+def test_second_order_methods_converge_quadratically():
+    for int_method in ("midpoint", "heun"):
+        for time_schedule in TIME_SCHEDULES:
+            ratio = _sample_error(int_method, 16, time_schedule) / _sample_error(
+                int_method, 32, time_schedule
+            )
+            assert ratio > 3.5, (int_method, time_schedule, ratio)
+    euler_ratio = _sample_error("euler", 16) / _sample_error("euler", 32)
+    assert 1.8 < euler_ratio < 2.2
+
+
+def test_dpm_solver_2m_beats_euler_at_equal_evaluations():
+    for time_schedule in TIME_SCHEDULES:
+        for inference_step in (8, 16, 32):
+            assert _sample_error("dpm_solver_2m", inference_step, time_schedule) < _sample_error(
+                "euler", inference_step, time_schedule
+            )
+
+
+def _counted(calls, name):
+    """``gaussian_velocity`` counting its evaluations in ``calls[name]``."""
+
+    def step_fn(x, t):
+        calls[name] += 1
+        return gaussian_velocity(x, t)
+
+    return step_fn
+
+
+def test_evaluations_per_step_with_separate_and_fused_guidance():
+    diffusion = FlowMatching(x_dims=(3,), num_inference_steps=5, inference_guidance_weight=1.5)
+    for int_method, nfe_per_step in NFE_PER_STEP.items():
+        calls = {"guided": 0, "unguided": 0, "fused": 0}
+        diffusion.sample(
+            batch_size=2,
+            step_fn=_counted(calls, "guided"),
+            unguided_step_fn=_counted(calls, "unguided"),
+            use_classifier_free_guidance=True,
+            int_method=int_method,
+        )
+        diffusion.sample(
+            batch_size=2,
+            step_fn=_counted(calls, "fused"),
+            use_classifier_free_guidance=True,
+            fused_guidance=True,
+            int_method=int_method,
+        )
+        assert calls == {
+            "guided": 5 * nfe_per_step,
+            "unguided": 5 * nfe_per_step,
+            "fused": 5 * nfe_per_step,
+        }
+
+
+def test_time_schedules_increase_from_noise_to_data():
+    for time_schedule in TIME_SCHEDULES:
+        time_steps = make_time_steps(7, time_schedule)
+        assert time_steps.shape == (8,)
+        assert time_steps[0] == 0.0 and time_steps[-1] == 1.0
+        assert (time_steps.diff() > 0).all()
+    # quadratic spends more steps towards the data end
+    quadratic = make_time_steps(8, "quadratic").diff()
+    assert quadratic[-1] < quadratic[0]
+
+
+def test_invalid_method_and_schedule_raise():
+    diffusion = FlowMatching(x_dims=(3,))
+    with pytest.raises(ValueError, match="integration method"):
+        diffusion.sample(batch_size=1, step_fn=gaussian_velocity, int_method="rk4")
+    with pytest.raises(ValueError, match="time schedule"):
+        diffusion.sample(batch_size=1, step_fn=gaussian_velocity, time_schedule="log")
@@ -0,0 +1,135 @@
+import os
+import sys
+
+import torch
+from transformers import DynamicCache
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(TESTS_DIR, "..", "src"))
+for path in (SRC_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from tiny_models import HEAD_DIM, HIDDEN, N_KV_HEADS, N_LAYERS, tiny_expert
+
+from alpamayo1_5.diffusion.flow_matching import FlowMatching
+from alpamayo1_5.models.expert_utils import build_expert_pos_ids_and_attn_mask, stack_kv_caches
+
+N_DIFFUSION_TOKENS = 4
+
+
+def _random_cache(b_star, seq_len, seed):
+    g = torch.Generator().manual_seed(seed)
+    cache = DynamicCache()
+    for layer_idx in range(N_LAYERS):
+        shape = (b_star, N_KV_HEADS, seq_len, HEAD_DIM)
+        cache.update(torch.randn(shape, generator=g), torch.randn(shape, generator=g), layer_idx)
+    return cache
+
+
+def _expert_step(expert, embeds, position_ids, cache, attention_mask):
+    prefill_seq_len = cache.get_seq_length()
+    out = expert(
+        inputs_embeds=embeds,
+        position_ids=position_ids,
+        past_key_values=cache,
+        attention_mask=attention_mask,
+        use_cache=True,
+    )
+    cache.crop(prefill_seq_len)
+    return out.last_hidden_state
+
+
+def test_fused_expert_pass_matches_separate_guided_and_unguided_passes():
+    expert = tiny_expert()
+    b_star = 3
+    conditions = {
+        # name: (cache length, offsets, rope deltas, prefix mask)
+        "guided": (
+            11,
+            torch.tensor([11, 8, 9]),
+            torch.tensor([[2], [0], [5]]),
+            torch.tensor([[1] * 7, [0, 0] + [1] * 5, [1] * 7]),
+        ),
+        "unguided": (
+            7,
+            torch.tensor([7, 5, 6]),
+            torch.tensor([[1], [3], [0]]),
+            torch.tensor([[1] * 4, [0] + [1] * 3, [1] * 4]),
+        ),
+    }
+    embeds = torch.randn(
+        b_star, N_DIFFUSION_TOKENS, HIDDEN, generator=torch.Generator().manual_seed(1)
+    )
+
+    separate = []
+    for seed, (seq_len, offset, rope_deltas, prefix_mask) in enumerate(conditions.values()):
+        position_ids, attention_mask = build_expert_pos_ids_and_attn_mask(
+            offset,
+            rope_deltas,
+            seq_len,
+            N_DIFFUSION_TOKENS,
+            b_star,
+            torch.device("cpu"),
+            prefix_mask,
+        )
+        cache = _random_cache(b_star, seq_len, seed)
+        separate.append(_expert_step(expert, embeds, position_ids, cache, attention_mask))
+
+    fused_len = max(seq_len for seq_len, *_ in conditions.values())
+    masks = [
+        build_expert_pos_ids_and_attn_mask(
+            offset,
+            rope_deltas,
+            fused_len,
+            N_DIFFUSION_TOKENS,
+            b_star,
+            torch.device("cpu"),
+            prefix_mask,
+        )
+        for _, offset, rope_deltas, prefix_mask in conditions.values()
+    ]
+    fused_cache = stack_kv_caches(
+        [
+            _random_cache(b_star, seq_len, seed)
+            for seed, (seq_len, *_) in enumerate(conditions.values())
+        ]
+    )
+    assert fused_cache.get_seq_length() == fused_len
+    for _ in range(2):  # the cache is cropped back after every step
+        fused = _expert_step(
+            expert,
+            torch.cat([embeds, embeds]),
+            torch.cat([position_ids for position_ids, _ in masks], dim=1),
+            fused_cache,
+            torch.cat([attention_mask for _, attention_mask in masks]),
+        )
+        guided, unguided = fused.chunk(2)
+        torch.testing.assert_close(guided, separate[0], rtol=1e-5, atol=1e-5)
+        torch.testing.assert_close(unguided, separate[1], rtol=1e-5, atol=1e-5)
+
+
+def test_flow_matching_fused_guidance_matches_separate_step_functions():
+    weights = torch.randn(2, 5, 5, generator=torch.Generator().manual_seed(2))
+
+    def condition_v(x, t, condition):
+        return torch.tanh(x @ weights[condition]) * (1 - t) + condition
+
+    def fused_step_fn(x, t):
+        guided, unguided = x.chunk(2)
+        t_guided, t_unguided = t.chunk(2)
+        return torch.cat([condition_v(guided, t_guided, 0), condition_v(unguided, t_unguided, 1)])
+
+    diffusion = FlowMatching(x_dims=(4, 5), num_inference_steps=6, inference_guidance_weight=1.5)
+    torch.manual_seed(3)
+    expected = diffusion.sample(
+        batch_size=3,
+        step_fn=lambda x, t: condition_v(x, t, 0),
+        unguided_step_fn=lambda x, t: condition_v(x, t, 1),
+        use_classifier_free_guidance=True,
+    )
+    torch.manual_seed(3)
+    fused = diffusion.sample(
+        batch_size=3, step_fn=fused_step_fn, use_classifier_free_guidance=True, fused_guidance=True
+    )
+    torch.testing.assert_close(fused, expected)
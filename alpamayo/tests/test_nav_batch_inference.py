@@ -0,0 +1,171 @@
+import inspect
+import os
+import re
+import sys
+
+import torch
+from transformers import Qwen3VLModel
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ALPAMAYO_DIR = os.path.dirname(TESTS_DIR)
+SRC_DIR = os.path.join(ALPAMAYO_DIR, "src")
+for path in (ALPAMAYO_DIR, SRC_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from tiny_models import IMAGE_TOKEN_ID, VISION_END_ID, VISION_START_ID, tiny_vlm
+
+from alpamayo1_5.config import Alpamayo1_5Config
+from alpamayo1_5.models.alpamayo1_5 import Alpamayo1_5
+from alpamayo1_5.models.base_model import SPECIAL_TOKENS, TRAJ_TOKEN
+from alpamayo1_5.models.delta_tokenizer import DeltaTrajectoryTokenizer
+
+# batch_export_inference parses the command line when imported
+_argv, sys.argv = sys.argv, ["batch_export_inference.py"]
+try:
+    import batch_export_inference
+finally:
+    sys.argv = _argv
+
+
+# Tiny vocabulary: 0-2 bos/eos/pad, 3-9 text, 10-25 trajectory bins, 30-58 special tokens
+PAD_ID = 2
+TRAJ_TOKEN_START = 10
+TRAJ_VOCAB_SIZE = 16
+SPECIAL_IDS = {token: 30 + i for i, token in enumerate(SPECIAL_TOKENS.values())}
+TOKENS_PER_IMAGE = 4  # a [1, 4, 4] grid merged 2x2
+
+
+class StubTokenizer:
+    pad_token_id = PAD_ID
+
+    def convert_tokens_to_ids(self, token):
+        return SPECIAL_IDS[token]
+
+    def batch_decode(self, sequences, skip_special_tokens=False):
+        names = {token_id: token for token, token_id in SPECIAL_IDS.items()}
+        return ["".join(names.get(int(t), "x") for t in row) for row in sequences]
+
+
+class StubProcessor:
+    """Tokenizes a chat one character per token; each image is 16 patches of 4x4 pixels."""
+
+    def _tokenize(self, text):
+        ids = []
+        for piece in re.split(r"(<\|\w+\|>)", text):
+            if piece in SPECIAL_IDS:
+                ids.append(SPECIAL_IDS[piece])
+            else:
+                ids.extend(3 + ord(char) % 7 for char in piece)
+        return ids
+
+    def apply_chat_template(self, messages, **kwargs):
+        ids, patches = [0], []
+        for message in messages:
+            for item in message["content"]:
+                if item["type"] == "image":
+                    ids += [VISION_START_ID] + [IMAGE_TOKEN_ID] * TOKENS_PER_IMAGE + [VISION_END_ID]
+                    pixels = item["image"].float().div(255).reshape(3, 4, 4, 4, 4)
+                    pixels = pixels.permute(1, 3, 0, 2, 4).reshape(16, 48)
+                    patches.append(torch.cat([pixels, pixels], dim=1))  # temporal patch of 2
+                else:
+                    ids += self._tokenize(item["text"])
+        input_ids = torch.tensor([ids])
+        inputs = {
+            "input_ids": input_ids,
+            "attention_mask": torch.ones_like(input_ids),
+            "pixel_values": torch.cat(patches),
+            "image_grid_thw": torch.tensor([[1, 4, 4]] * len(patches)),
+        }
+        if "mm_token_type_ids" in inspect.signature(Qwen3VLModel.forward).parameters:
+            inputs["mm_token_type_ids"] = (input_ids == IMAGE_TOKEN_ID).long()
+        return inputs
+
+
+class TinyAlpamayo(Alpamayo1_5):
+    def _build_tokenizer(self, config):
+        return StubTokenizer()
+
+
+def _tiny_alpamayo():
+    config = Alpamayo1_5Config(
+        vlm_name_or_path=None,
+        traj_vocab_size=TRAJ_VOCAB_SIZE,
+        tokens_per_history_traj=48,
+        diffusion_cfg={
+            "_target_": "alpamayo1_5.diffusion.flow_matching.FlowMatching",
+            "num_inference_steps": 3,
+        },
+        action_space_cfg={
+            "_target_": "alpamayo1_5.action_space.UnicycleAccelCurvatureActionSpace",
+            "n_waypoints": 8,
+        },
+        action_in_proj_cfg={
+            "_target_": "alpamayo1_5.models.action_in_proj.PerWaypointActionInProjV2",
+            "num_enc_layers": 1,
+            "hidden_size": 16,
+        },
+        action_out_proj_cfg={"_target_": "torch.nn.Linear"},
+    )
+    config.traj_token_start_idx = TRAJ_TOKEN_START
+    config.traj_token_ids = {key: SPECIAL_IDS[token] for key, token in TRAJ_TOKEN.items()}
+    vlm = tiny_vlm()
+    # Peaked logits make sampling pick the top token whatever the random state
+    vlm.lm_head.weight.data.mul_(1e3)
+    torch.manual_seed(0)
+    model = TinyAlpamayo(
+        config,
+        pretrained_modules={
+            "vlm": vlm,
+            "traj_tokenizer": DeltaTrajectoryTokenizer(num_bins=TRAJ_VOCAB_SIZE),
+        },
+    )
+    return model.eval()
+
+
+def _frame(seed):
+    g = torch.Generator().manual_seed(seed)
+    history_xyz = torch.cumsum(torch.rand(1, 1, 16, 3, generator=g), dim=2)
+    return {
+        "image_frames": torch.randint(0, 256, (1, 2, 3, 16, 16), dtype=torch.uint8, generator=g),
+        "ego_history_xyz": history_xyz,
+        "ego_history_rot": torch.eye(3).expand(1, 1, 16, 3, 3).clone(),
+    }
+
+
+def test_batched_nav_inference_matches_one_frame_at_a_time():
+    model = _tiny_alpamayo()
+    processor = StubProcessor()
+    frames = [_frame(1), _frame(2)]
+    # Prompts of different lengths, so the first one is left-padded in the batch
+    nav_cmds = ["Turn left in 40m", "Continue straight"]
+    kwargs = {
+        "model": model,
+        "processor": processor,
+        "device": "cpu",
+        "num_traj_samples": 2,
+        "guidance_weight": 1.5,
+        "max_gen_length": 4,
+        # Zero initial noise, so the trajectories do not depend on how many rows draw noise
+        "diffusion_overrides": {"temperature": 0.0},
+    }
+
+    with torch.no_grad():
+        torch.manual_seed(0)
+        batched = batch_export_inference.run_nav_inference_batch(
+            batch=frames, nav_cmds=nav_cmds, **kwargs
+        )
+        single = []
+        for data, nav_cmd in zip(frames, nav_cmds):
+            torch.manual_seed(0)
+            single.append(
+                batch_export_inference.run_nav_inference(data=data, nav_cmd=nav_cmd, **kwargs)
+            )
+
+    assert len(batched) == 2
+    for (xyz, rot, extra), (expected_xyz, expected_rot, expected_extra) in zip(batched, single):
+        assert xyz.shape == expected_xyz.shape == (1, 1, 2, 8, 3)
+        torch.testing.assert_close(xyz, expected_xyz, rtol=1e-3, atol=1e-3)
+        torch.testing.assert_close(rot, expected_rot, rtol=1e-3, atol=1e-3)
+        assert extra.keys() == expected_extra.keys()
+    assert not torch.allclose(batched[0][0], batched[1][0])
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.path_selection import select_prediction_paths
+
+NAV_CMDS = ["Turn left in 20m", "Turn right", "Go Straight", "Keep lane", "go straight"]
+
+
+def _loop_reference(pred_np, nav_cmd, num_frames, selection_mode):
+    """Per-frame selection as batch export did it before batching."""
+    if selection_mode in ("mean", "median"):
+        selected = pred_np.mean(axis=0) if selection_mode == "mean" else np.median(pred_np, axis=0)
+        distance = np.linalg.norm(pred_np[:, :, :2] - selected[None, :, :2], axis=-1).mean(axis=1)
+        sample_idx = int(np.argmin(distance))
+    else:
+        nav_lower = nav_cmd.lower()
+        final_lateral = pred_np[:, -1, 1]
+        final_forward = pred_np[:, -1, 0]
+        if "left" in nav_lower:
+            sample_idx = int(np.argmax(final_lateral))
+        elif "right" in nav_lower:
+            sample_idx = int(np.argmin(final_lateral))
+        elif "straight" in nav_lower:
+            sample_idx = int(np.argmin(np.abs(final_lateral)))
+        else:
+            sample_idx = int(np.argmax(final_forward - np.abs(final_lateral)))
+        selected = pred_np[sample_idx]
+    n_frames = min(num_frames, selected.shape[0])
+    return selected[:n_frames], n_frames, sample_idx
+
+
+def _samples(frames=5, samples=16, steps=20, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(0.5, 1.0, (frames, samples, steps, 3)), axis=2).astype(np.float32)
+
+
+def test_batched_selection_matches_per_frame_loop():
+    samples = _samples()
+    for selection_mode in ("heuristic", "mean", "median"):
+        selection = select_prediction_paths(torch.from_numpy(samples), NAV_CMDS, 12, selection_mode)
+        assert selection.selected_paths.shape == (5, 12, 3)
+        assert selection.selected_paths.dtype == np.float32
+        for i, nav_cmd in enumerate(NAV_CMDS):
+            expected, n_frames, sample_idx = _loop_reference(
+                samples[i], nav_cmd, 12, selection_mode
+            )
+            assert selection.n_frames == n_frames
+            assert selection.sample_indices[i] == sample_idx
+            np.testing.assert_allclose(selection.selected_paths[i], expected, rtol=1e-6)
+
+
+def test_medoid_picks_the_most_central_sample():
+    samples = np.zeros((1, 4, 3, 3), dtype=np.float32)
+    samples[0, :, :, 1] = np.array([0.0, 1.0, 1.5, 10.0])[:, None]
+    selection = select_prediction_paths(samples, ["Keep lane"], 64, "medoid")
+    assert selection.n_frames == 3
+    assert selection.sample_indices.tolist() == [1]
+    np.testing.assert_array_equal(selection.selected_paths[0], samples[0, 1])
+
+
+def test_selection_handles_empty_samples_and_rejects_unknown_modes():
+    selection = select_prediction_paths(np.zeros((2, 0, 8, 3)), ["Go Straight"] * 2, 8)
+    assert selection.n_frames == 0
+    assert selection.selected_paths.shape == (2, 1, 3)
+    with pytest.raises(ValueError):
+        select_prediction_paths(_samples(), NAV_CMDS, 8, "best")
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import numpy as np
+import torch
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.load_custom_dataset import _integrate_segment_pose, integrate_pose_batch
+
+
+def _loop_reference(timestamps_s, speeds_m_s, yaw_rates_rad_s):
+    n = timestamps_s.shape[0]
+    xyz = np.zeros((n, 3), dtype=np.float64)
+    theta = np.zeros(n, dtype=np.float64)
+    for i in range(1, n):
+        dt = max(float(timestamps_s[i] - timestamps_s[i - 1]), 0.0)
+        v_mid = 0.5 * (speeds_m_s[i - 1] + speeds_m_s[i])
+        w_mid = 0.5 * (yaw_rates_rad_s[i - 1] + yaw_rates_rad_s[i])
+        theta_mid = theta[i - 1] + 0.5 * w_mid * dt
+        xyz[i, 0] = xyz[i - 1, 0] + v_mid * np.cos(theta_mid) * dt
+        xyz[i, 1] = xyz[i - 1, 1] + v_mid * np.sin(theta_mid) * dt
+        theta[i] = theta[i - 1] + w_mid * dt
+    return xyz, np.unwrap(theta)
+
+
+def _synthetic_route(n, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps_s = np.cumsum(rng.uniform(0.04, 0.06, n))
+    speeds_m_s = 10.0 + rng.normal(0.0, 1.0, n)
+    yaw_rates_rad_s = 0.3 * np.sin(np.linspace(0.0, 20.0, n))
+    return timestamps_s, speeds_m_s, yaw_rates_rad_s
+
+
+def test_vectorized_integration_matches_loop():
+    timestamps_s, speeds_m_s, yaw_rates_rad_s = _synthetic_route(2000)
+    timestamps_s[500] = timestamps_s[499] - 0.01  # clamped negative dt
+
+    xyz, theta = _integrate_segment_pose(timestamps_s, speeds_m_s, yaw_rates_rad_s)
+    ref_xyz, ref_theta = _loop_reference(timestamps_s, speeds_m_s, yaw_rates_rad_s)
+
+    np.testing.assert_allclose(xyz, ref_xyz, atol=1e-9)
+    np.testing.assert_allclose(theta, ref_theta, atol=1e-12)
+
+
+def test_batched_torch_integration_matches_numpy():
+    routes = [_synthetic_route(300, seed=seed) for seed in range(3)]
+    stacked = [torch.from_numpy(np.stack(column)) for column in zip(*routes)]
+
+    xyz, theta = integrate_pose_batch(*stacked)
+
+    assert xyz.shape == (3, 300, 3)
+    for route_idx, route in enumerate(routes):
+        ref_xyz, ref_theta = _integrate_segment_pose(*route)
+        np.testing.assert_allclose(xyz[route_idx].numpy(), ref_xyz, atol=1e-9)
+        np.testing.assert_allclose(theta[route_idx].numpy(), ref_theta, atol=1e-12)
@@ -0,0 +1,185 @@
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.prediction_store import (
+    STORE_RECORDS_FILENAME,
+    PredictionStoreWriter,
+    dumps_prediction_payload,
+    export_json,
+    load_prediction_store,
+    open_segment_export,
+)
+
+METADATA = {
+    "model_name": "nvidia/Alpamayo-1.5-10B",
+    "route": "route_1",
+    "segment": "segment_00",
+    "selection_mode": "heuristic",
+    "num_traj_samples": 4,
+    "frames_requested": 8,
+}
+
+
+def _append(writer, frame_index, offset=0.0, text="keep lane"):
+    selected = np.arange(24, dtype=np.float64).reshape(8, 3) + offset
+    ground_truth = selected[:6] * 0.5
+    writer.append(
+        frame_index=frame_index,
+        selected_path=selected,
+        ground_truth_path=ground_truth,
+        nav_command="Go straight",
+        command_text="Go straight",
+        reasoning_text=text,
+        selected_sample_index=1,
+        clip_id="route_1",
+        t0_us=frame_index * 100_000,
+        frames_requested=8,
+    )
+    return selected, ground_truth
+
+
+def test_store_round_trips_payloads_and_keeps_last_record():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        with PredictionStoreWriter(predictions_dir, METADATA) as writer:
+            _append(writer, 3)
+            _append(writer, 1)
+        with PredictionStoreWriter(predictions_dir, METADATA) as writer:
+            selected, ground_truth = _append(writer, 3, offset=10.0, text="turn soon")
+
+        store = load_prediction_store(predictions_dir)
+        assert store.frame_indices() == [1, 3]
+        assert store.selected_path(3).dtype == np.float32
+        np.testing.assert_allclose(store.selected_path(3), selected)
+        np.testing.assert_allclose(store.ground_truth_path(3), ground_truth)
+
+        payload = store.payload(3)
+        assert payload["segment"] == "segment_00"
+        assert payload["reasoning_text"] == "turn soon"
+        assert payload["frames_stored"] == 8
+        assert payload["selected_path"][2] == {
+            "step_index": 2,
+            "x_m": 16.0,
+            "y_m": 17.0,
+            "z_m": 18.0,
+        }
+        assert len(payload["ground_truth_path"]) == 6
+
+        paths = export_json(store, os.path.join(predictions_dir, "json"))
+        assert [os.path.basename(path) for path in paths] == [
+            "segment_00_000001_prediction.json",
+            "segment_00_000003_prediction.json",
+        ]
+        with open(paths[1], "r", encoding="utf-8") as handle:
+            assert json.load(handle) == payload
+
+
+def test_store_ignores_interrupted_append_and_resets_on_new_metadata():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        with PredictionStoreWriter(predictions_dir, METADATA) as writer:
+            _append(writer, 0)
+        with open(
+            os.path.join(predictions_dir, STORE_RECORDS_FILENAME), "a", encoding="utf-8"
+        ) as handle:
+            handle.write('{"frame_index": 1, "off')
+
+        assert load_prediction_store(predictions_dir).frame_indices() == [0]
+
+        with PredictionStoreWriter(predictions_dir, METADATA) as writer:
+            _append(writer, 2)
+        assert load_prediction_store(predictions_dir).frame_indices() == [0, 2]
+
+        with PredictionStoreWriter(predictions_dir, {**METADATA, "num_traj_samples": 8}) as writer:
+            _append(writer, 5)
+        store = load_prediction_store(predictions_dir)
+        assert store.frame_indices() == [5]
+        assert store.metadata["num_traj_samples"] == 8
+
+
+def test_array_backed_payload_json_matches_record_dicts():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        with PredictionStoreWriter(predictions_dir, METADATA) as writer:
+            _append(writer, 4, offset=0.1)
+        store = load_prediction_store(predictions_dir)
+
+        expected = json.dumps(store.payload(4), indent=2)
+        assert dumps_prediction_payload(store.payload(4, path_arrays=True)) == expected
+
+        payload = store.payload(4, path_arrays=True)
+        payload["selected_path"] = payload["selected_path"][:, :2]
+        payload["ground_truth_path"] = payload["ground_truth_path"][:0]
+        decoded = json.loads(dumps_prediction_payload(payload))
+        assert decoded["selected_path"][1]["z_m"] == 0.0
+        assert decoded["ground_truth_path"] == []
+
+
+PARAMS = {
+    "model_name": "nvidia/Alpamayo-1.5-10B",
+    "num_traj_samples": 4,
+    "cameras": ["front", "wide"],
+}
+
+
+def _export(predictions_dir, params, metadata, frames, **kwargs):
+    manifest, writer, skip_frames = open_segment_export(
+        predictions_dir, params, metadata, range(frames), **kwargs
+    )
+    with writer:
+        for frame_index in range(frames):
+            if frame_index not in skip_frames:
+                _append(writer, frame_index)
+                manifest.mark_complete(frame_index)
+    return manifest, skip_frames
+
+
+def test_rerun_skips_frames_only_while_the_store_still_has_them():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        metadata = {**PARAMS, "route": "route_1", "segment": "segment_00"}
+        _export(predictions_dir, PARAMS, metadata, 3)
+
+        _, skip_frames = _export(predictions_dir, dict(PARAMS), dict(metadata), 3)
+        assert skip_frames == {0, 1, 2}
+        assert load_prediction_store(predictions_dir).frame_indices() == [0, 1, 2]
+
+        # The store starts over when only its metadata changed: the manifest must follow
+        manifest, skip_frames = _export(
+            predictions_dir, PARAMS, {**metadata, "route": "route_2"}, 2
+        )
+        assert skip_frames == set()
+        assert manifest.discarded_frames == 3
+        assert manifest.completed_frames == {0, 1}
+        assert load_prediction_store(predictions_dir).frame_indices() == [0, 1]
+
+        manifest, skip_frames = _export(
+            predictions_dir,
+            {**PARAMS, "num_traj_samples": 8},
+            {**metadata, "num_traj_samples": 8},
+            2,
+        )
+        assert skip_frames == set()
+        assert load_prediction_store(predictions_dir).frame_indices() == [0, 1]
+
+
+def test_json_only_export_skips_frames_whose_json_exists():
+    with tempfile.TemporaryDirectory() as predictions_dir:
+        manifest, writer, _ = open_segment_export(predictions_dir, PARAMS, None, range(3))
+        assert writer is None
+        manifest.mark_complete(0)
+        manifest.mark_complete(1)
+        open(os.path.join(predictions_dir, "1.json"), "w").close()
+
+        _, _, skip_frames = open_segment_export(
+            predictions_dir,
+            PARAMS,
+            None,
+            range(3),
+            json_path=lambda idx: os.path.join(predictions_dir, f"{idx}.json"),
+        )
+        assert skip_frames == {1}
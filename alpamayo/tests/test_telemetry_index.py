@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from alpamayo1_5.telemetry_index import (
+    TELEMETRY_INDEX_FILENAME,
+    load_telemetry_index,
+    load_telemetry_series,
+)
+
+
+def _write_segment(route_dir, name, start_s, count):
+    telemetry_dir = os.path.join(route_dir, name, "telemetry")
+    os.makedirs(telemetry_dir)
+    for idx in range(count):
+        payload = {
+            "timestamp_seconds": start_s + 0.05 * idx,
+            "v_ego": 10.0 + idx,
+            "yaw_rate": 0.01 * idx,
+        }
+        with open(os.path.join(telemetry_dir, f"{idx:06d}.json"), "w", encoding="utf-8") as handle:
+            json.dump(payload, handle)
+    return os.path.join(route_dir, name)
+
+
+def test_index_matches_parsed_telemetry_and_is_persisted():
+    with tempfile.TemporaryDirectory() as route_dir:
+        seg_0 = _write_segment(route_dir, "segment_00", 0.0, 5)
+        seg_1 = _write_segment(route_dir, "segment_01", 1.0, 3)
+
+        index = load_telemetry_index(route_dir)
+
+        assert os.path.exists(os.path.join(route_dir, TELEMETRY_INDEX_FILENAME))
+        assert index.segment_names == ["segment_00", "segment_01"]
+        assert index.segment_bounds(seg_1) == (5, 8)
+        assert index.segment_length("segment_00") == 5
+
+        timestamps_s, speeds_m_s, yaw_rates_rad_s = load_telemetry_series(
+            os.path.join(seg_0, "telemetry")
+        )
+        np.testing.assert_allclose(index.timestamps_s[:5], timestamps_s)
+        np.testing.assert_allclose(index.speeds_m_s[:5], speeds_m_s)
+        np.testing.assert_allclose(index.yaw_rates_rad_s[:5], yaw_rates_rad_s)
+
+        reloaded = load_telemetry_index(route_dir)
+        np.testing.assert_array_equal(reloaded.timestamps_s, index.timestamps_s)
+        np.testing.assert_array_equal(reloaded.segment_offsets, index.segment_offsets)
+
+
+def test_index_is_rebuilt_when_telemetry_directory_changes():
+    with tempfile.TemporaryDirectory() as route_dir:
+        seg_0 = _write_segment(route_dir, "segment_00", 0.0, 4)
+        assert len(load_telemetry_index(route_dir)) == 4
+
+        telemetry_dir = os.path.join(seg_0, "telemetry")
+        with open(os.path.join(telemetry_dir, "000004.json"), "w", encoding="utf-8") as handle:
+            json.dump({"timestamp_seconds": 0.2, "v_ego": 1.0}, handle)
+        stat = os.stat(telemetry_dir)
+        os.utime(telemetry_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert len(load_telemetry_index(route_dir)) == 5
+
+        _write_segment(route_dir, "segment_01", 1.0, 2)
+        index = load_telemetry_index(route_dir)
+        assert index.segment_names == ["segment_00", "segment_01"]
+        assert len(index) == 7
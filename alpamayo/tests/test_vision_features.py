@@ -0,0 +1,234 @@
+import inspect
+import os
+import sys
+
+import torch
+from transformers import Qwen2VLImageProcessor, Qwen3VLModel
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.abspath(os.path.join(TESTS_DIR, "..", "src"))
+for path in (SRC_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from tiny_models import IMAGE_TOKEN_ID, VISION_END_ID, VISION_START_ID, tiny_vlm
+
+from alpamayo1_5.models.vision_features import (
+    ImageFeatures,
+    SharedImageFeatures,
+    VisionEmbeddingCache,
+    image_cache_keys,
+)
+
+
+def _image_span(n_tokens):
+    return [VISION_START_ID] + [IMAGE_TOKEN_ID] * n_tokens + [VISION_END_ID]
+
+
+def _with_token_types(inputs):
+    if "mm_token_type_ids" in inspect.signature(Qwen3VLModel.forward).parameters:
+        inputs["mm_token_type_ids"] = (inputs["input_ids"] == IMAGE_TOKEN_ID).long()
+    return inputs
+
+
+def _inputs():
+    # Two samples with two images each; a [1, 4, 4] grid is 16 patches and 4 tokens
+    image_grid_thw = torch.tensor([[1, 4, 4], [1, 4, 8], [1, 4, 8], [1, 4, 4]])
+    pixel_values = torch.randn(96, 96, generator=torch.Generator().manual_seed(1))
+    input_ids = torch.tensor(
+        [
+            [5] + _image_span(4) + _image_span(8) + [7, 8],
+            [5] + _image_span(8) + _image_span(4) + [9, 9],
+        ]
+    )
+    return _with_token_types(
+        {"input_ids": input_ids, "pixel_values": pixel_values, "image_grid_thw": image_grid_thw}
+    )
+
+
+def _window_inputs(images):
+    """One sample showing ``images`` (16 patches each) in order, as a sliding camera window."""
+    input_ids = torch.tensor([[5] + [token for _ in images for token in _image_span(4)] + [7]])
+    return _with_token_types(
+        {
+            "input_ids": input_ids,
+            "pixel_values": torch.cat(images),
+            "image_grid_thw": torch.tensor([[1, 4, 4]] * len(images)),
+        }
+    )
+
+
+def _count_vision_calls(vlm):
+    calls = []
+    vlm.model.visual.register_forward_hook(lambda *_: calls.append(1))
+    return calls
+
+
+def _generate(vlm, inputs):
+    torch.manual_seed(5)
+    return vlm.generate(
+        **inputs,
+        num_return_sequences=3,
+        do_sample=True,
+        top_k=1,
+        max_new_tokens=4,
+        output_logits=True,
+        return_dict_in_generate=True,
+    )
+
+
+def test_shared_image_features_match_generate_and_prefill_with_one_encoder_pass():
+    vlm = tiny_vlm()
+    inputs = _inputs()
+    calls = _count_vision_calls(vlm)
+
+    with torch.no_grad():
+        expected = _generate(vlm, inputs)
+        expected_prefill = vlm(**inputs).logits
+        calls.clear()
+
+        image_features = SharedImageFeatures(
+            vlm.model,
+            inputs["pixel_values"],
+            inputs["image_grid_thw"],
+            inputs["input_ids"],
+            IMAGE_TOKEN_ID,
+        )
+        with image_features:
+            outputs = _generate(vlm, inputs)
+        with image_features:
+            prefill = vlm(**inputs).logits
+
+    assert len(calls) == 1
+    assert image_features.encoder_calls == 1
+    assert image_features.reused_calls == 2
+    assert "get_image_features" not in vars(vlm.model)
+    assert torch.equal(outputs.sequences, expected.sequences)
+    for logits, expected_logits in zip(outputs.logits, expected.logits):
+        torch.testing.assert_close(logits, expected_logits)
+    torch.testing.assert_close(prefill, expected_prefill)
+
+
+def test_shared_image_features_fall_back_to_the_encoder_for_other_images():
+    vlm = tiny_vlm()
+    inputs = _inputs()
+    other_inputs = {**inputs, "pixel_values": inputs["pixel_values"] + 1}
+
+    with torch.no_grad():
+        expected = vlm(**other_inputs).logits
+        image_features = SharedImageFeatures(
+            vlm.model,
+            inputs["pixel_values"],
+            inputs["image_grid_thw"],
+            inputs["input_ids"],
+            IMAGE_TOKEN_ID,
+        )
+        with image_features:
+            logits = vlm(**other_inputs).logits
+
+    assert image_features.reused_calls == 0
+    torch.testing.assert_close(logits, expected)
+
+
+def test_vision_cache_encodes_only_new_images_of_a_sliding_window():
+    vlm = tiny_vlm()
+    g = torch.Generator().manual_seed(2)
+    images = [torch.randn(16, 96, generator=g) for _ in range(4)]
+    encoded_patches = []
+    vlm.model.visual.register_forward_hook(
+        lambda _, args, __: encoded_patches.append(args[0].shape[0])
+    )
+    cache = VisionEmbeddingCache()
+
+    for start in range(2):
+        window = images[start : start + 3]
+        inputs = _window_inputs(window)
+        with torch.no_grad():
+            expected = vlm(**inputs).logits
+            encoded_patches.clear()
+            image_features = SharedImageFeatures(
+                vlm.model,
+                inputs["pixel_values"],
+                inputs["image_grid_thw"],
+                inputs["input_ids"],
+                IMAGE_TOKEN_ID,
+                cache=cache,
+                image_keys=[f"image-{start + i}" for i in range(len(window))],
+            )
+            with image_features:
+                logits = vlm(**inputs).logits
+        torch.testing.assert_close(logits, expected)
+
+    # The second window shares two images with the first and encodes only the new one
+    assert encoded_patches == [16]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["encoded_images"]) == (2, 4, 4)
+    assert stats["entries"] == 4
+
+
+def test_vision_cache_encodes_images_repeated_within_a_batch_once():
+    vlm = tiny_vlm()
+    g = torch.Generator().manual_seed(4)
+    first, second = torch.randn(16, 96, generator=g), torch.randn(16, 96, generator=g)
+    inputs = _window_inputs([first, second, first, second])
+    encoded_patches = []
+    vlm.model.visual.register_forward_hook(
+        lambda _, args, __: encoded_patches.append(args[0].shape[0])
+    )
+    cache = VisionEmbeddingCache()
+
+    with torch.no_grad():
+        expected = vlm(**inputs).logits
+        encoded_patches.clear()
+        image_features = SharedImageFeatures(
+            vlm.model,
+            inputs["pixel_values"],
+            inputs["image_grid_thw"],
+            inputs["input_ids"],
+            IMAGE_TOKEN_ID,
+            cache=cache,
+            image_keys=["first", "second", "first", "second"],
+        )
+        with image_features:
+            logits = vlm(**inputs).logits
+
+    torch.testing.assert_close(logits, expected)
+    assert encoded_patches == [32]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["encoded_images"], stats["entries"]) == (
+        0,
+        2,
+        2,
+        2,
+    )
+
+
+def test_vision_cache_evicts_least_recently_used_images_beyond_its_budget():
+    def features(value):
+        return ImageFeatures(torch.full((5, 4), value), (torch.full((5, 4), value),))
+
+    cache = VisionEmbeddingCache(max_bytes=2 * features(0.0).nbytes)
+    cache.put("a", features(0.0))
+    cache.put("b", features(1.0))
+    assert cache.get("a") is not None
+    cache.put("c", features(2.0))
+
+    assert cache.get("b") is None
+    assert cache.get("c").embeds[0, 0] == 2.0
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 2 * features(0.0).nbytes
+
+
+def test_image_cache_keys_hash_content_and_processor_settings():
+    frames = torch.randint(
+        0, 255, (3, 3, 24, 32), dtype=torch.uint8, generator=torch.Generator().manual_seed(3)
+    )
+    frames[2] = frames[0]
+    processor = Qwen2VLImageProcessor(min_pixels=163840, max_pixels=196608)
+    other_processor = Qwen2VLImageProcessor(min_pixels=163840, max_pixels=262144)
+
+    keys = image_cache_keys(frames, processor)
+
+    assert keys[0] == keys[2]
+    assert keys[0] != keys[1]
+    assert image_cache_keys(frames, other_processor)[0] != keys[0]
@@ -0,0 +1,63 @@
+"""Tiny randomly initialised Qwen3-VL models shared by the model tests."""
+
+import torch
+from transformers import AutoModel, Qwen3VLConfig, Qwen3VLForConditionalGeneration
+
+N_LAYERS = 2
+N_KV_HEADS = 2
+HEAD_DIM = 8
+HIDDEN = 32
+
+IMAGE_TOKEN_ID = 60
+VIDEO_TOKEN_ID = 61
+VISION_START_ID = 62
+VISION_END_ID = 63
+
+
+def tiny_config():
+    return Qwen3VLConfig(
+        text_config={
+            "hidden_size": HIDDEN,
+            "intermediate_size": 64,
+            "num_hidden_layers": N_LAYERS,
+            "num_attention_heads": 4,
+            "num_key_value_heads": N_KV_HEADS,
+            "head_dim": HEAD_DIM,
+            "vocab_size": 64,
+            "bos_token_id": 0,
+            "eos_token_id": 1,
+            "pad_token_id": 2,
+            "rope_scaling": {
+                "rope_type": "default",
+                "mrope_section": [2, 1, 1],
+                "mrope_interleaved": True,
+            },
+        },
+        vision_config={
+            "depth": 2,
+            "hidden_size": HIDDEN,
+            "num_heads": 2,
+            "intermediate_size": 64,
+            "patch_size": 4,
+            "spatial_merge_size": 2,
+            "temporal_patch_size": 2,
+            "out_hidden_size": HIDDEN,
+            "deepstack_visual_indexes": [0, 1],
+            "num_position_embeddings": 16,
+        },
+        image_token_id=IMAGE_TOKEN_ID,
+        video_token_id=VIDEO_TOKEN_ID,
+        vision_start_token_id=VISION_START_ID,
+        vision_end_token_id=VISION_END_ID,
+    )
+
+
+def tiny_expert(**kwargs):
+    """The text model alone, as the action expert uses it; kwargs go to ``from_config``."""
+    torch.manual_seed(0)
+    return AutoModel.from_config(tiny_config().text_config, **kwargs).eval()
+
+
+def tiny_vlm():
+    torch.manual_seed(0)
+    return Qwen3VLForConditionalGeneration(tiny_config()).eval()
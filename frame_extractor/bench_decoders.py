@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the video decoder backends on a synthetic video generated locally.
+
+The video is written with OpenCV's mp4v encoder (moving gradient plus a fixed
+noise texture). Each available backend decodes it sequentially, sparsely
+(every ``--stride`` frames, seeking across gaps longer than
+``--seek-threshold``) and sequentially at half resolution. Backends whose
+dependencies are missing are skipped.
+
+Examples:
+  python3 frame_extractor/bench_decoders.py
+  python3 frame_extractor/bench_decoders.py --frames 1200 --size 1928x1208 --threads 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from video_decoders import available_backends, open_decoder, parse_size
+
+
+def write_synthetic_video(path, frames, size, fps):
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError("OpenCV cannot write mp4v video")
+    rng = np.random.default_rng(0)
+    texture = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    ramp = np.linspace(0, 191, width, dtype=np.float32)
+    for idx in range(frames):
+        row = ((ramp + idx * 4) % 192).astype(np.uint8)
+        frame = texture + row[None, :, None]
+        cv2.putText(frame, f"{idx:05d}", (40, 120), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 6)
+        writer.write(frame)
+    writer.release()
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        count = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=600, help="Frames in the synthetic video")
+    parser.add_argument("--size", default="1280x720", help="Synthetic video size, WIDTHxHEIGHT")
+    parser.add_argument("--fps", type=float, default=20.0, help="Synthetic video frame rate")
+    parser.add_argument("--stride", type=int, default=50, help="Frame step of the sparse pass")
+    parser.add_argument("--seek-threshold", type=int, default=24, help="Seek threshold of the sparse pass")
+    parser.add_argument("--threads", type=int, default=0, help="Decoder threads; 0 keeps the backend default")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is reported)")
+    parser.add_argument("--video", default=None, help="Benchmark this video instead of a synthetic one")
+    args = parser.parse_args()
+
+    size = parse_size(args.size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(tmp_dir, "synthetic.mp4")
+            start = time.perf_counter()
+            write_synthetic_video(video_path, args.frames, size, args.fps)
+            print(f"Wrote {args.frames} frames at {size[0]}x{size[1]} in {time.perf_counter() - start:.1f}s")
+
+        # Probe once and share the metadata, so no backend pays for a second probe.
+        with open_decoder("opencv", video_path) as decoder:
+            info = decoder.info
+        half_size = (info.width // 2, info.height // 2)
+        passes = {
+            "sequential": (None, list(range(info.total_frames)), 0),
+            "sparse": (None, list(range(0, info.total_frames, args.stride)), args.seek_threshold),
+            f"sequential {half_size[0]}x{half_size[1]}": (half_size, list(range(info.total_frames)), 0),
+        }
+
+        print(f"Decoding {info.total_frames} frames, {info.width}x{info.height} at {info.fps:.1f} FPS")
+        for backend in ("opencv", "pyav", "ffmpeg"):
+            if backend not in available_backends():
+                print(f"  {backend:<7} skipped (not installed)")
+                continue
+            for name, (output_size, indices, seek_threshold) in passes.items():
+
+                def run():
+                    with open_decoder(backend, video_path, output_size, args.threads, info) as decoder:
+                        return sum(1 for _ in decoder.iter_frames(indices, seek_threshold))
+
+                seconds, count = best_of(run, args.repeats)
+                print(
+                    f"  {backend:<7} {name:<22}: {seconds * 1e3:8.1f} ms  "
+                    f"{count / seconds:8.1f} frames/s  ({count} frames)"
+                )
+
+
+if __name__ == "__main__":
+    main()
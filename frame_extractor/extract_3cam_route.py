@@ -14,23 +14,45 @@ Examples:
   python extract_3cam_route.py --video-time-offset 0.5
   python extract_3cam_route.py --sync-mode index --sync-offset 13
   python extract_3cam_route.py --dry-run
+  python extract_3cam_route.py --workers 1 --seek-threshold 0
+  python extract_3cam_route.py --png-compression 1 --encode-threads 8
+  python extract_3cam_route.py --image-format webp
+  python extract_3cam_route.py --decoder pyav --decode-threads 4 --output-size 964x604
 """
 
 import argparse
-import json
 import os
+import shutil
 import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "alpamayo", "src")))
+
+from alpamayo1_5.telemetry_index import load_telemetry_index
+from video_decoders import (
+    DECODER_BACKENDS,
+    DEFAULT_SEEK_THRESHOLD,
+    VideoInfo,
+    open_decoder,
+    parse_size,
+)
+
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(SCRIPT_DIR)
 VIDEOS_DIR = os.path.join(SCRIPT_DIR, "videos")
 DATASETS_DIR = os.path.join(PROJECT_DIR, "datasets")
-IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+DEFAULT_ENCODE_THREADS = 4
+
+# Output image format -> file extension. The dataset loader reads PNG frames.
+IMAGE_FORMATS = {"png": ".png", "webp": ".webp", "jpg": ".jpg"}
 
 # Camera mapping: (video filename prefix, output directory name)
 CAMERAS = [
@@ -48,55 +70,149 @@ def find_video(prefix: str) -> Optional[str]:
     return None
 
 
-def get_video_info(path: str) -> Tuple[int, float, int, int]:
+def get_video_info(path: str, backend: str = "opencv") -> VideoInfo:
     """Return total frames, fps, width, and height for a video."""
-    cap = cv2.VideoCapture(path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Cannot open video: {path}")
-
-    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    cap.release()
+    with open_decoder(backend, path) as decoder:
+        info = decoder.info
 
-    if total <= 0 or fps <= 0:
+    if info.total_frames <= 0 or info.fps <= 0:
         raise RuntimeError(f"Video metadata is invalid for {path}")
 
-    return total, fps, width, height
+    return info
 
 
-def extract_frames(video_path: str, frame_indices: List[Optional[int]]) -> Dict[int, np.ndarray]:
+def encode_params(
+    image_format: str = "png",
+    png_compression: Optional[int] = None,
+    quality: Optional[int] = None,
+) -> Tuple[str, List[int]]:
     """
-    Extract a unique set of frames from a video by index.
+    Return the ``cv2.imencode`` extension and parameters for an output format.
 
-    Returns a map of frame_index -> BGR frame.
+    ``png_compression`` is the zlib level 0-9 (``None`` keeps OpenCV's default).
+    WebP is lossless unless ``quality`` (1-100) is given; JPEG uses ``quality``
+    or OpenCV's default of 95.
     """
-    requested = sorted({idx for idx in frame_indices if idx is not None})
-    if not requested:
-        return {}
-
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        raise RuntimeError(f"Cannot open video: {video_path}")
-
-    frame_map: Dict[int, np.ndarray] = {}
-    request_set = set(requested)
-    max_idx = requested[-1]
-    current = 0
-
-    while current <= max_idx:
-        ok, frame = cap.read()
-        if not ok:
-            break
-
-        if current in request_set:
-            frame_map[current] = frame
-
-        current += 1
-
-    cap.release()
-    return frame_map
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format {image_format!r}; expected one of {sorted(IMAGE_FORMATS)}")
+
+    params: List[int] = []
+    if image_format == "png" and png_compression is not None:
+        if not 0 <= png_compression <= 9:
+            raise ValueError(f"PNG compression must be between 0 and 9, got {png_compression}")
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    elif image_format == "webp":
+        # OpenCV treats WebP quality above 100 as lossless.
+        params = [cv2.IMWRITE_WEBP_QUALITY, 101 if quality is None else quality]
+    elif image_format == "jpg" and quality is not None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    return IMAGE_FORMATS[image_format], params
+
+
+def link_or_copy(source: str, destination: str) -> None:
+    """Hard-link ``source`` to ``destination``, copying when links are not supported."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def encode_to_slots(frame: np.ndarray, paths: List[str], ext: str, params: List[int]) -> float:
+    """Encode ``frame`` once, write it to ``paths[0]`` and link the rest; return the seconds spent."""
+    start = time.perf_counter()
+    ok, buffer = cv2.imencode(ext, frame, params)
+    if not ok:
+        raise RuntimeError(f"Could not encode {paths[0]}")
+    with open(paths[0], "wb") as handle:
+        handle.write(buffer.tobytes())
+    for path in paths[1:]:
+        link_or_copy(paths[0], path)
+    return time.perf_counter() - start
+
+
+def extract_camera(
+    video_path: str,
+    frame_indices: List[Optional[int]],
+    slot_paths: List[str],
+    info: Optional[VideoInfo] = None,
+    backend: str = "opencv",
+    decode_threads: int = 0,
+    output_size: Optional[Tuple[int, int]] = None,
+    seek_threshold: int = DEFAULT_SEEK_THRESHOLD,
+    encode_threads: int = DEFAULT_ENCODE_THREADS,
+    image_format: str = "png",
+    png_compression: Optional[int] = None,
+    quality: Optional[int] = None,
+) -> dict:
+    """
+    Stream one camera video into its route slots.
+
+    ``frame_indices[i]`` is the video frame for route slot ``i`` (``None`` for a
+    black frame) and ``slot_paths[i]`` its output image. Frames are decoded
+    with the ``backend`` decoder (reusing the probed ``info``), scaled to
+    ``output_size`` when given, and
+    handed to a pool of ``encode_threads`` encoder threads (OpenCV releases the
+    GIL while encoding) with at most two frames per thread in flight, so memory
+    stays bounded regardless of route length. Each unique frame, including the
+    black frame, is encoded once and hard-linked into every further slot it fills.
+
+    Decoder and writer timings are reported separately: ``decode_seconds`` is
+    the time spent waiting on the decoder and ``encode_seconds`` the summed
+    encode-and-write time across encoder threads.
+    """
+    ext, params = encode_params(image_format, png_compression, quality)
+    slots_by_frame: Dict[int, List[int]] = {}
+    for slot, frame_idx in enumerate(frame_indices):
+        if frame_idx is not None:
+            slots_by_frame.setdefault(frame_idx, []).append(slot)
+
+    written = [False] * len(slot_paths)
+    decoded = 0
+    decode_seconds = 0.0
+    encode_seconds = 0.0
+    encoded = 0
+    max_pending = 2 * max(1, encode_threads)
+    start = time.perf_counter()
+    with open_decoder(backend, video_path, output_size, decode_threads, info) as decoder, ThreadPoolExecutor(
+        max_workers=max(1, encode_threads)
+    ) as pool:
+        pending = deque()
+        frames = decoder.iter_frames(frame_indices, seek_threshold)
+        while True:
+            decode_start = time.perf_counter()
+            item = next(frames, None)
+            decode_seconds += time.perf_counter() - decode_start
+            if item is None:
+                break
+
+            frame_idx, frame = item
+            decoded += 1
+            slots = slots_by_frame[frame_idx]
+            pending.append(pool.submit(encode_to_slots, frame, [slot_paths[slot] for slot in slots], ext, params))
+            for slot in slots:
+                written[slot] = True
+            while len(pending) >= max_pending:
+                encode_seconds += pending.popleft().result()
+                encoded += 1
+
+        blank_paths = [path for path, done in zip(slot_paths, written) if not done]
+        if blank_paths:
+            width, height = decoder.output_size
+            blank_frame = np.zeros((height, width, 3), dtype=np.uint8)
+            pending.append(pool.submit(encode_to_slots, blank_frame, blank_paths, ext, params))
+        while pending:
+            encode_seconds += pending.popleft().result()
+            encoded += 1
+
+    return {
+        "decoded": decoded,
+        "blank": len(blank_paths),
+        "encoded": encoded,
+        "slots": len(slot_paths),
+        "decode_seconds": decode_seconds,
+        "encode_seconds": encode_seconds,
+        "seconds": time.perf_counter() - start,
+    }
 
 
 def count_frames(directory: str) -> int:
@@ -164,28 +280,23 @@ def load_route_times(segments: List[dict], fallback_route_fps: Optional[float])
     """
     Load route-relative timestamps in seconds for every target frame.
 
-    Uses telemetry when available. If telemetry is missing for every segment,
-    falls back to a constant frame rate when requested.
+    Uses the cached route telemetry index when telemetry is available. If
+    telemetry is missing for any segment, falls back to a constant frame rate
+    when requested.
     """
     if all(segment["telemetry_dir"] for segment in segments):
         timestamps: List[float] = []
+        route_dir = os.path.dirname(os.path.abspath(segments[0]["dir"]))
+        telemetry_index = load_telemetry_index(route_dir)
 
         for segment in segments:
-            telemetry_dir = segment["telemetry_dir"]
-            for local_idx in range(segment["frame_count"]):
-                path = os.path.join(telemetry_dir, f"{local_idx:06d}.json")
-                if not os.path.exists(path):
-                    raise FileNotFoundError(
-                        f"Missing telemetry file for {segment['name']} frame {local_idx:06d}: {path}"
-                    )
-
-                with open(path, "r", encoding="utf-8") as handle:
-                    data = json.load(handle)
-
-                if "timestamp_seconds" not in data:
-                    raise KeyError(f"timestamp_seconds missing from {path}")
-
-                timestamps.append(float(data["timestamp_seconds"]))
+            segment_times = telemetry_index.segment_timestamps(segment["dir"])
+            if len(segment_times) < segment["frame_count"]:
+                raise FileNotFoundError(
+                    f"Missing telemetry for {segment['name']}: expected "
+                    f"{segment['frame_count']} frames, found {len(segment_times)}"
+                )
+            timestamps.extend(segment_times[: segment["frame_count"]].tolist())
 
         first_timestamp = timestamps[0]
         route_times = [value - first_timestamp for value in timestamps]
@@ -418,12 +529,75 @@ def main() -> None:
             "camera. Use 0 to disable. Default: 0.5"
         ),
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=len(CAMERAS),
+        help=f"Camera videos extracted in parallel processes (default: {len(CAMERAS)})",
+    )
+    parser.add_argument(
+        "--seek-threshold",
+        type=int,
+        default=DEFAULT_SEEK_THRESHOLD,
+        help=(
+            "Seek instead of decoding through gaps longer than this many frames. "
+            f"0 always decodes sequentially. Default: {DEFAULT_SEEK_THRESHOLD}"
+        ),
+    )
+    parser.add_argument(
+        "--decoder",
+        choices=sorted(DECODER_BACKENDS),
+        default="opencv",
+        help="Video decoder backend (default: opencv)",
+    )
+    parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=0,
+        help="Decoder threads per camera; 0 keeps the backend default (default: 0)",
+    )
+    parser.add_argument(
+        "--output-size",
+        type=str,
+        default=None,
+        help="Scale frames to WIDTHxHEIGHT while decoding (default: source size)",
+    )
+    parser.add_argument(
+        "--encode-threads",
+        type=int,
+        default=DEFAULT_ENCODE_THREADS,
+        help=f"Image encoder threads per camera (default: {DEFAULT_ENCODE_THREADS})",
+    )
+    parser.add_argument(
+        "--image-format",
+        choices=sorted(IMAGE_FORMATS),
+        default="png",
+        help="Output image format (default: png). The dataset loader reads PNG frames.",
+    )
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        default=None,
+        help="PNG zlib level 0-9; lower is faster and larger (default: OpenCV's default)",
+    )
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=None,
+        help="JPEG or WebP quality 1-100 (default: JPEG 95, lossless WebP)",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="Preview the sync mapping without writing files",
     )
     args = parser.parse_args()
+    try:
+        image_ext, _ = encode_params(args.image_format, args.png_compression, args.quality)
+        output_size = parse_size(args.output_size) if args.output_size else None
+    except ValueError as exc:
+        print(f"ERROR: {exc}")
+        sys.exit(1)
 
     route_dir = os.path.join(DATASETS_DIR, args.route)
     if not os.path.isdir(route_dir):
@@ -445,9 +619,10 @@ def main() -> None:
     print(f"Total route frames: {total_frames}")
     print(f"Sync mode: {args.sync_mode}")
     print(f"Video time offset: {args.video_time_offset:+.3f} s")
+    print(f"Decoder: {args.decoder}")
 
     video_paths: Dict[str, str] = {}
-    video_infos: Dict[str, Tuple[int, float, int, int]] = {}
+    video_infos: Dict[str, VideoInfo] = {}
 
     for prefix, _ in CAMERAS:
         path = find_video(prefix)
@@ -455,7 +630,11 @@ def main() -> None:
             print(f"ERROR: no video found for '{prefix}' in {VIDEOS_DIR}")
             sys.exit(1)
 
-        info = get_video_info(path)
+        try:
+            info = get_video_info(path, args.decoder)
+        except RuntimeError as exc:
+            print(f"ERROR: {exc}")
+            sys.exit(1)
         video_paths[prefix] = path
         video_infos[prefix] = info
 
@@ -560,30 +739,59 @@ def main() -> None:
         print("\n[DRY RUN] No files were written.")
         return
 
+    jobs = []
     for prefix, dir_name in CAMERAS:
-        video_path = video_paths[prefix]
-        _, _, width, height = video_infos[prefix]
-        mapped_indices = mapping_by_camera[prefix]
-
-        print(f"\nExtracting {prefix} -> {dir_name}/ ...")
-        extracted_frames = extract_frames(video_path, mapped_indices)
-        blank_frame = np.zeros((height, width, 3), dtype=np.uint8)
-        global_idx = 0
-
+        slot_paths: List[str] = []
         for segment in segments:
             out_dir = os.path.join(segment["dir"], dir_name)
             removed = clear_output_frames(out_dir)
             if removed:
                 print(f"  cleared {removed} old frames from {segment['name']}/{dir_name}")
+            slot_paths.extend(
+                os.path.join(out_dir, f"{local_idx:06d}{image_ext}")
+                for local_idx in range(segment["frame_count"])
+            )
+        jobs.append(
+            (prefix, dir_name, (video_paths[prefix], mapping_by_camera[prefix], slot_paths, video_infos[prefix]))
+        )
 
-            for local_idx in range(segment["frame_count"]):
-                video_frame_idx = mapped_indices[global_idx]
-                frame = extracted_frames.get(video_frame_idx) if video_frame_idx is not None else None
-                out_path = os.path.join(out_dir, f"{local_idx:06d}.png")
-                cv2.imwrite(out_path, blank_frame if frame is None else frame)
-                global_idx += 1
+    extract_options = {
+        "backend": args.decoder,
+        "decode_threads": args.decode_threads,
+        "output_size": output_size,
+        "seek_threshold": args.seek_threshold,
+        "encode_threads": args.encode_threads,
+        "image_format": args.image_format,
+        "png_compression": args.png_compression,
+        "quality": args.quality,
+    }
+    print(
+        f"\nExtracting {len(jobs)} cameras with {max(1, args.workers)} worker(s), "
+        f"{max(1, args.encode_threads)} encoder thread(s) each ..."
+    )
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as pool:
+            futures = [
+                pool.submit(extract_camera, *job_args, **extract_options) for _, _, job_args in jobs
+            ]
+            results = [future.result() for future in futures]
+    else:
+        results = [extract_camera(*job_args, **extract_options) for _, _, job_args in jobs]
 
-            print(f"  {segment['name']}/{dir_name}: {segment['frame_count']} frames saved")
+    for (prefix, dir_name, _), result in zip(jobs, results):
+        decode_fps = result["decoded"] / result["decode_seconds"] if result["decode_seconds"] else 0.0
+        encode_fps = result["encoded"] / result["encode_seconds"] if result["encode_seconds"] else 0.0
+        print(
+            f"  {prefix} -> {dir_name}: {result['slots']} frames saved "
+            f"({result['decoded']} decoded, {result['blank']} black) in {result['seconds']:.1f}s"
+        )
+        print(
+            f"    decoder {result['decode_seconds']:.1f}s ({decode_fps:.1f} frames/s), "
+            f"writer {result['encode_seconds']:.1f}s over {max(1, args.encode_threads)} thread(s) "
+            f"({encode_fps:.1f} images/s per thread)"
+        )
+    for segment in segments:
+        print(f"  {segment['name']}: {segment['frame_count']} frames per camera")
 
     print(f"\nDone. Route written to: {route_dir}")
 
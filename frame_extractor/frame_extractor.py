@@ -1,7 +1,10 @@
+import argparse
 import cv2 # run pip install opencv-python
 import os
 from pathlib import Path
 
+from video_decoders import DECODER_BACKENDS, open_decoder
+
 """
 Opens a video and extracts the frames as jpgs.
 This can be used to extract frames from dashcam videos.
@@ -13,7 +16,24 @@ video_format = "mp4" # mp4, mov, m4a, etc.
 
 fps_saved = 2 # UPDATE frames per second that will be extracted
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract frames from a dashcam video as jpgs.")
+    parser.add_argument(
+        "--decoder",
+        choices=sorted(DECODER_BACKENDS),
+        default="opencv",
+        help="Video decoder backend (default: opencv)",
+    )
+    parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=0,
+        help="Decoder threads; 0 keeps the backend default (default: 0)",
+    )
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
 
     BASE_DIR = Path(__file__).resolve().parent # directory of python file
 
@@ -21,34 +41,29 @@ def main():
     output_folder = BASE_DIR / f"extracted_frames/{video_title}"
 
     # Open video file
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print("Error: Could not open video.")
+    try:
+        decoder = open_decoder(args.decoder, str(video_path), threads=args.decode_threads)
+    except RuntimeError as exc:
+        print(f"Error: Could not open video. {exc}")
         return
     
     # Create output folder if it doesn't exist
     os.makedirs(output_folder, exist_ok=True)
 
-    fps_video = cap.get(cv2.CAP_PROP_FPS)
-    frame_interval = int(fps_video / fps_saved)
+    info = decoder.info
+    frame_interval = max(1, int(info.fps / fps_saved))
 
-    frame_count = 0
     saved_count = 0
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_count % frame_interval == 0:
+    # Read to the end of the stream: the container's frame count can be missing or low.
+    # Frames between saved ones are skipped without color conversion.
+    with decoder:
+        for _, frame in decoder.iter_every(frame_interval):
             # save frame
             filename = os.path.join(output_folder, f"{video_title}_frame_{saved_count:04d}.jpg")
             cv2.imwrite(filename, frame)
             saved_count += 1
 
-        frame_count += 1
-
-    cap.release()
     print(f"Extracted {saved_count} frames ({fps_saved} per second).")
     
 if __name__ == "__main__":
@@ -0,0 +1,472 @@
+"""
+Video decoder backends for the frame extraction tools.
+
+Every backend decodes the requested frame indices of one video in order and
+returns BGR ``uint8`` frames, optionally scaled to an output size by the
+decoder itself:
+
+  opencv  cv2.VideoCapture (always available)
+  pyav    PyAV (pip install av); seeks with a keyframe index built from the
+          container's packets
+  ffmpeg  raw BGR frames piped from an ffmpeg subprocess; needs ffmpeg and
+          ffprobe on PATH (or FFMPEG_BINARY / FFPROBE_BINARY)
+
+Example:
+  with open_decoder("pyav", "videos/cam0.mp4", output_size=(960, 540)) as decoder:
+      for frame_idx, frame in decoder.iter_frames([0, 10, 500]):
+          ...
+"""
+
+import bisect
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+from fractions import Fraction
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:  # optional backend
+    av = None
+
+
+# Gaps (in frames) larger than this are skipped with a seek instead of decoding through them.
+DEFAULT_SEEK_THRESHOLD = 120
+
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.environ.get("FFPROBE_BINARY", "ffprobe")
+
+
+class VideoInfo(NamedTuple):
+    """Video metadata; unpacks as ``total, fps, width, height``."""
+
+    total_frames: int
+    fps: float
+    width: int
+    height: int
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """Parse a ``WIDTHxHEIGHT`` string such as ``960x540``."""
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Expected WIDTHxHEIGHT, got {text!r}") from None
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Output size must be positive, got {text!r}")
+    return width, height
+
+
+class VideoDecoder:
+    """
+    Base class for decoder backends.
+
+    Subclasses open the video in ``__init__`` and implement ``_probe``,
+    ``_skip`` (advance one frame without converting it), ``_read`` (return the
+    next frame at the output size, or ``None`` at end of stream) and ``_seek``.
+    ``threads`` is the decoder thread count; 0 keeps the backend default.
+    Pass a known ``info`` to skip probing the file again.
+    """
+
+    name = ""
+
+    def __init__(
+        self,
+        path: str,
+        output_size: Optional[Tuple[int, int]] = None,
+        threads: int = 0,
+        info: Optional[VideoInfo] = None,
+    ):
+        self.path = path
+        self.threads = max(0, threads)
+        self._info = info
+        self._output_size = output_size
+
+    @property
+    def info(self) -> VideoInfo:
+        if self._info is None:
+            self._info = self._probe()
+        return self._info
+
+    @property
+    def output_size(self) -> Tuple[int, int]:
+        """Width and height of the returned frames."""
+        return self._output_size or (self.info.width, self.info.height)
+
+    def keyframes(self) -> Optional[List[int]]:
+        """Sorted keyframe indices, or ``None`` when the backend cannot list them."""
+        return None
+
+    def should_seek(self, current: int, target: int, seek_threshold: int) -> bool:
+        """Seek when the gap exceeds ``seek_threshold`` and, if known, a keyframe lies in between."""
+        if seek_threshold <= 0 or target - current <= seek_threshold:
+            return False
+        keyframes = self.keyframes()
+        if keyframes is None:
+            return True
+        position = bisect.bisect_right(keyframes, target) - 1
+        return position >= 0 and keyframes[position] > current
+
+    def iter_frames(
+        self,
+        frame_indices: Iterable[Optional[int]],
+        seek_threshold: int = DEFAULT_SEEK_THRESHOLD,
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Decode the unique requested frames in order, one at a time.
+
+        Frames between requested ones are skipped without color conversion or,
+        when the gap exceeds ``seek_threshold`` frames, with a seek. A
+        ``seek_threshold`` of 0 disables seeking. Stops early at end of stream.
+        """
+        requested = sorted({idx for idx in frame_indices if idx is not None})
+        current = 0
+        for target in requested:
+            if self.should_seek(current, target, seek_threshold):
+                current = self._seek(target)
+            while current < target:
+                if not self._skip():
+                    return
+                current += 1
+
+            frame = self._read()
+            if frame is None:
+                return
+            current += 1
+            yield target, frame
+
+    def iter_every(self, step: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Decode frames ``0, step, 2 * step, ...`` until the end of the stream.
+
+        Unlike ``iter_frames`` this does not depend on ``info.total_frames``,
+        which some containers report as 0 or too low. Frames in between are
+        skipped without color conversion.
+        """
+        step = max(1, step)
+        current = 0
+        while True:
+            frame = self._read()
+            if frame is None:
+                return
+            yield current, frame
+            for _ in range(step - 1):
+                if not self._skip():
+                    return
+            current += step
+
+    def _resize(self, frame: np.ndarray) -> np.ndarray:
+        if self._output_size is None or (frame.shape[1], frame.shape[0]) == self._output_size:
+            return frame
+        return cv2.resize(frame, self._output_size, interpolation=cv2.INTER_AREA)
+
+    def _probe(self) -> VideoInfo:
+        raise NotImplementedError
+
+    def _skip(self) -> bool:
+        raise NotImplementedError
+
+    def _read(self) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+    def _seek(self, target: int) -> int:
+        """Position the decoder at or before ``target``; return the index of the next frame."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "VideoDecoder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class OpenCVDecoder(VideoDecoder):
+    """``cv2.VideoCapture`` backend; seeks with ``CAP_PROP_POS_FRAMES``."""
+
+    name = "opencv"
+
+    def __init__(self, path, output_size=None, threads=0, info=None):
+        super().__init__(path, output_size, threads, info)
+        params = [cv2.CAP_PROP_N_THREADS, self.threads] if self.threads else []
+        self._cap = cv2.VideoCapture(path, cv2.CAP_ANY, params)
+        if not self._cap.isOpened():
+            raise RuntimeError(f"Cannot open video: {path}")
+
+    def _probe(self) -> VideoInfo:
+        return VideoInfo(
+            total_frames=int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            fps=float(self._cap.get(cv2.CAP_PROP_FPS) or 0.0),
+            width=int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+
+    def _skip(self) -> bool:
+        return self._cap.grab()
+
+    def _read(self) -> Optional[np.ndarray]:
+        ok, frame = self._cap.read()
+        return self._resize(frame) if ok else None
+
+    def _seek(self, target: int) -> int:
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        return target
+
+    def close(self) -> None:
+        self._cap.release()
+
+
+class PyAVDecoder(VideoDecoder):
+    """
+    PyAV backend with frame-threaded decoding and scaling in libswscale.
+
+    The keyframe index is built on the first long seek by demuxing the packets
+    of the video stream (no decoding); frame indices follow presentation order.
+    """
+
+    name = "pyav"
+
+    def __init__(self, path, output_size=None, threads=0, info=None):
+        super().__init__(path, output_size, threads, info)
+        if av is None:
+            raise RuntimeError("The pyav decoder needs PyAV: pip install av")
+        try:
+            self._container = av.open(path)
+        except av.error.FFmpegError as exc:
+            raise RuntimeError(f"Cannot open video: {path} ({exc})") from None
+        if not self._container.streams.video:
+            self._container.close()
+            raise RuntimeError(f"No video stream in {path}")
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"
+        if self.threads:
+            self._stream.codec_context.thread_count = self.threads
+        self._frames = self._container.decode(self._stream)
+        self._packet_pts: Optional[List[int]] = None
+        self._keyframes: Optional[List[int]] = None
+
+    def _probe(self) -> VideoInfo:
+        stream = self._stream
+        fps = float(stream.average_rate or stream.guessed_rate or 0.0)
+        total = stream.frames
+        if not total and stream.duration is not None and stream.time_base is not None:
+            total = int(round(float(stream.duration * stream.time_base) * fps))
+        return VideoInfo(
+            total_frames=int(total or 0),
+            fps=fps,
+            width=stream.codec_context.width,
+            height=stream.codec_context.height,
+        )
+
+    def _build_index(self) -> None:
+        pts: List[int] = []
+        keyframe_pts: List[int] = []
+        with av.open(self.path) as container:
+            for packet in container.demux(container.streams.video[0]):
+                if packet.pts is None:
+                    continue
+                pts.append(packet.pts)
+                if packet.is_keyframe:
+                    keyframe_pts.append(packet.pts)
+        pts.sort()
+        self._packet_pts = pts
+        self._keyframes = sorted(bisect.bisect_left(pts, value) for value in keyframe_pts)
+
+    def keyframes(self) -> Optional[List[int]]:
+        if self._keyframes is None:
+            self._build_index()
+        return self._keyframes
+
+    def _next(self):
+        return next(self._frames, None)
+
+    def _skip(self) -> bool:
+        return self._next() is not None
+
+    def _read(self) -> Optional[np.ndarray]:
+        frame = self._next()
+        if frame is None:
+            return None
+        width, height = self._output_size or (frame.width, frame.height)
+        return frame.reformat(width=width, height=height, format="bgr24", interpolation="AREA").to_ndarray()
+
+    def _seek(self, target: int) -> int:
+        keyframes = self.keyframes()
+        keyframe = keyframes[bisect.bisect_right(keyframes, target) - 1]
+        keyframe_pts = self._packet_pts[keyframe]
+        self._container.seek(keyframe_pts, stream=self._stream, backward=True, any_frame=False)
+        frames = self._container.decode(self._stream)
+        # Drop leading frames of an open GOP that precede the keyframe.
+        for frame in frames:
+            if frame.pts is None or frame.pts >= keyframe_pts:
+                self._frames = _prepend(frame, frames)
+                return keyframe
+        self._frames = iter(())
+        return keyframe
+
+    def close(self) -> None:
+        self._container.close()
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+@functools.lru_cache(maxsize=None)
+def _passthrough_args() -> Tuple[str, ...]:
+    """Keep every decoded frame; ``-fps_mode`` needs ffmpeg 5.1, older releases only know ``-vsync``."""
+    try:
+        banner = subprocess.run([FFMPEG_BINARY, "-version"], capture_output=True, text=True).stdout
+    except OSError:
+        banner = ""
+    # Release builds print "ffmpeg version 7.0.2" (or "n5.0"); git builds have no number and are new
+    match = re.match(r"ffmpeg version n?(\d+)\.(\d+)", banner)
+    if match and (int(match.group(1)), int(match.group(2))) < (5, 1):
+        return ("-vsync", "passthrough")
+    return ("-fps_mode", "passthrough")
+
+
+class FFmpegPipeDecoder(VideoDecoder):
+    """
+    ffmpeg subprocess backend reading raw ``bgr24`` frames from a pipe.
+
+    Scaling runs in ffmpeg's ``scale`` filter. Seeks restart ffmpeg with an
+    input ``-ss``, which jumps to the preceding keyframe through the
+    container's index and decodes forward to the exact frame (constant frame
+    rate assumed, as with ``CAP_PROP_POS_FRAMES``).
+    """
+
+    name = "ffmpeg"
+
+    def __init__(self, path, output_size=None, threads=0, info=None):
+        super().__init__(path, output_size, threads, info)
+        if shutil.which(FFMPEG_BINARY) is None:
+            raise RuntimeError(f"The ffmpeg decoder needs {FFMPEG_BINARY!r} on PATH (or set FFMPEG_BINARY)")
+        if not os.path.isfile(path):
+            raise RuntimeError(f"Cannot open video: {path}")
+        self._process: Optional[subprocess.Popen] = None
+        self._buffer: Optional[bytearray] = None
+
+    def _probe(self) -> VideoInfo:
+        if shutil.which(FFPROBE_BINARY) is None:
+            raise RuntimeError(f"Probing needs {FFPROBE_BINARY!r} on PATH (or set FFPROBE_BINARY)")
+        result = subprocess.run(
+            [
+                FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+                "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration",
+                "-of", "json", self.path,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        streams = json.loads(result.stdout or "{}").get("streams") if result.returncode == 0 else None
+        if not streams:
+            raise RuntimeError(f"Cannot open video: {self.path} ({result.stderr.strip()})")
+        stream = streams[0]
+        rate = stream.get("avg_frame_rate") or "0/1"
+        if rate in ("0/0", "0/1"):
+            rate = stream.get("r_frame_rate") or "0/1"
+        fps = float(Fraction(rate)) if rate != "0/0" else 0.0
+        total = int(stream.get("nb_frames") or 0)
+        if not total and stream.get("duration"):
+            total = int(round(float(stream["duration"]) * fps))
+        return VideoInfo(total_frames=total, fps=fps, width=int(stream["width"]), height=int(stream["height"]))
+
+    def _start(self, position: int) -> None:
+        self.close()
+        command = [FFMPEG_BINARY, "-nostdin", "-v", "error"]
+        if self.threads:
+            command += ["-threads", str(self.threads)]
+        if position > 0:
+            # Half a frame early so rounding cannot drop the target frame.
+            command += ["-ss", f"{(position - 0.5) / self.info.fps:.6f}"]
+        command += ["-i", self.path, "-an", "-sn", "-map", "0:v:0"]
+        if self._output_size is not None:
+            command += ["-vf", "scale={}:{}:flags=area".format(*self._output_size)]
+        command += [*_passthrough_args(), "-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _read_into(self, buffer: bytearray) -> bool:
+        if self._process is None:
+            self._start(0)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < len(buffer):
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                break
+            filled += count
+        if filled == len(buffer):
+            return True
+        if self._process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed on {self.path}: {self._process.stderr.read().decode().strip()}")
+        return False
+
+    def _frame_bytes(self) -> int:
+        width, height = self.output_size
+        return width * height * 3
+
+    def _skip(self) -> bool:
+        if self._buffer is None:
+            self._buffer = bytearray(self._frame_bytes())
+        return self._read_into(self._buffer)
+
+    def _read(self) -> Optional[np.ndarray]:
+        width, height = self.output_size
+        buffer = bytearray(self._frame_bytes())
+        if not self._read_into(buffer):
+            return None
+        return np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+
+    def _seek(self, target: int) -> int:
+        self._start(target)
+        return target
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        self._process.stdout.close()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process.stderr.close()
+        self._process = None
+
+
+DECODER_BACKENDS: Dict[str, type] = {
+    OpenCVDecoder.name: OpenCVDecoder,
+    PyAVDecoder.name: PyAVDecoder,
+    FFmpegPipeDecoder.name: FFmpegPipeDecoder,
+}
+
+
+def available_backends() -> List[str]:
+    """Names of the backends whose dependencies are installed."""
+    names = [OpenCVDecoder.name]
+    if av is not None:
+        names.append(PyAVDecoder.name)
+    if shutil.which(FFMPEG_BINARY) is not None:
+        names.append(FFmpegPipeDecoder.name)
+    return names
+
+
+def open_decoder(
+    backend: str,
+    path: str,
+    output_size: Optional[Tuple[int, int]] = None,
+    threads: int = 0,
+    info: Optional[VideoInfo] = None,
+) -> VideoDecoder:
+    """Open ``path`` with the named backend (see ``DECODER_BACKENDS``)."""
+    if backend not in DECODER_BACKENDS:
+        raise ValueError(f"Unknown decoder backend {backend!r}; expected one of {sorted(DECODER_BACKENDS)}")
+    return DECODER_BACKENDS[backend](path, output_size=output_size, threads=threads, info=info)
@@ -18,10 +18,15 @@ Default target labels:
 import argparse
 import importlib
 import json
+import multiprocessing
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
+import time
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -34,8 +39,8 @@ def ensure_dependency(import_name, pip_name):
         return importlib.import_module(import_name)
 
 
-Image = ensure_dependency("PIL.Image", "pillow")
 YOLO = ensure_dependency("ultralytics", "ultralytics").YOLO
+cv2 = ensure_dependency("cv2", "opencv-python")
 
 
 TARGET_LABELS = ["pedestrian", "vehicle", "traffic_light", "stop_sign"]
@@ -58,6 +63,9 @@ CLASS_MAP = {
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
 CAMERA_DIRS = ("raw", "raw_front", "raw_left", "raw_right")
 
+STATE_FILENAME = "annotation_state.json"
+STATE_VERSION = 1
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -92,6 +100,32 @@ def parse_args():
         action="store_true",
         help="Do not create empty YOLO txt files for images with no detections.",
     )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Images per model.predict call. Default: 8",
+    )
+    parser.add_argument(
+        "--decode-threads",
+        type=int,
+        default=4,
+        help="Threads decoding the next batch of images while the current one runs. Default: 4",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only detect images that are new or changed (size/mtime) since the last run with the "
+            "same model, confidence and IoU, and merge them into the existing outputs."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes annotating segment cameras in parallel, each with its own model. Default: 1",
+    )
     return parser.parse_args()
 
 
@@ -170,30 +204,33 @@ def clamp(value, min_value, max_value):
     return max(min_value, min(value, max_value))
 
 
-def detect_image(model, image_path, confidence, iou, device):
-    kwargs = {
-        "source": str(image_path),
-        "conf": confidence,
-        "iou": iou,
-        "verbose": False,
-    }
-    if device is not None:
-        kwargs["device"] = device
+def load_image(image_path):
+    """Decode an image to a BGR array, the layout ultralytics uses for file sources."""
+    image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode image: {image_path}")
+    return image
 
-    results = model.predict(**kwargs)
-    if not results:
-        return []
 
-    result = results[0]
+def iter_decoded_batches(images, batch_size, pool):
+    """Yield ``(paths, arrays)`` batches, decoding the next batch on ``pool`` meanwhile."""
+    batches = [images[i : i + batch_size] for i in range(0, len(images), batch_size)]
+    pending = pool.map(load_image, batches[0]) if batches else None
+    for index, batch in enumerate(batches):
+        arrays = list(pending)
+        if index + 1 < len(batches):
+            pending = pool.map(load_image, batches[index + 1])
+        yield batch, arrays
+
+
+def result_detections(result, width, height):
+    """Convert one ultralytics result to target-label detections clamped to the image."""
     if result.boxes is None:
         return []
 
     detections = []
     names = result.names
 
-    with Image.open(image_path) as img:
-        width, height = img.size
-
     for box in result.boxes:
         raw_class_id = int(box.cls.item())
         raw_label = names.get(raw_class_id, str(raw_class_id))
@@ -224,6 +261,26 @@ def detect_image(model, image_path, confidence, iou, device):
     return detections
 
 
+def detect_images(model, images, confidence, iou, device):
+    """Run one ``model.predict`` call on decoded BGR arrays; returns detections per image."""
+    kwargs = {
+        "source": list(images),
+        "conf": confidence,
+        "iou": iou,
+        "verbose": False,
+    }
+    if device is not None:
+        kwargs["device"] = device
+
+    results = list(model.predict(**kwargs))
+    if len(results) != len(images):
+        raise RuntimeError(f"model.predict returned {len(results)} results for {len(images)} images")
+    return [
+        result_detections(result, image.shape[1], image.shape[0])
+        for result, image in zip(results, images)
+    ]
+
+
 def write_yolo_label(label_path, detections):
     lines = []
     for det in detections:
@@ -247,89 +304,116 @@ def write_yolo_label(label_path, detections):
     label_path.write_text("\n".join(lines) + ("\n" if lines else ""), encoding="utf-8")
 
 
-def build_coco(images, detections_by_image):
-    coco = {
-        "images": [],
-        "annotations": [],
-        "categories": [
-            {"id": idx, "name": name, "supercategory": "object"}
-            for idx, name in enumerate(TARGET_LABELS)
-        ],
-    }
+def _indented_json(value, prefix):
+    return "\n".join(prefix + line for line in json.dumps(value, indent=2).splitlines())
 
-    ann_id = 1
-    for image_id, image_path in enumerate(images, start=1):
-        detections = detections_by_image[image_path]
-        if detections:
-            width = detections[0]["width"]
-            height = detections[0]["height"]
-        else:
-            with Image.open(image_path) as img:
-                width, height = img.size
-
-        coco["images"].append(
-            {
-                "id": image_id,
-                "file_name": image_path.name,
-                "width": width,
-                "height": height,
-            }
-        )
+
+class CocoStreamWriter:
+    """Write ``annotations_coco.json`` one image at a time.
+
+    Images go straight to the output file and annotations to a spool file that is
+    appended when the writer closes, so memory does not grow with the number of
+    frames. The result is byte-identical to ``json.dumps(coco, indent=2)``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        self._out = open(self.tmp_path, "w", encoding="utf-8")
+        self._annotations = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self._image_count = 0
+        self._annotation_count = 0
+        self._out.write('{\n  "images": [')
+
+    def add_image(self, image_path, width, height, detections):
+        self._image_count += 1
+        image = {
+            "id": self._image_count,
+            "file_name": image_path.name,
+            "width": width,
+            "height": height,
+        }
+        self._out.write(("\n" if self._image_count == 1 else ",\n") + _indented_json(image, "    "))
 
         for det in detections:
             x1, y1, x2, y2 = det["bbox_xyxy"]
             box_w = x2 - x1
             box_h = y2 - y1
-            coco["annotations"].append(
-                {
-                    "id": ann_id,
-                    "image_id": image_id,
-                    "category_id": det["class_id"],
-                    "bbox": [x1, y1, box_w, box_h],
-                    "area": box_w * box_h,
-                    "iscrowd": 0,
-                    "score": det["confidence"],
-                }
-            )
-            ann_id += 1
-
-    return coco
-
-
-def build_cvat_xml(images, detections_by_image):
-    root = ET.Element("annotations")
-    ET.SubElement(root, "version").text = "1.1"
-
-    meta = ET.SubElement(root, "meta")
-    task = ET.SubElement(meta, "task")
-    ET.SubElement(task, "name").text = "annotations"
-    labels_node = ET.SubElement(task, "labels")
-    for label_name in TARGET_LABELS:
-        label_node = ET.SubElement(labels_node, "label")
-        ET.SubElement(label_node, "name").text = label_name
-        ET.SubElement(label_node, "color").text = "#000000"
-        ET.SubElement(label_node, "type").text = "rectangle"
-        ET.SubElement(label_node, "attributes")
-
-    for image_id, image_path in enumerate(images):
-        detections = detections_by_image[image_path]
-        if detections:
-            width = detections[0]["width"]
-            height = detections[0]["height"]
-        else:
-            with Image.open(image_path) as img:
-                width, height = img.size
-
-        image_node = ET.SubElement(
-            root,
+            self._annotation_count += 1
+            annotation = {
+                "id": self._annotation_count,
+                "image_id": self._image_count,
+                "category_id": det["class_id"],
+                "bbox": [x1, y1, box_w, box_h],
+                "area": box_w * box_h,
+                "iscrowd": 0,
+                "score": det["confidence"],
+            }
+            separator = "\n" if self._annotation_count == 1 else ",\n"
+            self._annotations.write(separator + _indented_json(annotation, "    "))
+
+    def close(self):
+        categories = [
+            {"id": idx, "name": name, "supercategory": "object"}
+            for idx, name in enumerate(TARGET_LABELS)
+        ]
+        self._out.write("\n  ]," if self._image_count else "],")
+        self._out.write('\n  "annotations": [')
+        self._annotations.seek(0)
+        shutil.copyfileobj(self._annotations, self._out)
+        self._annotations.close()
+        self._out.write("\n  ]," if self._annotation_count else "],")
+        self._out.write('\n  "categories": [\n')
+        self._out.write(",\n".join(_indented_json(category, "    ") for category in categories))
+        self._out.write("\n  ]\n}")
+        self._out.close()
+        os.replace(self.tmp_path, self.path)
+
+
+class CvatStreamWriter:
+    """Write ``annotations_cvat.xml`` one ``<image>`` element at a time.
+
+    The output matches ``ET.indent(root, space="  ")`` followed by
+    ``ElementTree.write(encoding="utf-8", xml_declaration=True)`` on the full tree.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        self._out = open(self.tmp_path, "w", encoding="utf-8")
+        self._image_count = 0
+        self._out.write("<?xml version='1.0' encoding='utf-8'?>\n<annotations>")
+
+        version = ET.Element("version")
+        version.text = "1.1"
+        meta = ET.Element("meta")
+        task = ET.SubElement(meta, "task")
+        ET.SubElement(task, "name").text = "annotations"
+        labels_node = ET.SubElement(task, "labels")
+        for label_name in TARGET_LABELS:
+            label_node = ET.SubElement(labels_node, "label")
+            ET.SubElement(label_node, "name").text = label_name
+            ET.SubElement(label_node, "color").text = "#000000"
+            ET.SubElement(label_node, "type").text = "rectangle"
+            ET.SubElement(label_node, "attributes")
+        self._write_child(version)
+        self._write_child(meta)
+
+    def _write_child(self, element):
+        ET.indent(element, space="  ", level=1)
+        self._out.write("\n  " + ET.tostring(element, encoding="unicode"))
+
+    def add_image(self, image_path, width, height, detections):
+        image_node = ET.Element(
             "image",
             {
-                "id": str(image_id),
+                "id": str(self._image_count),
                 "name": image_path.name,
                 "width": str(width),
                 "height": str(height),
             },
         )
+        self._image_count += 1
 
         for det in detections:
             x1, y1, x2, y2 = det["bbox_xyxy"]
@@ -347,9 +431,34 @@ def build_cvat_xml(images, detections_by_image):
                     "z_order": "0",
                 },
             )
+        self._write_child(image_node)
+
+    def close(self):
+        self._out.write("\n</annotations>")
+        self._out.close()
+        os.replace(self.tmp_path, self.path)
+
 
-    ET.indent(root, space="  ")
-    return ET.ElementTree(root)
+class AnnotationStateWriter:
+    """Write a camera's ``annotation_state.json`` one frame entry at a time."""
+
+    def __init__(self, output_dir, params):
+        self.path = output_dir / STATE_FILENAME
+        self.tmp_path = self.path.with_name(f"{STATE_FILENAME}.{os.getpid()}.tmp")
+        self._out = open(self.tmp_path, "w", encoding="utf-8")
+        self._count = 0
+        header = json.dumps({"version": STATE_VERSION, "params": params}, separators=(",", ":"))
+        self._out.write(header[:-1] + ',"frames":{')
+
+    def add_frame(self, name, entry):
+        self._out.write(("," if self._count else "") + json.dumps(name) + ":")
+        self._out.write(json.dumps(entry, separators=(",", ":")))
+        self._count += 1
+
+    def close(self):
+        self._out.write("}}")
+        self._out.close()
+        os.replace(self.tmp_path, self.path)
 
 
 def write_labels_file(output_dir):
@@ -357,38 +466,136 @@ def write_labels_file(output_dir):
     labels_path.write_text("\n".join(TARGET_LABELS) + "\n", encoding="utf-8")
 
 
-def annotate_image_set(args, model, camera_name, image_dir, images, output_dir, labels_dir):
-    detections_by_image = {}
-    total_boxes = 0
+def state_params(args):
+    """Settings that change detections; a state file written with other settings is ignored."""
+    return {
+        "model": args.model,
+        "confidence": args.confidence,
+        "iou": args.iou,
+        "no_empty_labels": bool(args.no_empty_labels),
+    }
 
-    print(f"\n[*] Camera: {camera_name}")
-    print(f"[*] Found {len(images)} images in {image_dir}")
-    print(f"[*] Writing annotations to {output_dir}")
 
-    for index, image_path in enumerate(images, start=1):
-        detections = detect_image(
+def image_signature(image_path):
+    stat = image_path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_annotation_state(output_dir, params):
+    """Return ``{image name: entry}`` from a camera's state file, or {} if unusable."""
+    state_path = output_dir / STATE_FILENAME
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if state.get("version") != STATE_VERSION or state.get("params") != params:
+        return {}
+    return state.get("frames", {})
+
+
+def camera_result(summary, labels_dir, coco_path, cvat_xml_path):
+    return {
+        "camera": summary["camera"],
+        "images": summary["images"],
+        "boxes": summary["boxes"],
+        "images_per_sec": summary.get("images_per_sec"),
+        "labels_dir": str(labels_dir),
+        "coco_path": str(coco_path),
+        "cvat_xml_path": str(cvat_xml_path),
+    }
+
+
+def iter_detections(args, model, image_paths, pool):
+    """Yield ``(image_path, (width, height), detections)`` in order, detecting in batches."""
+    batch_size = max(1, args.batch_size)
+    for batch_paths, batch_images in iter_decoded_batches(image_paths, batch_size, pool):
+        batch_detections = detect_images(
             model=model,
-            image_path=image_path,
+            images=batch_images,
             confidence=args.confidence,
             iou=args.iou,
             device=args.device,
         )
-        detections_by_image[image_path] = detections
-        total_boxes += len(detections)
+        for image_path, image, detections in zip(batch_paths, batch_images, batch_detections):
+            yield image_path, (image.shape[1], image.shape[0]), detections
 
-        label_path = labels_dir / f"{image_path.stem}.txt"
-        if detections or not args.no_empty_labels:
-            write_yolo_label(label_path, detections)
 
-        print(f"[{index:04d}/{len(images):04d}] {image_path.name}: {len(detections)} boxes")
+def annotate_image_set(args, model, camera_name, image_dir, images, output_dir, labels_dir):
+    print(f"\n[*] Camera: {camera_name}")
+    print(f"[*] Found {len(images)} images in {image_dir}")
+    print(f"[*] Writing annotations to {output_dir}")
 
-    coco = build_coco(images, detections_by_image)
     coco_path = output_dir / "annotations_coco.json"
-    coco_path.write_text(json.dumps(coco, indent=2), encoding="utf-8")
-
     cvat_xml_path = output_dir / "annotations_cvat.xml"
-    cvat_tree = build_cvat_xml(images, detections_by_image)
-    cvat_tree.write(cvat_xml_path, encoding="utf-8", xml_declaration=True)
+    summary_path = output_dir / "summary.json"
+
+    # Reuse detections of frames whose file is unchanged since the last run.
+    params = state_params(args)
+    previous = load_annotation_state(output_dir, params) if args.incremental else {}
+    signatures = {}
+    to_detect = []
+    for image_path in images:
+        signatures[image_path] = image_signature(image_path)
+        entry = previous.get(image_path.name)
+        if entry is None or entry["signature"] != signatures[image_path]:
+            to_detect.append(image_path)
+    removed = set(previous) - {image_path.name for image_path in images}
+
+    if args.incremental:
+        print(
+            f"[*] Incremental: {len(images) - len(to_detect)} unchanged, "
+            f"{len(to_detect)} to detect, {len(removed)} removed"
+        )
+        for name in removed:
+            (labels_dir / f"{Path(name).stem}.txt").unlink(missing_ok=True)
+        # Nothing changed: report from the state file, since a single image folder
+        # shares summary.json with the target summary
+        if not to_detect and not removed and coco_path.exists() and cvat_xml_path.exists():
+            summary = {
+                "camera": camera_name,
+                "images": len(images),
+                "boxes": sum(len(previous[image_path.name]["detections"]) for image_path in images),
+            }
+            return camera_result(summary, labels_dir, coco_path, cvat_xml_path)
+
+    # Frames are written to every output as soon as their detections are known, so
+    # memory stays bounded by the detection batch rather than the camera folder.
+    writers = (CocoStreamWriter(coco_path), CvatStreamWriter(cvat_xml_path))
+    state_writer = AnnotationStateWriter(output_dir, params)
+    total_boxes = 0
+    index = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.decode_threads)) as pool:
+        detected = iter_detections(args, model, to_detect, pool)
+        next_detected = to_detect[0] if to_detect else None
+        for image_path in images:
+            if image_path == next_detected:
+                _, size, detections = next(detected)
+                index += 1
+                next_detected = to_detect[index] if index < len(to_detect) else None
+
+                label_path = labels_dir / f"{image_path.stem}.txt"
+                if detections or not args.no_empty_labels:
+                    write_yolo_label(label_path, detections)
+                else:
+                    # The frame may have had boxes in an earlier incremental run
+                    label_path.unlink(missing_ok=True)
+
+                print(f"[{index:04d}/{len(to_detect):04d}] {image_path.name}: {len(detections)} boxes")
+            else:
+                entry = previous[image_path.name]
+                size, detections = tuple(entry["size"]), entry["detections"]
+
+            total_boxes += len(detections)
+            for writer in writers:
+                writer.add_image(image_path, size[0], size[1], detections)
+            state_writer.add_frame(
+                image_path.name,
+                {"signature": signatures[image_path], "size": list(size), "detections": detections},
+            )
+    elapsed = time.perf_counter() - start_time
+    for writer in (*writers, state_writer):
+        writer.close()
 
     summary = {
         "camera": camera_name,
@@ -399,23 +606,20 @@ def annotate_image_set(args, model, camera_name, image_dir, images, output_dir,
         "images": len(images),
         "boxes": total_boxes,
         "labels": TARGET_LABELS,
+        "batch_size": max(1, args.batch_size),
+        "detected_images": len(to_detect),
+        "detect_seconds": round(elapsed, 3),
+        "images_per_sec": round(len(to_detect) / elapsed, 2) if to_detect and elapsed > 0 else None,
     }
-    summary_path = output_dir / "summary.json"
     summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
 
-    return {
-        "camera": camera_name,
-        "images": len(images),
-        "boxes": total_boxes,
-        "labels_dir": str(labels_dir),
-        "coco_path": str(coco_path),
-        "cvat_xml_path": str(cvat_xml_path),
-    }
+    return camera_result(summary, labels_dir, coco_path, cvat_xml_path)
 
 
-def annotate_target(args, model, target):
+def plan_target(target):
+    """Create the output folders for a target and return its per-camera annotation jobs."""
     base_dir, image_sets, multi_camera = discover_image_sets(target)
-    all_summaries = []
+    jobs = []
     root_output_dir = None
 
     for camera_name, image_dir, images in image_sets:
@@ -427,19 +631,75 @@ def annotate_target(args, model, target):
         write_labels_file(output_dir)
         if multi_camera:
             write_labels_file(root_output_dir)
-        all_summaries.append(
-            annotate_image_set(args, model, camera_name, image_dir, images, output_dir, labels_dir)
-        )
+        jobs.append((camera_name, image_dir, images, output_dir, labels_dir))
 
+    return base_dir, multi_camera, root_output_dir, jobs
+
+
+def write_target_summary(base_dir, multi_camera, root_output_dir, all_summaries):
     if root_output_dir is not None:
         (root_output_dir / "summary.json").write_text(
             json.dumps({"input_dir": str(base_dir), "multi_camera": multi_camera, "cameras": all_summaries}, indent=2),
             encoding="utf-8",
         )
 
+
+def annotate_target(args, model, target):
+    base_dir, multi_camera, root_output_dir, jobs = plan_target(target)
+    all_summaries = [annotate_image_set(args, model, *job) for job in jobs]
+    write_target_summary(base_dir, multi_camera, root_output_dir, all_summaries)
     return root_output_dir, all_summaries
 
 
+_WORKER_MODEL = None
+
+
+def _init_worker(model_name, torch_threads):
+    global _WORKER_MODEL
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    _WORKER_MODEL = YOLO(model_name)
+
+
+def _annotate_job(args, job):
+    return annotate_image_set(args, _WORKER_MODEL, *job)
+
+
+def annotate_targets_parallel(args, targets):
+    """Annotate every (segment, camera) job of ``targets`` in a process pool.
+
+    Each worker loads its own model and gets an equal share of the CPU threads.
+    Per-camera results are merged into each target's summary.json in the same
+    order as a serial run.
+    """
+    plans = [plan_target(target) for target in targets]
+    jobs = [job for _, _, _, target_jobs in plans for job in target_jobs]
+    workers = max(1, min(args.workers, len(jobs)))
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"[*] Annotating {len(jobs)} camera folder(s) with {workers} worker(s), model: {args.model}")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.model, torch_threads),
+    ) as pool:
+        # Largest camera folders first so one long job does not finish last.
+        order = sorted(range(len(jobs)), key=lambda idx: -len(jobs[idx][2]))
+        futures = {idx: pool.submit(_annotate_job, args, jobs[idx]) for idx in order}
+        results = [futures[idx].result() for idx in range(len(jobs))]
+
+    outputs = []
+    offset = 0
+    for base_dir, multi_camera, root_output_dir, target_jobs in plans:
+        target_summaries = results[offset : offset + len(target_jobs)]
+        offset += len(target_jobs)
+        write_target_summary(base_dir, multi_camera, root_output_dir, target_summaries)
+        outputs.append((root_output_dir, target_summaries))
+    return outputs
+
+
 def discover_annotation_targets(target):
     input_dir = Path(target).expanduser().resolve()
     if not input_dir.is_dir():
@@ -467,14 +727,19 @@ def main():
     args = parse_args()
     targets = discover_annotation_targets(args.segment)
 
-    print(f"[*] Loading model: {args.model}")
-    model = YOLO(args.model)
+    if args.workers > 1:
+        target_outputs = annotate_targets_parallel(args, targets)
+    else:
+        print(f"[*] Loading model: {args.model}")
+        model = YOLO(args.model)
+        target_outputs = []
+        for target in targets:
+            print(f"\n[*] Annotating target: {target}")
+            target_outputs.append(annotate_target(args, model, target))
 
     all_summaries = []
     output_dirs = []
-    for target in targets:
-        print(f"\n[*] Annotating target: {target}")
-        root_output_dir, target_summaries = annotate_target(args, model, target)
+    for root_output_dir, target_summaries in target_outputs:
         if root_output_dir is not None:
             output_dirs.append(root_output_dir)
         all_summaries.extend(target_summaries)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark DatasetManager imports: per-row commits vs. bulk_session vs. executemany.
+
+Each mode imports the same synthetic frames (plus one annotation and two label
+rows per frame) into a fresh database file.
+
+Examples:
+  python3 pipeline/bench_bulk_import.py
+  python3 pipeline/bench_bulk_import.py --frames 50000 --db-dir /data/tmp
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from dataset_manager import DatasetManager
+
+
+def synthetic_frames(count):
+    return [
+        {
+            "filename": f"bench/frame_{i:06d}.png",
+            "relative_path": f"../datasets/bench/raw/{i:06d}.png",
+            "width": 1928,
+            "height": 1208,
+            "source": "bench",
+            "frame_number": i,
+        }
+        for i in range(count)
+    ]
+
+
+def import_per_row(db, frames):
+    for i, frame in enumerate(frames):
+        frame_id = db.add_frame(**frame)
+        ann_id = db.add_annotation(frame_id, "", 0.0, 0.0, 0.0, annotation_source="local_yolo")
+        db.add_label_category(ann_id, "vehicle", present=True)
+        db.add_label_category(ann_id, "pedestrian", present=i % 7 == 0)
+
+
+def import_session(db, frames):
+    with db.bulk_session():
+        import_per_row(db, frames)
+
+
+def import_bulk(db, frames):
+    with db.bulk_session():
+        frame_ids = db.add_frames_bulk(frames)
+        ann_ids = db.add_annotations_bulk(
+            {
+                "frame_id": frame_id,
+                "scene_description": "",
+                "steering_angle_deg": 0.0,
+                "throttle": 0.0,
+                "brake": 0.0,
+                "annotation_source": "local_yolo",
+            }
+            for frame_id in frame_ids
+        )
+        db.add_label_categories_bulk(
+            label
+            for i, ann_id in enumerate(ann_ids)
+            for label in (
+                {"annotation_id": ann_id, "category": "vehicle", "present": True},
+                {"annotation_id": ann_id, "category": "pedestrian", "present": i % 7 == 0},
+            )
+        )
+
+
+MODES = {
+    "per-row commit": import_per_row,
+    "bulk_session": import_session,
+    "executemany bulk": import_bulk,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=50_000, help="Synthetic frames to import")
+    parser.add_argument("--db-dir", default=None, help="Directory for the benchmark databases")
+    parser.add_argument(
+        "--skip-per-row",
+        action="store_true",
+        help="Skip the per-row commit baseline (slow on disks with expensive fsync)",
+    )
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames)
+    print(f"Importing {args.frames} frames, {args.frames} annotations, {2 * args.frames} labels")
+
+    baseline = None
+    with tempfile.TemporaryDirectory(dir=args.db_dir) as tmp_dir:
+        for name, import_fn in MODES.items():
+            if args.skip_per_row and import_fn is import_per_row:
+                continue
+            db_path = os.path.join(tmp_dir, f"{name.replace(' ', '_')}.db")
+            with DatasetManager(db_path) as db:
+                start = time.perf_counter()
+                import_fn(db, frames)
+                elapsed = time.perf_counter() - start
+                stats = db.get_stats()
+            assert stats["total_frames"] == args.frames
+            assert stats["total_annotations"] == args.frames
+
+            baseline = baseline or elapsed
+            print(
+                f"  {name:<17}: {elapsed:8.2f} s  {args.frames / elapsed:10.0f} frames/s  "
+                f"({baseline / elapsed:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@ Create an Alpamayo inference video from saved route dataset artifacts.
 
 The renderer reads only:
   - segment raw frames
-  - segment predictions/*_prediction.json
-  - prediction JSON ground-truth and selected prediction paths
+  - segment predictions/ (columnar prediction store, or legacy *_prediction.json)
+  - ground-truth and selected prediction paths from those predictions
   - optional segment annotations
 """
 
@@ -13,12 +13,18 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
+import sys
 import textwrap
 from pathlib import Path
 
 import cv2
 import numpy as np
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "alpamayo", "src")))
+
+from alpamayo1_5.prediction_store import load_prediction_store
+
 
 PIPELINE_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = PIPELINE_DIR.parent
@@ -132,6 +138,10 @@ def frame_index_from_prediction(path: Path, payload: dict) -> int | None:
 
 def load_predictions(segment_dir: Path) -> dict[int, dict]:
     predictions_dir = segment_dir / "predictions"
+    store = load_prediction_store(str(predictions_dir))
+    if store is not None and len(store):
+        return dict(store.payloads())
+
     predictions: dict[int, dict] = {}
     for json_path in sorted(predictions_dir.glob("*_prediction.json")):
         with json_path.open(encoding="utf-8") as handle:
@@ -343,7 +353,7 @@ def render_video(route_dir: Path, segments: list[Path], args: argparse.Namespace
     for segment_dir in segments:
         predictions = load_predictions(segment_dir)
         if not predictions:
-            print(f"[SKIP] {segment_dir.name}: no prediction JSON files")
+            print(f"[SKIP] {segment_dir.name}: no predictions")
             continue
 
         frame_indices = sorted(predictions)
@@ -395,7 +405,7 @@ def render_video(route_dir: Path, segments: list[Path], args: argparse.Namespace
         writer.release()
 
     if written == 0:
-        raise SystemExit("[ERROR] No frames were written. Check that prediction JSON and raw frames exist.")
+        raise SystemExit("[ERROR] No frames were written. Check that predictions and raw frames exist.")
 
     print(f"Saved video: {output_path}")
     return output_path
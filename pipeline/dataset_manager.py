@@ -1,11 +1,15 @@
 import csv
+import hashlib
+import io
+import itertools
 import json
 import mimetypes
 import os
 import random
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Validation (mirrors Driving Instructions Angle Test.py)
 
@@ -14,6 +18,22 @@ MAX_TURN_ANGLE = 180
 
 VALID_CATEGORIES = ('pedestrian', 'vehicle', 'traffic_light', 'lane_marking', 'obstacle')
 
+# Filenames per "WHERE filename IN (...)" lookup; stays under SQLite's variable limit.
+_ID_LOOKUP_CHUNK = 500
+
+# Image store folder created next to the database file.
+DEFAULT_IMAGE_STORE_DIRNAME = "image_store"
+
+# Every frames column except the legacy image_data BLOB; query methods select
+# these so listing frames never pulls image bytes into Python.
+FRAME_COLUMNS = (
+    'id', 'filename', 'relative_path', 'image_sha256', 'image_mime_type',
+    'image_size_bytes', 'width', 'height', 'source', 'frame_number',
+    'created_at', 'updated_at',
+)
+_FRAME_SELECT = ', '.join(FRAME_COLUMNS)
+_F_FRAME_SELECT = ', '.join(f'f.{column}' for column in FRAME_COLUMNS)
+
 
 def validate_turn_angle(angle) -> bool:
     """Return True if angle is a number in [-180, 180] (inclusive)."""
@@ -28,6 +48,12 @@ def validate_brake(value) -> bool:
     return isinstance(value, (float, int)) and 0.0 <= value <= 1.0
 
 
+def _check_relative_path(relative_path: str) -> None:
+    # Reject both OS-native absolute paths and Unix-style /absolute paths
+    if os.path.isabs(relative_path) or relative_path.startswith('/'):
+        raise ValueError(f"relative_path must not be absolute: {relative_path}")
+
+
 # Inline schema (fallback if schema.sql is missing)
 
 _INLINE_SCHEMA = """
@@ -36,6 +62,7 @@ CREATE TABLE IF NOT EXISTS frames (
     filename      TEXT    NOT NULL UNIQUE,
     relative_path TEXT    NOT NULL,
     image_data    BLOB,
+    image_sha256  TEXT,
     image_mime_type TEXT,
     image_size_bytes INTEGER,
     width         INTEGER,
@@ -80,9 +107,141 @@ CREATE INDEX IF NOT EXISTS idx_label_categories_annotation_id ON label_categorie
 CREATE INDEX IF NOT EXISTS idx_label_categories_category ON label_categories(category);
 CREATE INDEX IF NOT EXISTS idx_frames_frame_number ON frames(frame_number);
 CREATE INDEX IF NOT EXISTS idx_frames_source ON frames(source);
+CREATE INDEX IF NOT EXISTS idx_frames_image_sha256 ON frames(image_sha256);
 """
 
 
+# Image stores
+
+class ImageStore:
+    """
+    Content-addressed storage for frame image bytes, keyed by SHA-256 hex digest.
+
+    Frames keep only the digest and size; subclasses decide where bytes live.
+    Storing the same bytes twice returns the same digest and keeps one copy.
+    """
+
+    def put(self, data: bytes) -> str:
+        raise NotImplementedError
+
+    def open(self, digest: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def exists(self, digest: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, digest: str) -> None:
+        raise NotImplementedError
+
+
+class DirectoryImageStore(ImageStore):
+    """Stores each image as <root>/<digest[:2]>/<digest>."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self.path_for(digest), 'rb')
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def delete(self, digest: str) -> None:
+        if os.path.exists(self.path_for(digest)):
+            os.remove(self.path_for(digest))
+
+
+class MemoryImageStore(ImageStore):
+    """In-process store used for ":memory:" databases."""
+
+    def __init__(self):
+        self.blobs: Dict[str, bytes] = {}
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        self.blobs.setdefault(digest, bytes(data))
+        return digest
+
+    def open(self, digest: str) -> BinaryIO:
+        return io.BytesIO(self.blobs[digest])
+
+    def exists(self, digest: str) -> bool:
+        return digest in self.blobs
+
+    def delete(self, digest: str) -> None:
+        self.blobs.pop(digest, None)
+
+
+def default_image_store(db_path: str) -> ImageStore:
+    if db_path == ":memory:":
+        return MemoryImageStore()
+    db_dir = os.path.dirname(os.path.abspath(db_path))
+    return DirectoryImageStore(os.path.join(db_dir, DEFAULT_IMAGE_STORE_DIRNAME))
+
+
+_INSERT_FRAME_SQL = """INSERT OR IGNORE INTO frames
+   (filename, relative_path, image_sha256, image_mime_type, image_size_bytes,
+    width, height, source, frame_number, created_at, updated_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+_INSERT_ANNOTATION_SQL = """INSERT INTO annotations
+   (frame_id, scene_description, steering_angle_deg, throttle, brake,
+    annotation_source, annotated_at, created_at, updated_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+_INSERT_LABEL_SQL = """INSERT OR REPLACE INTO label_categories
+   (annotation_id, category, present, confidence, created_at)
+   VALUES (?, ?, ?, ?, ?)"""
+
+
+_EXPORT_COLUMNS = """f.filename, f.relative_path, f.frame_number, f.source,
+   f.width, f.height,
+   a.id AS annotation_id, a.scene_description,
+   a.steering_angle_deg, a.throttle, a.brake,
+   a.annotation_source, a.annotated_at"""
+
+_SPLIT_COLUMNS = """f.id AS frame_id, f.filename, f.relative_path, f.frame_number,
+   a.id AS annotation_id, a.scene_description,
+   a.steering_angle_deg, a.throttle, a.brake, a.annotation_source"""
+
+# Export records are read in batches and the labels of a whole batch are fetched
+# with one query, instead of one label query per annotation. The label dicts are
+# built in Python so confidences keep their full float repr in the JSON output.
+_EXPORT_BATCH_SIZE = 500
+
+_BATCH_LABELS_SQL = """SELECT annotation_id, category, present, confidence
+   FROM label_categories
+   WHERE annotation_id IN ({placeholders})
+   ORDER BY annotation_id, id"""
+
+
+def _write_json_array(output_path: str, records: Iterable[Dict]) -> int:
+    """Write records as an indent=2 JSON array, one record at a time."""
+    count = 0
+    with open(output_path, 'w') as f:
+        for record in records:
+            f.write('[\n  ' if count == 0 else ',\n  ')
+            f.write(json.dumps(record, indent=2).replace('\n', '\n  '))
+            count += 1
+        f.write('\n]' if count else '[]')
+    return count
+
+
 # DatasetManager
 
 class DatasetManager:
@@ -94,11 +253,27 @@ class DatasetManager:
             frame_id = db.add_frame("aspave_frame_0001.jpg", "../frames/aspave_frame_0001.jpg")
             ann_id   = db.add_annotation(frame_id, "Clear road", 5.0, 0.6, 0.0)
             db.add_label_category(ann_id, "vehicle", present=True)
+
+    Bulk imports should run inside bulk_session() so the whole import is one
+    transaction instead of one commit (and fsync) per row:
+        with DatasetManager("annotations.db") as db, db.bulk_session():
+            frame_ids = db.add_frames_bulk(frames)
+
+    Frame images are kept in an ImageStore (by default an image_store/ folder
+    next to the database) and read back lazily with open_image(frame_id).
+    Images are only stored for frames that are actually inserted, and images a
+    rolled-back transaction added to the store are removed again.
     """
 
-    def __init__(self, db_path: str = "annotations.db"):
+    def __init__(self, db_path: str = "annotations.db", image_store: Optional[ImageStore] = None):
         self.db_path = db_path
+        self.image_store = image_store or default_image_store(db_path)
         self.conn: Optional[sqlite3.Connection] = None
+        self._bulk_depth = 0
+        # Digests first written to the image store by the open transaction
+        self._transaction_images: List[str] = []
+        # Images of frames deleted by the open transaction, discarded once it commits
+        self._released_images: List[str] = []
         self._connect()
         self._create_tables()
 
@@ -108,6 +283,10 @@ class DatasetManager:
         self.conn = sqlite3.connect(self.db_path)
         self.conn.row_factory = sqlite3.Row
         self.conn.execute("PRAGMA foreign_keys = ON")
+        # WAL lets readers (notebooks, exporters) run during an import, and
+        # synchronous=NORMAL only fsyncs at checkpoints instead of every commit.
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
 
     def close(self) -> None:
         if self.conn:
@@ -120,6 +299,55 @@ class DatasetManager:
     def __exit__(self, *args):
         self.close()
 
+    def _commit(self) -> None:
+        """Commit unless a bulk_session() owns the transaction."""
+        if not self._bulk_depth:
+            self.conn.commit()
+
+    @contextmanager
+    def bulk_session(self):
+        """
+        Group every write in the block into a single transaction.
+
+        add_* methods skip their per-row commit while the session is open; the
+        block commits once on success and rolls back everything on error.
+        Sessions may be nested; only the outermost one commits.
+        """
+        self._bulk_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._bulk_depth == 1:
+                self.conn.rollback()
+                self._discard_unreferenced_images(self._transaction_images)
+            raise
+        else:
+            if self._bulk_depth == 1:
+                self.conn.commit()
+                self._discard_unreferenced_images(self._released_images)
+        finally:
+            self._bulk_depth -= 1
+            if not self._bulk_depth:
+                self._transaction_images = []
+                self._released_images = []
+
+    def _put_image(self, data: bytes) -> str:
+        """Store image bytes, remembering digests that are new to the store."""
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.image_store.exists(digest):
+            self.image_store.put(data)
+            if self._bulk_depth:
+                self._transaction_images.append(digest)
+        return digest
+
+    def _discard_unreferenced_images(self, digests: Iterable[str]) -> None:
+        for digest in dict.fromkeys(digests):
+            referenced = self.conn.execute(
+                "SELECT 1 FROM frames WHERE image_sha256 = ? LIMIT 1", (digest,)
+            ).fetchone()
+            if referenced is None:
+                self.image_store.delete(digest)
+
     # Schema init
 
     def _create_tables(self) -> None:
@@ -129,6 +357,11 @@ class DatasetManager:
                 sql = f.read()
         else:
             sql = _INLINE_SCHEMA
+        # Databases created before the image store have no image_sha256 column;
+        # add it before the schema indexes it.
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(frames)")}
+        if columns and "image_sha256" not in columns:
+            self.conn.execute("ALTER TABLE frames ADD COLUMN image_sha256 TEXT")
         self.conn.executescript(sql)
         self.conn.commit()
 
@@ -151,10 +384,77 @@ class DatasetManager:
         Insert a frame record. Returns the frame id.
         If filename already exists, returns its existing id (idempotent).
         Relative paths only — never pass absolute paths.
+        Image bytes (image_data or the file at image_path) go to the image
+        store; the frame row keeps only their SHA-256 and size.
         """
-        # Reject both OS-native absolute paths and Unix-style /absolute paths
-        if os.path.isabs(relative_path) or relative_path.startswith('/'):
-            raise ValueError(f"relative_path must not be absolute: {relative_path}")
+        _check_relative_path(relative_path)
+        existing = self._frame_ids([filename])
+        if existing:
+            return existing[filename]
+
+        with self.bulk_session():
+            row = self._frame_row(
+                filename, relative_path, width, height, source, frame_number,
+                image_data, image_mime_type, image_size_bytes, image_path,
+            )
+            cur = self.conn.execute(_INSERT_FRAME_SQL, row)
+        return cur.lastrowid
+
+    def add_frames_bulk(self, frames: Iterable[Dict]) -> List[int]:
+        """
+        Insert many frames with one executemany per chunk. Each dict takes
+        add_frame's keyword arguments. Returns frame ids in input order;
+        filenames that already exist keep their existing id, as in add_frame.
+        """
+        frames = iter(frames)
+        frame_ids = []
+        with self.bulk_session():
+            while True:
+                chunk = list(itertools.islice(frames, _ID_LOOKUP_CHUNK))
+                if not chunk:
+                    break
+                for frame in chunk:
+                    _check_relative_path(frame["relative_path"])
+                filenames = [frame["filename"] for frame in chunk]
+                ids = self._frame_ids(filenames)
+                # Only the first frame per new filename is inserted, so only its image is stored
+                new_frames = {}
+                for frame in chunk:
+                    if frame["filename"] not in ids:
+                        new_frames.setdefault(frame["filename"], frame)
+                self.conn.executemany(
+                    _INSERT_FRAME_SQL, [self._frame_row(**frame) for frame in new_frames.values()]
+                )
+                ids.update(self._frame_ids(list(new_frames)))
+                frame_ids.extend(ids[filename] for filename in filenames)
+        return frame_ids
+
+    def _frame_ids(self, filenames: List[str]) -> Dict[str, int]:
+        """Ids of the frames among filenames that already exist."""
+        ids = {}
+        for start in range(0, len(filenames), _ID_LOOKUP_CHUNK):
+            chunk = list(dict.fromkeys(filenames[start:start + _ID_LOOKUP_CHUNK]))
+            placeholders = ','.join('?' * len(chunk))
+            for r in self.conn.execute(
+                f"SELECT id, filename FROM frames WHERE filename IN ({placeholders})", chunk
+            ):
+                ids[r["filename"]] = r["id"]
+        return ids
+
+    def _frame_row(
+        self,
+        filename: str,
+        relative_path: str,
+        width: int = None,
+        height: int = None,
+        source: str = 'aspave',
+        frame_number: int = None,
+        image_data: bytes = None,
+        image_mime_type: str = None,
+        image_size_bytes: int = None,
+        image_path: str = None,
+    ) -> tuple:
+        _check_relative_path(relative_path)
 
         if image_data is None and image_path:
             with open(image_path, "rb") as image_file:
@@ -162,45 +462,98 @@ class DatasetManager:
             image_size_bytes = len(image_data)
             image_mime_type = image_mime_type or mimetypes.guess_type(image_path)[0]
 
-        if image_data is not None and image_size_bytes is None:
-            image_size_bytes = len(image_data)
+        image_sha256 = None
+        if image_data is not None:
+            image_sha256 = self._put_image(image_data)
+            if image_size_bytes is None:
+                image_size_bytes = len(image_data)
 
         now = datetime.utcnow().isoformat()
-        self.conn.execute(
-            """INSERT OR IGNORE INTO frames
-               (filename, relative_path, image_data, image_mime_type, image_size_bytes,
-                width, height, source, frame_number, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                filename, relative_path, image_data, image_mime_type, image_size_bytes,
-                width, height, source, frame_number, now, now,
-            ),
+        return (
+            filename, relative_path, image_sha256, image_mime_type, image_size_bytes,
+            width, height, source, frame_number, now, now,
         )
-        self.conn.commit()
-
-        row = self.conn.execute(
-            "SELECT id FROM frames WHERE filename = ?", (filename,)
-        ).fetchone()
-        return row["id"]
 
-    def get_frame(self, frame_id: int) -> Optional[Dict]:
+    def get_frame(self, frame_id: int, include_image_data: bool = False) -> Optional[Dict]:
         row = self.conn.execute(
-            "SELECT * FROM frames WHERE id = ?", (frame_id,)
+            f"SELECT {self._frame_select(include_image_data)} FROM frames WHERE id = ?",
+            (frame_id,),
         ).fetchone()
         return dict(row) if row else None
 
-    def get_frame_by_filename(self, filename: str) -> Optional[Dict]:
+    def get_frame_by_filename(
+        self, filename: str, include_image_data: bool = False
+    ) -> Optional[Dict]:
         row = self.conn.execute(
-            "SELECT * FROM frames WHERE filename = ?", (filename,)
+            f"SELECT {self._frame_select(include_image_data)} FROM frames WHERE filename = ?",
+            (filename,),
         ).fetchone()
         return dict(row) if row else None
 
-    def list_frames(self) -> List[Dict]:
+    def list_frames(self, include_image_data: bool = False) -> List[Dict]:
         rows = self.conn.execute(
-            "SELECT * FROM frames ORDER BY frame_number"
+            f"SELECT {self._frame_select(include_image_data)} FROM frames ORDER BY frame_number"
         ).fetchall()
         return [dict(r) for r in rows]
 
+    @staticmethod
+    def _frame_select(include_image_data: bool) -> str:
+        return _FRAME_SELECT + (', image_data' if include_image_data else '')
+
+    def open_image(self, frame_id: int) -> Optional[BinaryIO]:
+        """
+        Open a frame's image bytes as a binary file object, or return None if
+        the frame has no stored image. Frames not yet migrated are read from
+        their legacy image_data BLOB.
+
+        Example:
+            with db.open_image(frame_id) as f:
+                img = Image.open(f)
+        """
+        row = self.conn.execute(
+            "SELECT image_sha256, image_data IS NOT NULL AS has_blob FROM frames WHERE id = ?",
+            (frame_id,),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"No frame with id {frame_id}")
+        if row["image_sha256"]:
+            return self.image_store.open(row["image_sha256"])
+        if row["has_blob"]:
+            blob = self.conn.execute(
+                "SELECT image_data FROM frames WHERE id = ?", (frame_id,)
+            ).fetchone()[0]
+            return io.BytesIO(blob)
+        return None
+
+    def migrate_images_to_store(self, batch_size: int = 100, vacuum: bool = False) -> int:
+        """
+        Move legacy image_data BLOBs into the image store, one batch per
+        commit. Returns the number of frames migrated. vacuum=True rebuilds
+        the database file afterwards to give the freed pages back to the OS.
+        """
+        migrated = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, image_data FROM frames WHERE image_data IS NOT NULL LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+            if not rows:
+                break
+            with self.bulk_session():
+                for row in rows:
+                    data = row["image_data"]
+                    self.conn.execute(
+                        """UPDATE frames
+                           SET image_sha256 = ?, image_data = NULL,
+                               image_size_bytes = COALESCE(image_size_bytes, ?)
+                           WHERE id = ?""",
+                        (self._put_image(data), len(data), row["id"]),
+                    )
+            migrated += len(rows)
+        if vacuum and migrated:
+            self.conn.execute("VACUUM")
+        return migrated
+
     # Annotations
 
     def add_annotation(
@@ -217,6 +570,40 @@ class DatasetManager:
         Insert a driving annotation. Returns the annotation id.
         Raises ValueError if steering/throttle/brake are out of range.
         """
+        row = self._annotation_row(
+            frame_id, scene_description, steering_angle_deg, throttle, brake,
+            annotation_source, annotated_at,
+        )
+        cur = self.conn.execute(_INSERT_ANNOTATION_SQL, row)
+        self._commit()
+        return cur.lastrowid
+
+    def add_annotations_bulk(self, annotations: Iterable[Dict]) -> List[int]:
+        """
+        Insert many annotations with one executemany. Each dict takes
+        add_annotation's keyword arguments; every row is validated before
+        anything is written. Returns annotation ids in input order.
+        """
+        rows = [self._annotation_row(**annotation) for annotation in annotations]
+        if not rows:
+            return []
+        with self.bulk_session():
+            self.conn.executemany(_INSERT_ANNOTATION_SQL, rows)
+            # AUTOINCREMENT ids from one statement inside one transaction are
+            # consecutive, so they end at the last inserted rowid.
+            last_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    @staticmethod
+    def _annotation_row(
+        frame_id: int,
+        scene_description: str,
+        steering_angle_deg: float,
+        throttle: float,
+        brake: float,
+        annotation_source: str = 'manual',
+        annotated_at: str = None,
+    ) -> tuple:
         if not validate_turn_angle(steering_angle_deg):
             raise ValueError(
                 f"Invalid steering_angle_deg: {steering_angle_deg} (must be -180 to 180)"
@@ -228,19 +615,10 @@ class DatasetManager:
 
         now = datetime.utcnow().isoformat()
         annotated_at = annotated_at or now
-
-        cur = self.conn.execute(
-            """INSERT INTO annotations
-               (frame_id, scene_description, steering_angle_deg, throttle, brake,
-                annotation_source, annotated_at, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                frame_id, scene_description, steering_angle_deg,
-                throttle, brake, annotation_source, annotated_at, now, now,
-            ),
+        return (
+            frame_id, scene_description, steering_angle_deg,
+            throttle, brake, annotation_source, annotated_at, now, now,
         )
-        self.conn.commit()
-        return cur.lastrowid
 
     def get_annotation(self, annotation_id: int) -> Optional[Dict]:
         row = self.conn.execute(
@@ -280,12 +658,25 @@ class DatasetManager:
         self.conn.execute(
             f"UPDATE annotations SET {set_clause} WHERE id = ?", values
         )
-        self.conn.commit()
+        self._commit()
 
     def delete_frame(self, frame_id: int) -> None:
-        """Delete a frame and all its annotations/labels (CASCADE)."""
+        """Delete a frame and all its annotations/labels (CASCADE).
+
+        The frame's image is removed from the image store once no other frame
+        references it.
+        """
+        row = self.conn.execute(
+            "SELECT image_sha256 FROM frames WHERE id = ?", (frame_id,)
+        ).fetchone()
         self.conn.execute("DELETE FROM frames WHERE id = ?", (frame_id,))
-        self.conn.commit()
+        self._commit()
+        if row is None or not row["image_sha256"]:
+            return
+        if self._bulk_depth:
+            self._released_images.append(row["image_sha256"])
+        else:
+            self._discard_unreferenced_images([row["image_sha256"]])
 
     def get_all_annotations(self) -> List[Dict]:
         """Return all annotations joined with frame info."""
@@ -313,20 +704,37 @@ class DatasetManager:
         Add or update a label category for an annotation. Returns id.
         category must be one of: pedestrian, vehicle, traffic_light, lane_marking, obstacle
         """
+        cur = self.conn.execute(
+            _INSERT_LABEL_SQL,
+            self._label_row(annotation_id, category, present, confidence),
+        )
+        self._commit()
+        return cur.lastrowid
+
+    def add_label_categories_bulk(self, labels: Iterable[Dict]) -> int:
+        """
+        Add or update many label categories with one executemany. Each dict
+        takes add_label_category's keyword arguments. Returns the row count.
+        """
+        rows = [self._label_row(**label) for label in labels]
+        if rows:
+            self.conn.executemany(_INSERT_LABEL_SQL, rows)
+            self._commit()
+        return len(rows)
+
+    @staticmethod
+    def _label_row(
+        annotation_id: int,
+        category: str,
+        present: bool = True,
+        confidence: float = None,
+    ) -> tuple:
         if category not in VALID_CATEGORIES:
             raise ValueError(
                 f"Invalid category: '{category}'. Must be one of {VALID_CATEGORIES}"
             )
-
         now = datetime.utcnow().isoformat()
-        cur = self.conn.execute(
-            """INSERT OR REPLACE INTO label_categories
-               (annotation_id, category, present, confidence, created_at)
-               VALUES (?, ?, ?, ?, ?)""",
-            (annotation_id, category, 1 if present else 0, confidence, now),
-        )
-        self.conn.commit()
-        return cur.lastrowid
+        return (annotation_id, category, 1 if present else 0, confidence, now)
 
     def get_labels_for_annotation(self, annotation_id: int) -> List[Dict]:
         rows = self.conn.execute(
@@ -350,7 +758,7 @@ class DatasetManager:
             )
 
         rows = self.conn.execute(
-            """SELECT DISTINCT f.*,
+            f"""SELECT DISTINCT {_F_FRAME_SELECT},
                       a.id AS annotation_id, a.scene_description,
                       a.steering_angle_deg, a.throttle, a.brake
                FROM frames f
@@ -370,7 +778,7 @@ class DatasetManager:
             results = db.search_by_description("pedestrian")
         """
         rows = self.conn.execute(
-            """SELECT f.*, a.id AS annotation_id,
+            f"""SELECT {_F_FRAME_SELECT}, a.id AS annotation_id,
                       a.scene_description, a.steering_angle_deg, a.throttle, a.brake
                FROM frames f
                JOIN annotations a ON a.frame_id = f.id
@@ -389,22 +797,28 @@ class DatasetManager:
         Returns:
             (train_records, val_records) — no overlap, deterministic with seed.
         """
-        rows = self.conn.execute(
-            """SELECT DISTINCT f.id AS frame_id, f.filename, f.relative_path, f.frame_number,
-                      a.id AS annotation_id, a.scene_description,
-                      a.steering_angle_deg, a.throttle, a.brake, a.annotation_source
-               FROM frames f
-               JOIN annotations a ON a.frame_id = f.id
-               ORDER BY f.frame_number"""
-        ).fetchall()
+        train_ids, val_ids = self._split_annotation_ids(val_ratio, seed)
+        return (
+            list(self._iter_ordered_records(train_ids, _SPLIT_COLUMNS, with_labels=False)),
+            list(self._iter_ordered_records(val_ids, _SPLIT_COLUMNS, with_labels=False)),
+        )
 
-        records = [dict(r) for r in rows]
+    def _split_annotation_ids(self, val_ratio: float, seed: int) -> Tuple[List[int], List[int]]:
+        """Shuffle annotation ids (not whole records) into train / validation ids."""
+        ids = [
+            row[0]
+            for row in self.conn.execute(
+                """SELECT a.id
+                   FROM frames f
+                   JOIN annotations a ON a.frame_id = f.id
+                   ORDER BY f.frame_number, a.id"""
+            )
+        ]
         rng = random.Random(seed)
-        shuffled = records.copy()
-        rng.shuffle(shuffled)
+        rng.shuffle(ids)
 
-        split_idx = int(len(shuffled) * (1 - val_ratio))
-        return shuffled[:split_idx], shuffled[split_idx:]
+        split_idx = int(len(ids) * (1 - val_ratio))
+        return ids[:split_idx], ids[split_idx:]
 
     def validate_all_steering_angles(self) -> List[Dict]:
         """
@@ -421,42 +835,71 @@ class DatasetManager:
 
     # Export operations
 
-    def _fetch_export_rows(self, frame_ids: Optional[List[int]] = None):
+    def _iter_export_records(
+        self, frame_ids: Optional[List[int]] = None, with_labels: bool = True
+    ) -> Iterator[Dict]:
+        """Stream export records ordered by frame_number, labels fetched once per batch."""
+        where, params = "", []
         if frame_ids:
-            placeholders = ','.join('?' * len(frame_ids))
-            return self.conn.execute(
-                f"""SELECT f.filename, f.relative_path, f.frame_number, f.source,
-                           f.width, f.height,
-                           a.id AS annotation_id, a.scene_description,
-                           a.steering_angle_deg, a.throttle, a.brake,
-                           a.annotation_source, a.annotated_at
-                    FROM frames f
-                    JOIN annotations a ON a.frame_id = f.id
-                    WHERE f.id IN ({placeholders})
-                    ORDER BY f.frame_number""",
-                frame_ids,
-            ).fetchall()
-        return self.conn.execute(
-            """SELECT f.filename, f.relative_path, f.frame_number, f.source,
-                      f.width, f.height,
-                      a.id AS annotation_id, a.scene_description,
-                      a.steering_angle_deg, a.throttle, a.brake,
-                      a.annotation_source, a.annotated_at
-               FROM frames f
-               JOIN annotations a ON a.frame_id = f.id
-               ORDER BY f.frame_number"""
-        ).fetchall()
+            where = f"WHERE f.id IN ({','.join('?' * len(frame_ids))})"
+            params = list(frame_ids)
+        cursor = self.conn.execute(
+            f"""SELECT {_EXPORT_COLUMNS}
+                FROM frames f
+                JOIN annotations a ON a.frame_id = f.id
+                {where}
+                ORDER BY f.frame_number, a.id""",
+            params,
+        )
+        yield from self._iter_record_batches(cursor, with_labels)
 
-    def _attach_labels(self, record: Dict) -> Dict:
-        labels = self.conn.execute(
-            "SELECT category, present, confidence FROM label_categories WHERE annotation_id = ?",
-            (record['annotation_id'],),
-        ).fetchall()
-        record['labels'] = {
-            l['category']: {'present': bool(l['present']), 'confidence': l['confidence']}
-            for l in labels
-        }
-        return record
+    def _iter_ordered_records(
+        self, annotation_ids: List[int], columns: str, with_labels: bool = True
+    ) -> Iterator[Dict]:
+        """Stream records for annotation_ids in the given order via a temp ordering table."""
+        self.conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS export_order "
+            "(position INTEGER PRIMARY KEY, annotation_id INTEGER NOT NULL)"
+        )
+        self.conn.execute("DELETE FROM temp.export_order")
+        self.conn.executemany(
+            "INSERT INTO temp.export_order (position, annotation_id) VALUES (?, ?)",
+            enumerate(annotation_ids),
+        )
+        try:
+            cursor = self.conn.execute(
+                f"""SELECT {columns}
+                    FROM temp.export_order o
+                    JOIN annotations a ON a.id = o.annotation_id
+                    JOIN frames f ON f.id = a.frame_id
+                    ORDER BY o.position"""
+            )
+            yield from self._iter_record_batches(cursor, with_labels)
+        finally:
+            self.conn.execute("DELETE FROM temp.export_order")
+            self._commit()
+
+    def _iter_record_batches(self, cursor: sqlite3.Cursor, with_labels: bool) -> Iterator[Dict]:
+        """Yield the cursor's rows as dicts, attaching labels with one query per batch."""
+        while True:
+            records = [dict(row) for row in cursor.fetchmany(_EXPORT_BATCH_SIZE)]
+            if not records:
+                return
+            if with_labels:
+                self._attach_labels_batch(records)
+            yield from records
+
+    def _attach_labels_batch(self, records: List[Dict]) -> None:
+        annotation_ids = sorted({record['annotation_id'] for record in records})
+        labels: Dict[int, Dict] = {annotation_id: {} for annotation_id in annotation_ids}
+        rows = self.conn.execute(
+            _BATCH_LABELS_SQL.format(placeholders=','.join('?' * len(annotation_ids))),
+            annotation_ids,
+        )
+        for annotation_id, category, present, confidence in rows:
+            labels[annotation_id][category] = {'present': bool(present), 'confidence': confidence}
+        for record in records:
+            record['labels'] = labels[record['annotation_id']]
 
     def export_to_json(
         self, output_path: str, frame_ids: Optional[List[int]] = None
@@ -465,16 +908,13 @@ class DatasetManager:
         Export annotations (with labels) to a JSON file.
         Returns number of records written.
 
+        Records are streamed to disk one at a time, so memory use does not
+        grow with the size of the database.
+
         Example:
             count = db.export_to_json("dataset.json")
         """
-        rows = self._fetch_export_rows(frame_ids)
-        records = [self._attach_labels(dict(r)) for r in rows]
-
-        with open(output_path, 'w') as f:
-            json.dump(records, f, indent=2)
-
-        return len(records)
+        return _write_json_array(output_path, self._iter_export_records(frame_ids))
 
     def export_to_csv(
         self, output_path: str, frame_ids: Optional[List[int]] = None
@@ -483,20 +923,23 @@ class DatasetManager:
         Export annotations to a CSV file (no label columns — use JSON for full data).
         Returns number of records written.
         """
-        rows = self._fetch_export_rows(frame_ids)
-        if not rows:
+        records = self._iter_export_records(frame_ids, with_labels=False)
+        first = next(records, None)
+        if first is None:
             return 0
 
-        fieldnames = list(rows[0].keys())
         # Drop annotation_id from CSV (internal key)
-        fieldnames = [f for f in fieldnames if f != 'annotation_id']
+        fieldnames = [f for f in first if f != 'annotation_id']
 
+        count = 0
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
             writer.writeheader()
-            writer.writerows([dict(r) for r in rows])
+            for record in itertools.chain([first], records):
+                writer.writerow(record)
+                count += 1
 
-        return len(rows)
+        return count
 
     def export_train_val_split_json(
         self,
@@ -508,25 +951,26 @@ class DatasetManager:
         Export 80/20 train/val split to train.json and val.json.
         Returns (train_path, val_path).
 
+        Only annotation ids are shuffled in memory; records are streamed.
+
         Example:
             train_path, val_path = db.export_train_val_split_json("splits/")
         """
         os.makedirs(output_dir, exist_ok=True)
-        train_records, val_records = self.get_train_val_split(val_ratio, seed)
-
-        def enrich(records: List[Dict]) -> List[Dict]:
-            return [self._attach_labels(r) for r in records]
+        train_ids, val_ids = self._split_annotation_ids(val_ratio, seed)
 
         train_path = os.path.join(output_dir, "train.json")
         val_path = os.path.join(output_dir, "val.json")
 
-        with open(train_path, 'w') as f:
-            json.dump(enrich(train_records), f, indent=2)
-        with open(val_path, 'w') as f:
-            json.dump(enrich(val_records), f, indent=2)
+        train_count = _write_json_array(
+            train_path, self._iter_ordered_records(train_ids, _SPLIT_COLUMNS)
+        )
+        val_count = _write_json_array(
+            val_path, self._iter_ordered_records(val_ids, _SPLIT_COLUMNS)
+        )
 
-        print(f"Train: {len(train_records)} records -> {train_path}")
-        print(f"Val:   {len(val_records)} records -> {val_path}")
+        print(f"Train: {train_count} records -> {train_path}")
+        print(f"Val:   {val_count} records -> {val_path}")
 
         return train_path, val_path
 
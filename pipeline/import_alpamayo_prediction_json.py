@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
-Import Alpamayo per-frame prediction JSON files into annotations.db.
+Import Alpamayo predictions into annotations.db.
+
+Reads the segment's columnar prediction store when present, otherwise the
+legacy per-frame *_prediction.json files.
 
 This pairs with:
   alpamayo/batch_export_inference.py
@@ -14,9 +17,15 @@ from __future__ import annotations
 import argparse
 import glob
 import json
+import os
 import sqlite3
+import sys
 from pathlib import Path
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "alpamayo", "src")))
+
+from alpamayo1_5.prediction_store import load_prediction_store
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Import Alpamayo prediction JSON into SQLite.")
@@ -104,6 +113,17 @@ def load_prediction(path):
         return json.load(handle)
 
 
+def iter_prediction_payloads(predictions_dir):
+    """Yield ``(label, payload)`` from the prediction store, or from JSON files without one."""
+    store = load_prediction_store(str(predictions_dir))
+    if store is not None and len(store):
+        for frame_index, payload in store.payloads():
+            yield f"{Path(predictions_dir).name}[{frame_index}]", payload
+        return
+    for json_path in sorted(glob.glob(str(Path(predictions_dir) / "*_prediction.json"))):
+        yield json_path, load_prediction(json_path)
+
+
 def infer_source(payload):
     route = payload.get("route")
     segment = payload.get("segment")
@@ -208,20 +228,19 @@ def main():
     predictions_dir = Path(args.predictions_dir).resolve() if args.predictions_dir else infer_predictions_dir(args.segment)
     default_source = args.source or infer_source_from_segment(args.segment)
 
-    prediction_paths = sorted(glob.glob(str(predictions_dir / "*_prediction.json")))
-    if not prediction_paths:
-        print(f"[SKIP] No *_prediction.json files found in {predictions_dir}")
+    predictions = list(iter_prediction_payloads(predictions_dir))
+    if not predictions:
+        print(f"[SKIP] No prediction store or *_prediction.json files found in {predictions_dir}")
         return
 
     conn = connect_db(args.db)
     imported = 0
     skipped = 0
 
-    print(f"Found {len(prediction_paths)} prediction JSON file(s).")
+    print(f"Found {len(predictions)} prediction(s).")
     print(f"Predictions: {predictions_dir}")
     print(f"Source     : {default_source}")
-    for json_path in prediction_paths:
-        payload = load_prediction(json_path)
+    for json_path, payload in predictions:
         source = args.source or infer_source(payload) or default_source
         frame_index = payload.get("frame_index")
 
@@ -264,7 +264,7 @@ def main():
         print(f"[DRY RUN] Found {len(jpgs)} JPG files.")
         return
 
-    with DatasetManager(args.db) as db:
+    with DatasetManager(args.db) as db, db.bulk_session():
         print("--- Registering frames ---")
         frame_map = import_frames(db, args.frames_dir)
         print(f"\nTotal frames registered: {len(frame_map)}")
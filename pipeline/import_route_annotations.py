@@ -31,6 +31,7 @@ from dataset_manager import DatasetManager, VALID_CATEGORIES
 
 IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
 CAMERA_DIRS = ("raw", "raw_front", "raw_left", "raw_right")
+FRAME_INSERT_CHUNK = 256
 
 
 def parse_args():
@@ -164,21 +165,29 @@ def relative_path_from_db(image_path, db_path):
 
 def import_frames(db, images, db_path, source, keep_original):
     frame_map = {}
-    for image_path in images:
-        width, height = image_dimensions(image_path)
-        filename = stored_filename(image_path, source, keep_original)
-        frame_id = db.add_frame(
-            filename=filename,
-            relative_path=relative_path_from_db(image_path, db_path),
-            width=width,
-            height=height,
-            source=source,
-            frame_number=frame_number_from_name(image_path.name),
-            image_path=str(image_path),
-        )
-        frame_map[image_path.name] = frame_id
-        frame_map[filename] = frame_id
-        print(f"  [frame={frame_id:4d}] {filename}")
+    # Frames carry their image bytes, so insert in chunks rather than all at once.
+    for start in range(0, len(images), FRAME_INSERT_CHUNK):
+        chunk = images[start:start + FRAME_INSERT_CHUNK]
+        frames = []
+        for image_path in chunk:
+            width, height = image_dimensions(image_path)
+            frames.append(
+                {
+                    "filename": stored_filename(image_path, source, keep_original),
+                    "relative_path": relative_path_from_db(image_path, db_path),
+                    "width": width,
+                    "height": height,
+                    "source": source,
+                    "frame_number": frame_number_from_name(image_path.name),
+                    "image_path": str(image_path),
+                }
+            )
+        frame_ids = db.add_frames_bulk(frames)
+
+        for image_path, frame, frame_id in zip(chunk, frames, frame_ids):
+            frame_map[image_path.name] = frame_id
+            frame_map[frame["filename"]] = frame_id
+            print(f"  [frame={frame_id:4d}] {frame['filename']}")
     return frame_map
 
 
@@ -328,7 +337,7 @@ def main():
         return
 
     inserted_annotations = 0
-    with DatasetManager(args.db) as db:
+    with DatasetManager(args.db) as db, db.bulk_session():
         print("\n--- Registering frames ---")
         for camera_name, _, images in image_sets:
             camera_source = source_for_camera(source, camera_name, multi_camera)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Move frame images stored as BLOBs in annotations.db into the content-addressed image store.
+
+Frames keep their SHA-256 and size; identical images are stored once.
+
+Examples:
+  python3 pipeline/migrate_image_store.py
+  python3 pipeline/migrate_image_store.py --db pipeline/annotations.db --vacuum
+"""
+
+import argparse
+
+from dataset_manager import DatasetManager, DirectoryImageStore
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Migrate frame image BLOBs into the image store.")
+    parser.add_argument("--db", default="pipeline/annotations.db", help="SQLite DB path")
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="Image store folder. Default: image_store/ next to the database.",
+    )
+    parser.add_argument("--batch-size", type=int, default=100, help="Frames migrated per commit")
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="Rebuild the database afterwards so it shrinks on disk.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    image_store = DirectoryImageStore(args.store_dir) if args.store_dir else None
+    with DatasetManager(args.db, image_store=image_store) as db:
+        migrated = db.migrate_images_to_store(batch_size=args.batch_size, vacuum=args.vacuum)
+        print(f"Migrated {migrated} frame image(s) into {getattr(db.image_store, 'root', 'memory')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import io
 import json
+import os
 import sqlite3
+import sys
 import textwrap
 from pathlib import Path
 
@@ -10,6 +12,12 @@ import matplotlib.pyplot as plt
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 
+from dataset_manager import FRAME_COLUMNS, default_image_store
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "alpamayo", "src")))
+
+from alpamayo1_5.prediction_store import load_prediction_store
+
 
 COLORS = ["#e53935", "#1e88e5", "#43a047", "#fb8c00", "#8e24aa", "#00acc1"]
 
@@ -30,6 +38,7 @@ class DatabaseExplorer:
             raise FileNotFoundError(f"Database not found: {self.db_path}")
         self.conn = sqlite3.connect(self.db_path)
         self.conn.row_factory = sqlite3.Row
+        self.image_store = default_image_store(str(self.db_path))
 
     def table_exists(self, name: str) -> bool:
         row = self.conn.execute(
@@ -66,7 +75,9 @@ class DatabaseExplorer:
 
     def get_frame_row(self, frame_id_or_row):
         if isinstance(frame_id_or_row, int):
-            row = self.conn.execute("SELECT * FROM frames WHERE id=?", (frame_id_or_row,)).fetchone()
+            columns = [row["name"] for row in self.conn.execute("PRAGMA table_info(frames)")]
+            select = ", ".join(column for column in columns if column in FRAME_COLUMNS)
+            row = self.conn.execute(f"SELECT {select} FROM frames WHERE id=?", (frame_id_or_row,)).fetchone()
         else:
             row = frame_id_or_row
         if row is None:
@@ -79,8 +90,12 @@ class DatabaseExplorer:
 
     def load_frame_image(self, frame_id_or_row):
         row = self.get_frame_row(frame_id_or_row)
-        if "image_data" in row.keys() and row["image_data"] is not None:
-            return Image.open(io.BytesIO(row["image_data"])).convert("RGB")
+        if "image_sha256" in row.keys() and row["image_sha256"] and self.image_store.exists(row["image_sha256"]):
+            with self.image_store.open(row["image_sha256"]) as handle:
+                return Image.open(handle).convert("RGB")
+        blob = self.conn.execute("SELECT image_data FROM frames WHERE id=?", (row["id"],)).fetchone()
+        if blob is not None and blob[0] is not None:
+            return Image.open(io.BytesIO(blob[0])).convert("RGB")
         return Image.open(self.resolve_frame_path(row)).convert("RGB")
 
     def frame_labels(self, frame_id: int) -> list[dict]:
@@ -339,3 +354,35 @@ def open_explorer(db_path: str | Path | None = None) -> DatabaseExplorer:
     explorer = DatabaseExplorer(db_path)
     print("Database:", explorer.db_path)
     return explorer
+
+
+def segment_predictions(segment_dir: str | Path) -> pd.DataFrame:
+    """Per-frame command and reasoning text from a segment's prediction store, without the DB."""
+    store = load_prediction_store(str(Path(segment_dir) / "predictions"))
+    columns = ["frame_index", "nav_command", "command_text", "reasoning_text", "frames_stored"]
+    if store is None:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(
+        [
+            {
+                "frame_index": frame_index,
+                "nav_command": store.records[frame_index]["nav_command"],
+                "command_text": store.records[frame_index]["command_text"],
+                "reasoning_text": store.records[frame_index]["reasoning_text"],
+                "frames_stored": store.records[frame_index]["selected_steps"],
+            }
+            for frame_index in store.frame_indices()
+        ],
+        columns=columns,
+    )
+
+
+def segment_prediction_points(segment_dir: str | Path, frame_index: int, ground_truth: bool = False) -> pd.DataFrame:
+    """Selected (or ground-truth) path of one stored frame, shaped like ``prediction_points``."""
+    store = load_prediction_store(str(Path(segment_dir) / "predictions"))
+    if store is None or frame_index not in store:
+        raise ValueError(f"No stored prediction for frame {frame_index} in {segment_dir}")
+    path = store.ground_truth_path(frame_index) if ground_truth else store.selected_path(frame_index)
+    points = pd.DataFrame(path, columns=["x_m", "y_m", "z_m"])
+    points.insert(0, "step_index", range(len(points)))
+    return points
@@ -6,7 +6,8 @@ CREATE TABLE IF NOT EXISTS frames (
     id           INTEGER PRIMARY KEY AUTOINCREMENT,
     filename     TEXT    NOT NULL UNIQUE,          -- e.g. aspave_frame_0001.jpg
     relative_path TEXT   NOT NULL,                 -- path relative to pipeline/
-    image_data   BLOB,                             -- raw image bytes
+    image_data   BLOB,                             -- legacy raw image bytes (migrated to the image store)
+    image_sha256 TEXT,                             -- SHA-256 key of the image in the image store
     image_mime_type TEXT,                          -- e.g. image/png
     image_size_bytes INTEGER,
     width        INTEGER,                          -- image width in pixels
@@ -67,6 +68,9 @@ CREATE INDEX IF NOT EXISTS idx_frames_frame_number
 CREATE INDEX IF NOT EXISTS idx_frames_source
     ON frames(source);
 
+CREATE INDEX IF NOT EXISTS idx_frames_image_sha256
+    ON frames(image_sha256);
+
 -- Alpamayo predicted paths
 CREATE TABLE IF NOT EXISTS alpamayo_predictions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
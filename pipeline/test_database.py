@@ -18,11 +18,13 @@ Run:
 
 import json
 import os
+import sqlite3
 import tempfile
 import unittest
 
 from dataset_manager import (
     DatasetManager,
+    DirectoryImageStore,
     VALID_CATEGORIES,
     validate_turn_angle,
     validate_throttle,
@@ -382,6 +384,23 @@ class TestTrainValSplit(BaseDBTest):
             for record in data:
                 self.assertIsInstance(record["labels"], dict)
 
+    def test_export_split_matches_get_train_val_split(self):
+        train, val = self.db.get_train_val_split(seed=7)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            train_path, val_path = self.db.export_train_val_split_json(tmpdir, seed=7)
+            with open(train_path) as f:
+                train_data = json.load(f)
+            with open(val_path) as f:
+                val_data = json.load(f)
+        self.assertEqual([r["annotation_id"] for r in train_data], [r["annotation_id"] for r in train])
+        self.assertEqual([r["annotation_id"] for r in val_data], [r["annotation_id"] for r in val])
+        for record in train_data + val_data:
+            expected = {
+                l["category"]: {"present": bool(l["present"]), "confidence": l["confidence"]}
+                for l in self.db.get_labels_for_annotation(record["annotation_id"])
+            }
+            self.assertEqual(record["labels"], expected)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Test 4: Verify all steering angles are valid
@@ -486,6 +505,23 @@ class TestCRUDAndExport(BaseDBTest):
         finally:
             os.unlink(tmp)
 
+    def test_export_to_json_keeps_full_precision_confidences(self):
+        self.db.add_label_category(self.ann_ids[0], "vehicle", True, confidence=0.1 + 0.2)
+        self.db.add_label_category(self.ann_ids[0], "pedestrian", False, confidence=0.8765432187654321)
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            tmp = f.name
+        try:
+            self.db.export_to_json(tmp)
+            with open(tmp) as f:
+                text = f.read()
+            data = json.loads(text)
+            self.assertEqual(text, json.dumps(data, indent=2))
+            labels = data[0]["labels"]
+            self.assertEqual(labels["vehicle"], {"present": True, "confidence": 0.30000000000000004})
+            self.assertEqual(labels["pedestrian"]["confidence"], 0.8765432187654321)
+        finally:
+            os.unlink(tmp)
+
     def test_export_to_csv(self):
         with tempfile.NamedTemporaryFile(suffix=".csv", delete=False, mode='w') as f:
             tmp = f.name
@@ -524,6 +560,213 @@ class TestCRUDAndExport(BaseDBTest):
             self.db.add_label_category(self.ann_ids[0], "spaceship")
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# Bulk import
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestBulkImport(BaseDBTest):
+
+    def test_add_frames_bulk_returns_ids_in_order(self):
+        frames = [
+            {"filename": f"bulk_{i:04d}.jpg", "relative_path": f"bulk/bulk_{i:04d}.jpg",
+             "frame_number": 100 + i}
+            for i in range(3)
+        ]
+        frames.append({"filename": SAMPLE_ANNOTATIONS[0]["filename"], "relative_path": "dup.jpg"})
+        ids = self.db.add_frames_bulk(frames)
+        self.assertEqual(ids[3], self.frame_ids[0])
+        for frame, frame_id in zip(frames[:3], ids[:3]):
+            self.assertEqual(self.db.get_frame(frame_id)["filename"], frame["filename"])
+
+    def test_add_annotations_and_labels_bulk(self):
+        ann_ids = self.db.add_annotations_bulk(
+            [{"frame_id": fid, "scene_description": f"bulk {fid}", "steering_angle_deg": 1.0,
+              "throttle": 0.5, "brake": 0.0} for fid in self.frame_ids]
+        )
+        self.assertEqual(len(set(ann_ids)), 5)
+        for fid, ann_id in zip(self.frame_ids, ann_ids):
+            self.assertEqual(self.db.get_annotation(ann_id)["scene_description"], f"bulk {fid}")
+
+        count = self.db.add_label_categories_bulk(
+            [{"annotation_id": ann_id, "category": "vehicle"} for ann_id in ann_ids]
+        )
+        self.assertEqual(count, 5)
+        for ann_id in ann_ids:
+            labels = self.db.get_labels_for_annotation(ann_id)
+            self.assertEqual([(l["category"], l["present"]) for l in labels], [("vehicle", 1)])
+
+    def test_bulk_validation_writes_nothing(self):
+        with self.assertRaises(ValueError):
+            self.db.add_annotations_bulk(
+                [{"frame_id": self.frame_ids[0], "scene_description": "ok",
+                  "steering_angle_deg": 0.0, "throttle": 0.1, "brake": 0.0},
+                 {"frame_id": self.frame_ids[0], "scene_description": "bad",
+                  "steering_angle_deg": 500.0, "throttle": 0.1, "brake": 0.0}]
+            )
+        self.assertEqual(self.db.get_stats()["total_annotations"], 5)
+
+    def test_bulk_session_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.bulk_session():
+                fid = self.db.add_frame("rollback.jpg", "rollback.jpg")
+                self.db.add_annotation(fid, "Rolled back", 0.0, 0.1, 0.0)
+                raise RuntimeError("abort import")
+        self.assertIsNone(self.db.get_frame_by_filename("rollback.jpg"))
+        self.assertEqual(self.db.get_stats()["total_annotations"], 5)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Image store
+# ─────────────────────────────────────────────────────────────────────────────
+
+class TestImageStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "annotations.db")
+        self.db = DatasetManager(self.db_path)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp_dir.cleanup()
+
+    def test_images_are_content_addressed_and_deduplicated(self):
+        fid_a = self.db.add_frame("a.png", "a.png", image_data=b"same-bytes")
+        fid_b = self.db.add_frame("b.png", "b.png", image_data=b"same-bytes")
+        frame_a = self.db.get_frame(fid_a)
+        self.assertEqual(frame_a["image_sha256"], self.db.get_frame(fid_b)["image_sha256"])
+        self.assertEqual(frame_a["image_size_bytes"], len(b"same-bytes"))
+        store_root = os.path.join(self.tmp_dir.name, "image_store")
+        stored = [name for _, _, names in os.walk(store_root) for name in names]
+        self.assertEqual(stored, [frame_a["image_sha256"]])
+        with self.db.open_image(fid_b) as f:
+            self.assertEqual(f.read(), b"same-bytes")
+
+    def _stored_digests(self):
+        store_root = os.path.join(self.tmp_dir.name, "image_store")
+        return sorted(name for _, _, names in os.walk(store_root) for name in names)
+
+    def test_duplicate_filenames_store_no_image(self):
+        fid = self.db.add_frame("a.png", "a.png", image_data=b"first")
+        self.assertEqual(self.db.add_frame("a.png", "a.png", image_data=b"second"), fid)
+        ids = self.db.add_frames_bulk(
+            [{"filename": "a.png", "relative_path": "a.png", "image_data": b"third"},
+             {"filename": "b.png", "relative_path": "b.png", "image_data": b"fourth"},
+             {"filename": "b.png", "relative_path": "b.png", "image_data": b"fifth"}]
+        )
+        self.assertEqual(ids[0], fid)
+        self.assertEqual(ids[1], ids[2])
+        self.assertEqual(
+            self._stored_digests(),
+            sorted([self.db.get_frame(fid)["image_sha256"], self.db.get_frame(ids[1])["image_sha256"]]),
+        )
+
+    def test_rolled_back_import_removes_its_images(self):
+        fid = self.db.add_frame("kept.png", "kept.png", image_data=b"kept")
+        kept = self._stored_digests()
+        with self.assertRaises(RuntimeError):
+            with self.db.bulk_session():
+                self.db.add_frame("new.png", "new.png", image_data=b"rolled back")
+                self.db.add_frames_bulk(
+                    [{"filename": "again.png", "relative_path": "again.png", "image_data": b"kept"}]
+                )
+                raise RuntimeError("abort import")
+        self.assertEqual(self._stored_digests(), kept)
+        with self.db.open_image(fid) as f:
+            self.assertEqual(f.read(), b"kept")
+
+    def test_queries_do_not_select_image_blobs(self):
+        fid = self.db.add_frame("c.png", "c.png", image_data=b"pixels")
+        self.assertNotIn("image_data", self.db.list_frames()[0])
+        self.assertNotIn("image_data", self.db.get_frame_by_filename("c.png"))
+        self.assertIsNone(self.db.get_frame(fid, include_image_data=True)["image_data"])
+        self.assertIsNone(self.db.open_image(self.db.add_frame("d.png", "d.png")))
+
+    def test_migrate_legacy_blobs(self):
+        self.db.conn.execute(
+            "INSERT INTO frames (filename, relative_path, image_data) VALUES (?, ?, ?)",
+            ("legacy.png", "legacy.png", b"legacy-bytes"),
+        )
+        self.db.conn.commit()
+        fid = self.db.get_frame_by_filename("legacy.png")["id"]
+        with self.db.open_image(fid) as f:
+            self.assertEqual(f.read(), b"legacy-bytes")
+
+        store = DirectoryImageStore(os.path.join(self.tmp_dir.name, "other_store"))
+        with DatasetManager(self.db_path, image_store=store) as db:
+            self.assertEqual(db.migrate_images_to_store(vacuum=True), 1)
+            frame = db.get_frame(fid, include_image_data=True)
+            self.assertIsNone(frame["image_data"])
+            self.assertEqual(frame["image_size_bytes"], len(b"legacy-bytes"))
+            self.assertTrue(store.exists(frame["image_sha256"]))
+            with db.open_image(fid) as f:
+                self.assertEqual(f.read(), b"legacy-bytes")
+            self.assertEqual(db.migrate_images_to_store(), 0)
+
+    def test_deleted_frames_release_their_images(self):
+        own = self.db.add_frame("own.png", "own.png", image_data=b"own")
+        shared_a = self.db.add_frame("a.png", "a.png", image_data=b"shared")
+        shared_b = self.db.add_frame("b.png", "b.png", image_data=b"shared")
+        shared_digest = self.db.get_frame(shared_a)["image_sha256"]
+
+        self.db.delete_frame(own)
+        self.assertEqual(self._stored_digests(), [shared_digest])
+        self.db.delete_frame(shared_a)
+        self.assertEqual(self._stored_digests(), [shared_digest])
+        with self.db.open_image(shared_b) as f:
+            self.assertEqual(f.read(), b"shared")
+        self.db.delete_frame(shared_b)
+        self.assertEqual(self._stored_digests(), [])
+
+    def test_deletes_release_images_only_when_the_session_commits(self):
+        fid = self.db.add_frame("a.png", "a.png", image_data=b"pixels")
+        digests = self._stored_digests()
+        with self.assertRaises(RuntimeError):
+            with self.db.bulk_session():
+                self.db.delete_frame(fid)
+                raise RuntimeError("abort cleanup")
+        self.assertEqual(self._stored_digests(), digests)
+        with self.db.open_image(fid) as f:
+            self.assertEqual(f.read(), b"pixels")
+
+        with self.db.bulk_session():
+            self.db.delete_frame(fid)
+            self.assertEqual(self._stored_digests(), digests)
+        self.assertEqual(self._stored_digests(), [])
+
+    def test_frames_are_indexed_by_image_digest(self):
+        plan = self.db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT 1 FROM frames WHERE image_sha256 = ? LIMIT 1", ("x",)
+        ).fetchall()
+        self.assertIn("idx_frames_image_sha256", " ".join(row["detail"] for row in plan))
+
+    def test_databases_without_image_digests_gain_the_column_and_index(self):
+        legacy_path = os.path.join(self.tmp_dir.name, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute(
+            """CREATE TABLE frames (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   filename TEXT NOT NULL UNIQUE,
+                   relative_path TEXT NOT NULL,
+                   image_data BLOB,
+                   width INTEGER,
+                   height INTEGER,
+                   source TEXT DEFAULT 'aspave',
+                   frame_number INTEGER,
+                   created_at TEXT NOT NULL DEFAULT (datetime('now')),
+                   updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+               )"""
+        )
+        conn.commit()
+        conn.close()
+
+        with DatasetManager(legacy_path) as db:
+            columns = {row["name"] for row in db.conn.execute("PRAGMA table_info(frames)")}
+            indexes = {row["name"] for row in db.conn.execute("PRAGMA index_list(frames)")}
+        self.assertIn("image_sha256", columns)
+        self.assertIn("idx_frames_image_sha256", indexes)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Persistence test (file-based DB)
 # ─────────────────────────────────────────────────────────────────────────────
@@ -551,6 +794,21 @@ class TestPersistence(unittest.TestCase):
             self.assertEqual(len(anns), 1)
             self.assertAlmostEqual(anns[0]["steering_angle_deg"], 15.0)
 
+    def test_bulk_session_commits_once_and_uses_wal(self):
+        with DatasetManager(self.db_path) as db:
+            self.assertEqual(db.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            with db.bulk_session():
+                ids = db.add_frames_bulk(
+                    {"filename": f"wal_{i}.jpg", "relative_path": f"wal_{i}.jpg"} for i in range(10)
+                )
+                db.add_annotation(ids[0], "In session", 0.0, 0.2, 0.0)
+                self.assertTrue(db.conn.in_transaction)
+            self.assertFalse(db.conn.in_transaction)
+
+        with DatasetManager(self.db_path) as db:
+            self.assertEqual(len(db.list_frames()), 10)
+            self.assertEqual(len(db.get_annotations_for_frame(ids[0])), 1)
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Entry point
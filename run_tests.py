@@ -13,6 +13,7 @@ PROJECT_ROOT = Path(__file__).resolve().parent
 TESTS_DIR = PROJECT_ROOT / "tests"
 PIPELINE_DIR = PROJECT_ROOT / "pipeline"
 ALPAMAYO_SRC_DIR = PROJECT_ROOT / "alpamayo" / "src"
+ALPAMAYO_TESTS_DIR = PROJECT_ROOT / "alpamayo" / "tests"
 
 
 def main() -> int:
@@ -48,10 +49,9 @@ def build_default_suite() -> unittest.TestSuite:
         add_to_syspath(PIPELINE_DIR)
         suite.addTests(load_unittest_module("pipeline_test_database", pipeline_db_test))
 
-    alpamayo_nav_test = PROJECT_ROOT / "alpamayo" / "tests" / "test_navigation_command.py"
-    if alpamayo_nav_test.exists():
-        add_to_syspath(ALPAMAYO_SRC_DIR)
-        suite.addTests(load_function_tests("alpamayo_test_navigation_command", alpamayo_nav_test))
+    add_to_syspath(ALPAMAYO_SRC_DIR)
+    for alpamayo_test in sorted(ALPAMAYO_TESTS_DIR.glob("test_*.py")):
+        suite.addTests(load_function_tests(f"alpamayo_{alpamayo_test.stem}", alpamayo_test))
 
     return suite
 
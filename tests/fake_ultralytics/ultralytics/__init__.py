@@ -0,0 +1,39 @@
+"""Stand-in for ``ultralytics`` used by the annotation tests.
+
+The annotation scripts import ``ultralytics.YOLO`` at import time, including in
+their spawned worker processes, so the fake has to be importable by name.
+"""
+
+import numpy as np
+
+
+class Box:
+    def __init__(self, class_id, xyxy, confidence):
+        self.cls = np.array(float(class_id))
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+        self.conf = np.array(confidence)
+
+
+class Results:
+    names = {0: "person", 2: "car", 9: "traffic light"}
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class YOLO:
+    """Detects one car whose right edge follows the image's mean pixel value.
+
+    Black images have no detections.
+    """
+
+    def __init__(self, model="yolov8s.pt"):
+        self.model = model
+        self.predicted_images = 0
+
+    def predict(self, source, conf, iou, verbose, device=None):
+        self.predicted_images += len(source)
+        return [
+            Results([Box(2, [1.0, 2.0, 4.0 + float(image.mean()) / 16.0, 6.0], 0.75)] if image.any() else [])
+            for image in source
+        ]
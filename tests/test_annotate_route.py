@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+PIPELINE_DIR = PROJECT_ROOT / "pipeline"
+CVAT_SCRIPTS_DIR = PROJECT_ROOT / "CVAT_setup" / "scripts"
+for path in (PIPELINE_DIR, CVAT_SCRIPTS_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# annotate_route imports ultralytics (and would pip install it) at import time;
+# the tests and the annotation workers they spawn import a fake instead.
+FAKE_ULTRALYTICS_DIR = Path(__file__).resolve().parent / "fake_ultralytics"
+if str(FAKE_ULTRALYTICS_DIR) not in sys.path:
+    sys.path.insert(0, str(FAKE_ULTRALYTICS_DIR))
+
+import annotate_route
+import local_yolo_annotate
+from ultralytics import YOLO
+
+
+class FakeModel(YOLO):
+    def __init__(self, drop_results=0):
+        super().__init__("fake.pt")
+        self.drop_results = drop_results
+
+    def predict(self, *args, **kwargs):
+        results = super().predict(*args, **kwargs)
+        return results[: len(results) - self.drop_results]
+
+
+def image(value, width=32, height=24):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+class DetectImagesTests(unittest.TestCase):
+    def test_detections_are_returned_per_image(self):
+        detections = annotate_route.detect_images(FakeModel(), [image(0), image(32, width=16)], 0.5, 0.7, None)
+
+        self.assertEqual(len(detections), 2)
+        self.assertEqual(detections[1][0]["label"], "vehicle")
+        self.assertEqual(detections[1][0]["bbox_xyxy"], [1.0, 2.0, 6.0, 6.0])
+        self.assertEqual((detections[1][0]["width"], detections[1][0]["height"]), (16, 24))
+
+    def test_missing_results_raise_instead_of_writing_empty_labels(self):
+        with self.assertRaises(RuntimeError):
+            annotate_route.detect_images(FakeModel(drop_results=1), [image(0), image(1)], 0.5, 0.7, None)
+
+
+def annotate_args(**overrides):
+    args = {
+        "model": "fake.pt",
+        "confidence": 0.5,
+        "iou": 0.7,
+        "device": None,
+        "no_empty_labels": False,
+        "batch_size": 2,
+        "decode_threads": 1,
+        "incremental": True,
+    }
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def write_frame(path, value):
+    cv2.imwrite(str(path), image(value))
+    # Distinct mtimes even when the rewritten PNG has the same size
+    mtime_ns = 1_700_000_000_000_000_000 + value * 1_000_000_000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class IncrementalAnnotationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.raw_dir = self.root / "segment" / "raw"
+        self.raw_dir.mkdir(parents=True)
+        self.output_dir = self.root / "segment" / "annotations"
+        for index, value in enumerate((10, 20, 30)):
+            write_frame(self.raw_dir / f"{index:06d}.png", value)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def annotate(self, target=None, **overrides):
+        model = FakeModel()
+        annotate_route.annotate_target(annotate_args(**overrides), model, target or self.raw_dir)
+        return model.predicted_images
+
+    def read_outputs(self, output_dir):
+        names = ["annotations_coco.json", "annotations_cvat.xml"]
+        names += [f"labels/{path.name}" for path in sorted((output_dir / "labels").iterdir())]
+        return {name: (output_dir / name).read_bytes() for name in names}
+
+    def test_unchanged_frames_are_not_detected_again(self):
+        self.assertEqual(self.annotate(), 3)
+        coco_path = self.output_dir / "annotations_coco.json"
+        outputs = self.read_outputs(self.output_dir)
+        coco_mtime = coco_path.stat().st_mtime_ns
+
+        self.assertEqual(self.annotate(), 0)
+        self.assertEqual(coco_path.stat().st_mtime_ns, coco_mtime)
+        self.assertEqual(self.read_outputs(self.output_dir), outputs)
+
+    def test_unchanged_segment_reports_the_stored_counts(self):
+        segment_dir = self.root / "segment"
+        _, first = annotate_route.annotate_target(annotate_args(), FakeModel(), segment_dir)
+        model = FakeModel()
+        _, again = annotate_route.annotate_target(annotate_args(), model, segment_dir)
+
+        self.assertEqual(model.predicted_images, 0)
+        self.assertEqual([(s["camera"], s["images"], s["boxes"]) for s in again], [("raw", 3, 3)])
+        self.assertEqual(again[0]["coco_path"], first[0]["coco_path"])
+
+    def test_added_modified_and_removed_frames_match_a_full_run(self):
+        self.annotate()
+        write_frame(self.raw_dir / "000001.png", 200)
+        (self.raw_dir / "000002.png").unlink()
+        write_frame(self.raw_dir / "000003.png", 40)
+
+        self.assertEqual(self.annotate(), 2)
+        self.assertFalse((self.output_dir / "labels" / "000002.txt").exists())
+        state = json.loads((self.output_dir / annotate_route.STATE_FILENAME).read_text(encoding="utf-8"))
+        self.assertEqual(sorted(state["frames"]), ["000000.png", "000001.png", "000003.png"])
+
+        full_raw_dir = self.root / "full" / "raw"
+        shutil.copytree(self.raw_dir, full_raw_dir)
+        self.assertEqual(self.annotate(full_raw_dir, incremental=False), 3)
+        self.assertEqual(self.read_outputs(self.output_dir), self.read_outputs(self.root / "full" / "annotations"))
+
+    def test_frames_that_lose_their_boxes_drop_their_label_without_empty_labels(self):
+        self.annotate(no_empty_labels=True)
+        label_path = self.output_dir / "labels" / "000000.txt"
+        self.assertTrue(label_path.exists())
+
+        write_frame(self.raw_dir / "000000.png", 0)
+        self.assertEqual(self.annotate(no_empty_labels=True), 1)
+        self.assertFalse(label_path.exists())
+
+        full_raw_dir = self.root / "full" / "raw"
+        shutil.copytree(self.raw_dir, full_raw_dir)
+        self.annotate(full_raw_dir, no_empty_labels=True, incremental=False)
+        self.assertEqual(self.read_outputs(self.output_dir), self.read_outputs(self.root / "full" / "annotations"))
+
+    def test_changed_parameters_detect_every_frame(self):
+        self.annotate()
+        self.assertEqual(self.annotate(confidence=0.25), 3)
+        self.assertEqual(self.annotate(confidence=0.25), 0)
+        self.assertEqual(self.annotate(model="other.pt", confidence=0.25), 3)
+
+    def test_unreadable_state_detects_every_frame(self):
+        self.annotate()
+        (self.output_dir / annotate_route.STATE_FILENAME).write_text("{truncated", encoding="utf-8")
+        self.assertEqual(self.annotate(), 3)
+
+
+def reference_coco(frames):
+    """The in-memory COCO dict the annotator built before it streamed its outputs."""
+    coco = {
+        "images": [],
+        "annotations": [],
+        "categories": [
+            {"id": idx, "name": name, "supercategory": "object"}
+            for idx, name in enumerate(annotate_route.TARGET_LABELS)
+        ],
+    }
+    for image_id, (image_path, width, height, detections) in enumerate(frames, start=1):
+        coco["images"].append({"id": image_id, "file_name": image_path.name, "width": width, "height": height})
+        for det in detections:
+            x1, y1, x2, y2 = det["bbox_xyxy"]
+            coco["annotations"].append(
+                {
+                    "id": len(coco["annotations"]) + 1,
+                    "image_id": image_id,
+                    "category_id": det["class_id"],
+                    "bbox": [x1, y1, x2 - x1, y2 - y1],
+                    "area": (x2 - x1) * (y2 - y1),
+                    "iscrowd": 0,
+                    "score": det["confidence"],
+                }
+            )
+    return coco
+
+
+def reference_cvat_tree(frames):
+    """The in-memory CVAT XML tree the annotator built before it streamed its outputs."""
+    root = ET.Element("annotations")
+    ET.SubElement(root, "version").text = "1.1"
+    task = ET.SubElement(ET.SubElement(root, "meta"), "task")
+    ET.SubElement(task, "name").text = "annotations"
+    labels_node = ET.SubElement(task, "labels")
+    for label_name in annotate_route.TARGET_LABELS:
+        label_node = ET.SubElement(labels_node, "label")
+        ET.SubElement(label_node, "name").text = label_name
+        ET.SubElement(label_node, "color").text = "#000000"
+        ET.SubElement(label_node, "type").text = "rectangle"
+        ET.SubElement(label_node, "attributes")
+    for image_id, (image_path, width, height, detections) in enumerate(frames):
+        image_node = ET.SubElement(
+            root,
+            "image",
+            {"id": str(image_id), "name": image_path.name, "width": str(width), "height": str(height)},
+        )
+        for det in detections:
+            x1, y1, x2, y2 = det["bbox_xyxy"]
+            ET.SubElement(
+                image_node,
+                "box",
+                {
+                    "label": det["label"],
+                    "source": "auto",
+                    "occluded": "0",
+                    "xtl": f"{x1:.2f}",
+                    "ytl": f"{y1:.2f}",
+                    "xbr": f"{x2:.2f}",
+                    "ybr": f"{y2:.2f}",
+                    "z_order": "0",
+                },
+            )
+    ET.indent(root, space="  ")
+    return ET.ElementTree(root)
+
+
+def stream_frames(count):
+    names = ['a&b <c> "quoted" \'single\'.png', "café ünïcode.png", "plain.png", "tab\tname.png", "x>y.png"]
+    frames = []
+    for index in range(count):
+        detections = [
+            {
+                "label": label,
+                "class_id": annotate_route.TARGET_LABEL_TO_ID[label],
+                "confidence": 0.1 + 0.2 * (box + 1),
+                "bbox_xyxy": [1 / 3 + box, 2.0, 10.123456789 + index, 7.5 + box / 7],
+                "width": 640,
+                "height": 480,
+            }
+            for box, label in enumerate(annotate_route.TARGET_LABELS[: index % 3])
+        ]
+        frames.append((Path(names[index]), 640, 480, detections))
+    return frames
+
+
+class StreamWriterTests(unittest.TestCase):
+    def test_stream_writers_match_the_in_memory_builders(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = Path(tmp)
+            for count in (0, 1, 5):
+                frames = stream_frames(count)
+                coco_path = out_dir / f"coco_{count}.json"
+                cvat_path = out_dir / f"cvat_{count}.xml"
+                writers = (annotate_route.CocoStreamWriter(coco_path), annotate_route.CvatStreamWriter(cvat_path))
+                for frame in frames:
+                    for writer in writers:
+                        writer.add_image(*frame)
+                for writer in writers:
+                    writer.close()
+
+                expected_cvat_path = out_dir / f"expected_{count}.xml"
+                reference_cvat_tree(frames).write(expected_cvat_path, encoding="utf-8", xml_declaration=True)
+                self.assertEqual(coco_path.read_bytes(), json.dumps(reference_coco(frames), indent=2).encode("utf-8"))
+                self.assertEqual(cvat_path.read_bytes(), expected_cvat_path.read_bytes())
+            self.assertEqual([path.name for path in out_dir.iterdir() if path.suffix == ".tmp"], [])
+
+
+TIMING_KEYS = {"detect_seconds", "images_per_sec"}
+
+
+def without_timings(value):
+    if isinstance(value, dict):
+        return {key: without_timings(item) for key, item in value.items() if key not in TIMING_KEYS}
+    if isinstance(value, list):
+        return [without_timings(item) for item in value]
+    return value
+
+
+def write_route(route_dir):
+    """Two segments with two cameras each; the camera folders differ in size."""
+    for segment_name, frame_counts in (("segment_00", (3, 5)), ("segment_01", (4, 2))):
+        for camera_name, count in zip(("raw_front", "raw_left"), frame_counts):
+            camera_dir = route_dir / segment_name / camera_name
+            camera_dir.mkdir(parents=True)
+            for index in range(count):
+                write_frame(camera_dir / f"{index:06d}.png", index * 40 + len(camera_name))
+
+
+def read_annotation_outputs(route_dir):
+    """Every file under the route's annotation folders, with timings dropped from the summaries."""
+    outputs = {}
+    for annotations_dir in sorted(route_dir.glob("segment_*/annotations")):
+        for path in sorted(annotations_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            name = path.relative_to(route_dir).as_posix()
+            if path.name == "summary.json":
+                outputs[name] = without_timings(json.loads(path.read_text(encoding="utf-8")))
+            else:
+                outputs[name] = path.read_bytes()
+    return outputs
+
+
+@contextlib.contextmanager
+def silenced_stdout():
+    """Discard stdout at the file descriptor level, so spawned workers are quiet too."""
+    sys.stdout.flush()
+    saved_fd = os.dup(1)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            os.dup2(devnull.fileno(), 1)
+            yield
+    finally:
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+
+
+class ParallelAnnotationTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.route_dir = Path(self.tmp.name) / "route"
+        write_route(self.route_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def annotate(self, script, target, workers):
+        """Run ``script``'s command line on ``target``, then remove and return its outputs."""
+        argv = [script.__file__, str(target), "--model", "fake.pt", "--batch-size", "2"]
+        argv += ["--decode-threads", "1", "--workers", str(workers)]
+        saved_argv, sys.argv = sys.argv, argv
+        try:
+            with silenced_stdout():
+                script.main()
+        finally:
+            sys.argv = saved_argv
+        outputs = read_annotation_outputs(self.route_dir)
+        for annotations_dir in self.route_dir.glob("segment_*/annotations"):
+            shutil.rmtree(annotations_dir)
+        return outputs
+
+    def test_route_workers_match_a_serial_run(self):
+        serial = self.annotate(annotate_route, self.route_dir, workers=1)
+        parallel = self.annotate(annotate_route, self.route_dir, workers=2)
+
+        self.assertEqual(
+            [camera["camera"] for camera in serial["segment_01/annotations/summary.json"]["cameras"]],
+            ["raw_front", "raw_left"],
+        )
+        self.assertIn("segment_00/annotations/raw_left/labels/000004.txt", serial)
+        self.assertEqual(parallel, serial)
+
+    def test_cvat_script_workers_match_a_serial_run(self):
+        segment_dir = self.route_dir / "segment_00"
+        serial = self.annotate(local_yolo_annotate, segment_dir, workers=1)
+        parallel = self.annotate(local_yolo_annotate, segment_dir, workers=2)
+
+        self.assertIn("segment_00/annotations/summary.json", serial)
+        self.assertIn("segment_00/annotations/raw_left/annotations_cvat.xml", serial)
+        self.assertEqual(parallel, serial)
+
+
+if __name__ == "__main__":
+    unittest.main()
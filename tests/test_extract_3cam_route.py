@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+FRAME_EXTRACTOR_DIR = PROJECT_ROOT / "frame_extractor"
+if str(FRAME_EXTRACTOR_DIR) not in sys.path:
+    sys.path.insert(0, str(FRAME_EXTRACTOR_DIR))
+
+import extract_3cam_route
+from bench_decoders import write_synthetic_video
+from video_decoders import available_backends, open_decoder
+
+
+VIDEO_FRAMES = 60
+VIDEO_SIZE = (96, 64)
+SEEK_THRESHOLD = 8
+
+# Blank slots, a repeated frame, short gaps decoded through and a gap longer
+# than SEEK_THRESHOLD that is skipped with a seek.
+FRAME_INDICES = [None, 0, 0, 5, None, 6, 40, 40, None, 41, VIDEO_FRAMES - 1]
+
+
+def decode_sequentially(backend, video_path, info):
+    with open_decoder(backend, video_path, info=info) as decoder:
+        return dict(decoder.iter_frames(range(info.total_frames), seek_threshold=0))
+
+
+class ExtractCameraTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp_dir = tempfile.TemporaryDirectory()
+        cls.video_path = os.path.join(cls._tmp_dir.name, "cam0.mp4")
+        write_synthetic_video(cls.video_path, VIDEO_FRAMES, VIDEO_SIZE, 20.0)
+        cls.info = extract_3cam_route.get_video_info(cls.video_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp_dir.cleanup()
+
+    def extract(self, output_dir, backend="opencv", **kwargs):
+        slot_paths = [os.path.join(output_dir, f"{slot:05d}.png") for slot in range(len(FRAME_INDICES))]
+        stats = extract_3cam_route.extract_camera(
+            self.video_path,
+            FRAME_INDICES,
+            slot_paths,
+            info=self.info,
+            backend=backend,
+            seek_threshold=SEEK_THRESHOLD,
+            encode_threads=2,
+            **kwargs,
+        )
+        return slot_paths, stats
+
+    def test_every_slot_matches_the_sequentially_decoded_frame(self):
+        for backend in available_backends():
+            with self.subTest(backend=backend), tempfile.TemporaryDirectory() as output_dir:
+                expected = decode_sequentially(backend, self.video_path, self.info)
+                self.assertEqual(len(expected), VIDEO_FRAMES)
+                blank = np.zeros((VIDEO_SIZE[1], VIDEO_SIZE[0], 3), dtype=np.uint8)
+
+                slot_paths, stats = self.extract(output_dir, backend)
+
+                for slot, (frame_idx, path) in enumerate(zip(FRAME_INDICES, slot_paths)):
+                    image = cv2.imread(path)
+                    self.assertIsNotNone(image, path)
+                    reference = blank if frame_idx is None else expected[frame_idx]
+                    np.testing.assert_array_equal(image, reference, err_msg=f"slot {slot} (frame {frame_idx})")
+                unique_frames = {idx for idx in FRAME_INDICES if idx is not None}
+                self.assertEqual(stats["decoded"], len(unique_frames))
+                self.assertEqual(stats["blank"], FRAME_INDICES.count(None))
+                self.assertEqual(stats["slots"], len(FRAME_INDICES))
+
+    def test_each_unique_frame_and_the_blank_frame_are_encoded_once(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            slot_paths, stats = self.extract(output_dir)
+
+            unique_frames = {idx for idx in FRAME_INDICES if idx is not None}
+            self.assertEqual(stats["encoded"], len(unique_frames) + 1)
+            blank_paths = [path for idx, path in zip(FRAME_INDICES, slot_paths) if idx is None]
+            self.assertGreater(len(blank_paths), 1)
+            blank_inodes = {os.stat(path).st_ino for path in blank_paths}
+            self.assertEqual(len(blank_inodes), 1)
+            for path in blank_paths:
+                self.assertEqual(os.stat(path).st_nlink, len(blank_paths))
+            repeated = [path for idx, path in zip(FRAME_INDICES, slot_paths) if idx == 0]
+            self.assertGreater(os.stat(repeated[0]).st_nlink, 1)
+            self.assertTrue(os.path.samefile(repeated[0], repeated[1]))
+
+
+class EncodeParamsTests(unittest.TestCase):
+    def test_png_compression_is_passed_to_opencv(self):
+        self.assertEqual(extract_3cam_route.encode_params("png"), (".png", []))
+        self.assertEqual(
+            extract_3cam_route.encode_params("png", png_compression=1),
+            (".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]),
+        )
+
+    def test_png_compression_outside_zlib_levels_is_rejected(self):
+        for level in (-1, 10):
+            with self.subTest(level=level), self.assertRaises(ValueError):
+                extract_3cam_route.encode_params("png", png_compression=level)
+
+    def test_unknown_image_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            extract_3cam_route.encode_params("tiff")
+
+
+if __name__ == "__main__":
+    unittest.main()
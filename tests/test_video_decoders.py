@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+FRAME_EXTRACTOR_DIR = PROJECT_ROOT / "frame_extractor"
+if str(FRAME_EXTRACTOR_DIR) not in sys.path:
+    sys.path.insert(0, str(FRAME_EXTRACTOR_DIR))
+
+from bench_decoders import write_synthetic_video
+from video_decoders import VideoInfo, available_backends, open_decoder
+
+
+VIDEO_FRAMES = 60
+VIDEO_SIZE = (96, 64)
+FPS = 20.0
+
+
+class VideoDecoderTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp_dir = tempfile.TemporaryDirectory()
+        cls.video_path = os.path.join(cls._tmp_dir.name, "synthetic.mp4")
+        write_synthetic_video(cls.video_path, VIDEO_FRAMES, VIDEO_SIZE, FPS)
+        # Matroska stores no frame count, so the count must not be relied on.
+        cls.unsized_video_path = os.path.join(cls._tmp_dir.name, "synthetic.mkv")
+        write_synthetic_video(cls.unsized_video_path, VIDEO_FRAMES, VIDEO_SIZE, FPS)
+        # Shared metadata, so the ffmpeg backend does not need ffprobe.
+        cls.info = VideoInfo(VIDEO_FRAMES, FPS, *VIDEO_SIZE)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp_dir.cleanup()
+
+    def decode(self, backend, frame_indices, seek_threshold):
+        with open_decoder(backend, self.video_path, info=self.info) as decoder:
+            return list(decoder.iter_frames(frame_indices, seek_threshold))
+
+    def assert_same_frames(self, frames, expected):
+        self.assertEqual([idx for idx, _ in frames], [idx for idx, _ in expected])
+        for (frame_idx, frame), (_, reference) in zip(frames, expected):
+            np.testing.assert_array_equal(frame, reference, err_msg=f"frame {frame_idx}")
+
+    def test_sparse_frames_with_seeks_match_a_sequential_decode(self):
+        frame_indices = [3, 3, None, 4, 30, 31, 45, 59, 17]
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                sequential = dict(self.decode(backend, range(VIDEO_FRAMES), seek_threshold=0))
+                self.assertEqual(len(sequential), VIDEO_FRAMES)
+
+                frames = self.decode(backend, frame_indices, seek_threshold=4)
+
+                expected_indices = sorted({idx for idx in frame_indices if idx is not None})
+                self.assert_same_frames(frames, [(idx, sequential[idx]) for idx in expected_indices])
+
+    def test_sparse_frames_stop_at_the_end_of_the_stream(self):
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                frames = self.decode(backend, [10, VIDEO_FRAMES, VIDEO_FRAMES + 40], seek_threshold=4)
+                self.assertEqual([idx for idx, _ in frames], [10])
+
+    def test_every_nth_frame_is_decoded_without_a_frame_count(self):
+        step = 7
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                with open_decoder(backend, self.unsized_video_path, output_size=VIDEO_SIZE) as decoder:
+                    sequential = list(decoder.iter_every(1))
+                with open_decoder(backend, self.unsized_video_path, output_size=VIDEO_SIZE) as decoder:
+                    frames = list(decoder.iter_every(step))
+
+                self.assertEqual(len(sequential), VIDEO_FRAMES)
+                self.assertEqual([idx for idx, _ in sequential], list(range(VIDEO_FRAMES)))
+                self.assert_same_frames(frames, sequential[::step])
+                self.assertEqual(frames[0][1].shape, (VIDEO_SIZE[1], VIDEO_SIZE[0], 3))
+
+
+if __name__ == "__main__":
+    unittest.main()